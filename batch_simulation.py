@@ -0,0 +1,152 @@
+"""Vectorized simulation component for PI/PID parameter sweeps."""
+
+import math
+
+import numpy as np
+
+from constants import SAMPLING, SIMULATION_TIME, MAX_WORK, WATER_MASS, WATER_SPECIFIC_HEAT, RESERVOIR_HOT, \
+    RESERVOIR_COLD, REFRIGERATOR_SIGNAL_LIMIT
+from controllers.fuzzy_controller import Fuzzy_Controller
+
+class Batch_Simulation:
+    '''
+    Batch simulation object, steps many PI/PID + Refrigerator configurations in lockstep.
+    Every parameter accepts a scalar or a sequence of length n_configs. Configurations with
+    derivative time equal to 0 behave exactly like PI_Controller.
+    :param target_values: target regulated process values.
+    :param init_values: initial process values.
+    :param proportional_gains: proportional gains (kp).
+    :param reset_times: reset times (Ti).
+    :param derivative_times: derivative times (Td).
+    :param anti_windup: stop integrating while the output is saturated in the direction of the error.
+    :param integral_limit: maximum absolute value of the accumulated error (None disables the clamp).
+    '''
+    def __init__(self, target_values, init_values, proportional_gains, reset_times, derivative_times = 0.0,
+                 anti_windup : bool = False, integral_limit : float = None) -> None:
+        self.sampling = SAMPLING
+        self.simulation_time = SIMULATION_TIME
+        self.water_mass = WATER_MASS
+        self.water_specific_heat = WATER_SPECIFIC_HEAT
+        self.temp_high = RESERVOIR_HOT
+        self.temp_low = RESERVOIR_COLD
+        self.min_signal = -REFRIGERATOR_SIGNAL_LIMIT
+        self.max_signal = REFRIGERATOR_SIGNAL_LIMIT
+        self.anti_windup = anti_windup
+        self.integral_limit = integral_limit
+
+        params = np.broadcast_arrays(*[np.asarray(param, dtype=np.float64) for param in
+                                       (target_values, init_values, proportional_gains, reset_times,
+                                        derivative_times)])
+        self.target_values, self.init_values, self.proportional_gains, self.reset_times, \
+            self.derivative_times = [np.atleast_1d(param).copy() for param in params]
+        self.reset()
+
+    def __len__(self) -> int:
+        return self.target_values.shape[0]
+
+    def get_steps(self) -> int:
+        """Get number of simulation steps (same as Simulation.start)."""
+        return math.floor(self.simulation_time / self.sampling)
+
+    def reset(self) -> None:
+        """Reset simulation state and allocate trajectory arrays."""
+        n_steps = self.get_steps()
+        n_configs = len(self)
+        self.time_measurements = np.arange(n_steps + 1, dtype=np.float64) * self.sampling
+        # Trajectories are stored as (time, config) so every step writes one contiguous row
+        self.temperature_measurements = np.empty((n_steps + 1, n_configs))
+        self.work_measurements = np.empty((n_steps + 1, n_configs))
+        self.heat_measurements = np.empty((n_steps + 1, n_configs))
+        self.errors = np.empty((n_steps + 1, n_configs))
+        self.temperature_measurements[0] = self.init_values
+        self.work_measurements[0] = 0.0
+        self.heat_measurements[0] = 0.0
+        self.errors[0] = self.target_values - self.init_values
+        self.sums = self.clamp_integral(self.errors[0].copy())
+
+    def clamp_integral(self, sums : np.ndarray) -> np.ndarray:
+        '''
+        Clamp accumulated errors to the configured integral limit.
+        :param sums: accumulated errors to clamp.
+        '''
+        if self.integral_limit is None:
+            return sums
+        return np.clip(sums, -self.integral_limit, self.integral_limit)
+
+    def get_signals(self, idx : int, error : np.ndarray) -> np.ndarray:
+        '''
+        Get responses of all controllers, mirrors PI_Controller/PID_Controller.get_signal.
+        :param idx: index of the current step.
+        :param error: latest control errors.
+        '''
+        integral_gains = self.sampling / self.reset_times
+        derivative_part = (self.derivative_times / self.sampling) * (error - self.errors[idx - 1])
+        previous_sums = self.sums
+        self.sums = self.clamp_integral(self.sums + error)
+        signal = self.proportional_gains * (error + integral_gains * self.sums + derivative_part)
+
+        if self.anti_windup:
+            direction = error * self.proportional_gains
+            winding_up = (((signal > self.max_signal) & (direction > 0)) |
+                          ((signal < self.min_signal) & (direction < 0)))
+            self.sums = np.where(winding_up, previous_sums, self.sums)
+            signal = np.where(winding_up, self.proportional_gains *
+                              (error + integral_gains * self.sums + derivative_part), signal)
+        return signal
+
+    def start(self) -> None:
+        """Start the simulation, mirrors Simulation.start for every configuration."""
+        coefficient = -self.temp_low / (self.temp_high - self.temp_low)
+        heat_capacity = self.water_mass * self.water_specific_heat
+
+        for idx in range(1, self.get_steps() + 1):
+            error = self.target_values - self.temperature_measurements[idx - 1]
+            signal = self.get_signals(idx, error)
+            self.errors[idx] = error
+
+            work = self.work_measurements[idx]
+            np.multiply(self.sampling, np.clip(signal, -REFRIGERATOR_SIGNAL_LIMIT, REFRIGERATOR_SIGNAL_LIMIT), out=work)
+            self.temperature_measurements[idx] = (self.temperature_measurements[idx - 1] - self.sampling *
+                                                  (work * coefficient / heat_capacity))
+            self.heat_measurements[idx] = heat_capacity * (self.temperature_measurements[idx] -
+                                                           self.temperature_measurements[idx - 1])
+
+    def get_results(self) -> list:
+        """Get all trajectories as arrays shaped (n_steps + 1, n_configs), time is shared."""
+        return [self.time_measurements, self.temperature_measurements, self.work_measurements,
+                self.heat_measurements, self.errors]
+
+    def get_display_results(self, idx : int) -> list:
+        '''
+        Return results of a single configuration in the Simulation.get_display_results layout.
+        :param idx: index of the configuration
+        '''
+        return [self.time_measurements, self.temperature_measurements[:, idx], self.work_measurements[:, idx],
+                self.heat_measurements[:, idx], self.errors[:, idx]]
+
+class Batch_Fuzzy_Simulation(Batch_Simulation):
+    '''
+    Batch simulation object for Fuzzy_Controller + Refrigerator configurations, inference for
+    all configurations runs as one Mamdani_Engine call per step.
+    :param target_values: target regulated process values.
+    :param init_values: initial process values.
+    :param max_signal: maximum allowed response.
+    :param compiled: serve inference from precompiled lookup table instead of exact inference.
+    '''
+    def __init__(self, target_values, init_values, max_signal : int = MAX_WORK, compiled : bool = False) -> None:
+        self.controller = Fuzzy_Controller(max_signal=max_signal, compiled=compiled)
+        super().__init__(target_values, init_values, 0.0, 1.0)
+
+    def get_signals(self, idx : int, error : np.ndarray) -> np.ndarray:
+        '''
+        Get responses of all controllers, mirrors Fuzzy_Controller.get_signal.
+        :param idx: index of the current step.
+        :param error: latest control errors.
+        '''
+        max_signal = self.controller.max_signal
+        error, prev_error = error / max_signal, self.errors[idx - 1] / max_signal
+        if self.controller.table is not None:
+            signal = self.controller.table.get_values(error, error - prev_error)
+        else:
+            signal = self.controller.get_signals(error, error - prev_error)
+        return np.clip(signal, -1, 1) * max_signal
@@ -0,0 +1,43 @@
+"""Database latency of a single "Go" click (insert_or_update_data + get_latest_simulations)."""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from constants import NUM_SIMULATIONS
+from database import Database
+from simulation import Simulation
+
+def run_callback(db : Database, param_1 : float, measurements : list) -> list:
+    '''
+    Database work done by Display.make_graph, returns time spent writing and reading.
+    :param db: database object
+    :param param_1: proportional gain of the simulated PI controller
+    :param measurements: display results of the simulation
+    '''
+    start = time.perf_counter()
+    db.insert_or_update_data(param_1, 1.0, None, 10, "PI", measurements)
+    written = time.perf_counter()
+    db.get_latest_simulations(NUM_SIMULATIONS, 10)
+    return [written - start, time.perf_counter() - written]
+
+if __name__ == "__main__":
+    simulation = Simulation()
+    simulation.reset_controller(10, 25, 1.0, 1.0, None)
+    simulation.reset(25)
+    simulation.start()
+    measurements = simulation.get_display_results()
+
+    repeats = 200
+    for storage in ["rows", "blob"]:
+        with tempfile.TemporaryDirectory() as directory:
+            db = Database(os.path.join(directory, "benchmark.db"), storage=storage)
+            for label, params in [("new configuration", [0.01 * idx for idx in range(1, repeats + 1)]),
+                                  ("stored configuration", [0.01] * repeats)]:
+                timings = [run_callback(db, param_1, measurements) for param_1 in params]
+                write, read = [sum(timing) / repeats * 1000 for timing in zip(*timings)]
+                print(f"{storage}, {label}: {write + read:.2f} ms per callback "
+                      f"(write {write:.2f} ms, read {read:.2f} ms)")
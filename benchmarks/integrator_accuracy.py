@@ -0,0 +1,37 @@
+"""Accuracy against number of integration steps of every integrator on the (nonlinear) tempomat process."""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from controllers.pi_controller import PI_Controller
+from integrators import Euler_Integrator, RK4_Integrator, RK45_Integrator
+from processes.tempomat import Tempomat
+from simulation import Simulation
+
+def run_simulation(integrator) -> list:
+    '''
+    Run PI + Tempomat simulation with provided integrator, returns its results and run time.
+    :param integrator: integrator of the process dynamics (None for the built-in Euler step)
+    '''
+    simulation = Simulation(PI_Controller(), Tempomat(), integrator)
+    simulation.reset_controller(35, 0, 1.0, 1.0, None)
+    simulation.reset(0)
+    start = time.perf_counter()
+    simulation.start()
+    return [simulation.get_display_results(), time.perf_counter() - start]
+
+if __name__ == "__main__":
+    reference = run_simulation(RK4_Integrator(substeps=256))[0]
+    for label, integrator in [("add_signal (Euler)", None), ("Euler x16", Euler_Integrator(16)),
+                              ("RK4", RK4_Integrator()), ("RK4 x4", RK4_Integrator(4)),
+                              ("RK45 rtol=1e-3", RK45_Integrator(1e-3, 1e-6)),
+                              ("RK45 rtol=1e-9", RK45_Integrator(1e-9, 1e-12))]:
+        results, elapsed = run_simulation(integrator)
+        error = max(np.max(np.abs(np.asarray(result) - np.asarray(expected)))
+                    for result, expected in zip(results[1:3], reference[1:3]))
+        steps = integrator.steps if integrator is not None else len(results[0]) - 1
+        print(f"{label}: {steps} steps, max error {error:.2e}, {elapsed * 1000:.0f} ms")
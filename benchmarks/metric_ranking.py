@@ -0,0 +1,39 @@
+"""Latency of ranking stored simulations by metric (Database.rank_simulations) on a large database."""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from database import Database
+from metrics import METRICS
+
+def fill_database(db : Database, count : int) -> None:
+    '''
+    Insert simulations with random metrics (without measurements) in a single transaction.
+    :param db: database object
+    :param count: number of inserted simulations
+    '''
+    conn = db.get_connection()
+    for idx in range(count):
+        db.insert_simulation(conn, 0.001 * (idx + 1), 1.0, None, random.choice([5, 10]), "PI", 20,
+                             {metric: random.uniform(0, 1000) for metric in METRICS})
+    conn.commit()
+
+if __name__ == "__main__":
+    count = 100000
+    repeats = 100
+    with tempfile.TemporaryDirectory() as directory:
+        db = Database(os.path.join(directory, "benchmark.db"))
+        fill_database(db, count)
+        for label, kwargs in [("iae", {"metric": "iae"}),
+                              ("overshoot, descending", {"metric": "overshoot", "descending": True}),
+                              ("itae, target value 5", {"metric": "itae", "target_value": 5}),
+                              ("ise, settling time below 100", {"metric": "ise", "limits": {"settling_time": (None, 100)}})]:
+            start = time.perf_counter()
+            for _ in range(repeats):
+                db.rank_simulations(**kwargs)
+            print(f"{label}: {(time.perf_counter() - start) / repeats * 1000:.3f} ms per query ({count} simulations)")
@@ -0,0 +1,35 @@
+"""Per-step time of multizone refrigerator simulations for growing number of zones, sparse and dense coupling."""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from controllers.pi_controller import PI_Controller
+from processes.multizone_refrigerator import Multizone_Refrigerator
+from simulation import Simulation
+
+def run_simulation(process : Multizone_Refrigerator) -> float:
+    '''
+    Run single simulation of the process and return time of a single step.
+    :param process: simulated process
+    '''
+    simulation = Simulation(PI_Controller(), process)
+    simulation.simulation_time = 1000
+    simulation.reset_controller(10, 25, 1.0, 2.0, None)
+    simulation.reset(25)
+    start = time.perf_counter()
+    simulation.start()
+    return (time.perf_counter() - start) / simulation.get_steps()
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    for zones in [1, 10, 100, 300, 1000]:
+        # Rooms in a row coupled with their neighbours, and every zone coupled with every other one
+        chain = [(zone, zone + 1, 1.0) for zone in range(zones - 1)]
+        sparse = run_simulation(Multizone_Refrigerator(zones, edges=chain, leakage=0.1))
+        conductances = np.triu(rng.random((zones, zones)) / zones, 1)
+        dense = run_simulation(Multizone_Refrigerator(zones, conductances + conductances.T, leakage=0.1))
+        print(f"{zones} zones: sparse {sparse * 1e6:.1f} us per step, dense {dense * 1e6:.1f} us per step")
@@ -0,0 +1,49 @@
+"""Per-step time and retained memory of a single simulation run for every process and controller pair."""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from controllers.pi_controller import PI_Controller
+from controllers.pid_controller import PID_Controller
+from processes.refrigerator import Refrigerator
+from processes.tempomat import Tempomat
+from simulation import Simulation
+
+def run_simulation(controller_type, process_type, init_value : float, target_value : float) -> Simulation:
+    '''
+    Run single simulation and return it with its results still referenced.
+    :param controller_type: controller class
+    :param process_type: process class
+    :param init_value: initial value of the process
+    :param target_value: target value of the controller
+    '''
+    simulation = Simulation(controller_type(), process_type())
+    simulation.reset_controller(target_value, init_value, 1.0, 1.0, 0.1)
+    simulation.reset(init_value)
+    simulation.start()
+    return simulation
+
+if __name__ == "__main__":
+    repeats = 20
+    rounds = 15
+    for controller_type in [PI_Controller, PID_Controller]:
+        for process_type, init_value, target_value in [(Refrigerator, 25, 10), (Tempomat, 0, 35)]:
+            run_simulation(controller_type, process_type, init_value, target_value)
+            tracemalloc.start()
+            simulation = run_simulation(controller_type, process_type, init_value, target_value)
+            retained = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            steps = len(simulation.get_display_results()[0]) - 1
+            # Best of several rounds of CPU time, wall clock is too noisy for per-step figures
+            timings = []
+            for _ in range(rounds):
+                start = time.process_time()
+                for _ in range(repeats):
+                    run_simulation(controller_type, process_type, init_value, target_value)
+                timings.append((time.process_time() - start) / repeats)
+            print(f"{str(controller_type())} + {str(process_type())}: {min(timings) / steps * 1e9:.0f} ns "
+                  f"per step, {retained / 1024:.1f} KiB retained per simulation")
@@ -0,0 +1,56 @@
+"""Preallocated float64 buffers for measurements of processes, controllers and simulations."""
+
+import math
+
+from array import array
+
+import numpy as np
+
+from constants import SAMPLING, SIMULATION_TIME, MAX_PREALLOCATED_SAMPLES
+
+def get_capacity(steps : int = None) -> int:
+    '''
+    Number of samples to preallocate for a simulation (initial sample and one per step), capped by
+    MAX_PREALLOCATED_SAMPLES.
+    :param steps: number of simulation steps (SIMULATION_TIME / SAMPLING by default)
+    '''
+    if steps is None:
+        steps = math.floor(SIMULATION_TIME / SAMPLING)
+    return min(steps + 1, MAX_PREALLOCATED_SAMPLES)
+
+def allocate(capacity : int, init_value : float = 0.0) -> array:
+    '''
+    Allocate zeroed buffer with its first sample set to the initial value.
+    :param capacity: number of samples the buffer holds
+    :param init_value: value of the first sample
+    '''
+    buffer = array("d", bytes(8 * capacity))
+    buffer[0] = init_value
+    return buffer
+
+def grow(buffer : array) -> array:
+    '''
+    Return copy of the buffer with doubled capacity, used when a run outgrows its preallocation.
+    New buffer is allocated instead of resizing, so views returned earlier stay valid.
+    :param buffer: full buffer
+    '''
+    grown = array("d", bytes(8 * 2 * len(buffer)))
+    grown[:len(buffer)] = buffer
+    return grown
+
+def carry_over(buffer : array, size : int, capacity : int) -> array:
+    '''
+    Allocate new buffer starting with the latest sample of the old one, used to drop recorded samples.
+    :param buffer: old buffer
+    :param size: number of samples recorded in the old buffer
+    :param capacity: number of samples the new buffer holds
+    '''
+    return allocate(capacity, buffer[size - 1])
+
+def get_view(buffer : array, size : int) -> np.ndarray:
+    '''
+    Numpy view of the first samples of the buffer, no data is copied.
+    :param buffer: buffer with the samples
+    :param size: number of recorded samples
+    '''
+    return np.frombuffer(buffer, dtype=np.float64, count=size)
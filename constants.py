@@ -16,6 +16,8 @@ MAX_SIGNAL = 10#V
 MIN_WORK = -2000#W
 # Maximum worked performed by refrigerator
 MAX_WORK = 50#W
+# Saturation of the signal accepted by refrigerator (the same in both directions)
+REFRIGERATOR_SIGNAL_LIMIT = 50
 
 
 # Mass of the controlled object
@@ -30,6 +32,34 @@ SIMULATION_TIME = 100#s
 DB_FILEPATH = "database.db"
 # Number of simulations displayed on the result graph
 NUM_SIMULATIONS = 8
+# Number of measurement rows inserted into database by single executemany call
+MEASUREMENTS_CHUNK_SIZE = 10000
+# Maximum size of simulation results kept in memory by the result cache
+RESULT_CACHE_SIZE = 64 * 1024 * 1024#B
+# Number of worker processes running background simulation jobs (all cores if None)
+JOB_WORKERS = None
+# Interval in which the client polls status of background simulation job
+JOB_POLL_INTERVAL = 500#ms
+# Time after which finished background jobs nobody picked up are dropped
+JOB_TTL = 600#s
+# Number of samples yielded at once by Simulation.stream
+STREAM_CHUNK_SIZE = 1000
+# Maximum number of samples preallocated at once, longer runs grow their buffers
+MAX_PREALLOCATED_SAMPLES = 1048576
+# Band around the target value settled simulation stays within (fraction of the step)
+SETTLING_BAND = 0.02
+# Number of steps between checks of stop conditions in Simulation.start
+STOP_CHECK_INTERVAL = 100
+# Maximum number of points of every graph trace, longer results are downsampled
+GRAPH_POINTS = 2000
+# Downsampling method of graph traces ("minmax" or "lttb")
+GRAPH_DOWNSAMPLING = "minmax"
+# Number of points of a graph trace above which it is drawn with WebGL
+WEBGL_POINTS = 1000
+# Number of cached sets of result figures
+FIGURE_CACHE_SIZE = 32
+# Minimum interval between progress updates of running simulation job
+LIVE_UPDATE_INTERVAL = 500#ms
 
 
 # Mass of water cooled in refrigerator 
@@ -40,5 +70,7 @@ WATER_SPECIFIC_HEAT = 3.33 * 105 #c [J/kg]
 RESERVOIR_HOT = 293 #T_h [K] 
 # Temperature of cold reservoir
 RESERVOIR_COLD = 273 #T_l [K] 
+# Temperature of the ambient zones of multizone refrigerator leak heat to
+AMBIENT_TEMPERATURE = 20 #T_a [C]
 
 
@@ -1,18 +1,36 @@
 """Fuzzy controller component."""
 
+import numpy as np
+
 from simpful import FuzzySystem, TriangleFuzzySet, LinguisticVariable
 
+from buffers import allocate, carry_over, get_capacity, get_view, grow
 from constants import MAX_WORK
+from controllers.fuzzy_engine import Mamdani_Engine
+from controllers.fuzzy_table import Fuzzy_Table, get_axis
 
 class Fuzzy_Controller:
     '''
     Fuzzy controller object.
     :param target_value: target regulated process value.
     :param max_response: maximum allowed response.
+    :param compiled: serve inference from precompiled lookup table instead of running Mamdani inference.
+    :param grid_subdivisions: number of lookup table cells between two neighbouring fuzzy set vertices.
+    :param native: run exact inference with the vectorized Mamdani_Engine instead of simpful.
     '''
-    def __init__(self, target_value : float = 10, init_value : float = 25,  max_signal : int = MAX_WORK) -> None:
+    # Lookup tables shared between controllers, keyed by grid axes and the rule base
+    compiled_tables = {}
+    __slots__ = ("target_value", "max_signal", "error", "samples", "errors", "change", "fuzzy_system", "error_sets",
+                 "error_diff_sets", "signal_sets", "signal_universe", "rules", "engine", "native", "grid_subdivisions",
+                 "table")
+
+    def __init__(self, target_value : float = 10, init_value : float = 25,  max_signal : int = MAX_WORK,
+                 compiled : bool = False, grid_subdivisions : int = 16, native : bool = False) -> None:
         self.reset(target_value,init_value,  max_signal)
         self.set_rules()
+        self.native = native
+        self.grid_subdivisions = grid_subdivisions
+        self.table = self.compile_table() if compiled else None
 
     def __str__(self) -> str:
         return "Fuzzy"
@@ -24,65 +42,127 @@ class Fuzzy_Controller:
         :param last_time: unused, last time of the measurement
         :param time_before_that: unused, time before the last_time
         '''
-        self.errors.append( self.target_value - last_value)
+        last_error = self.target_value - last_value
+        try:
+            self.errors[self.samples] = last_error
+        except IndexError:
+            # Run is longer than preallocated
+            self.errors = grow(self.errors)
+            self.errors[self.samples] = last_error
+        self.samples += 1
+
+        error= last_error / self.max_signal
+        prev_error = self.error / self.max_signal
+        self.error = last_error
+
+        if(self.samples>2): self.change = error - prev_error
+
+        if self.table is not None:
+            signal = self.table.get_value(error, error - prev_error)
+        elif self.native:
+            signal = float(self.engine.infer(error=error, error_diff=error - prev_error))
+        else:
+            signal = self.get_exact_signal(error, error - prev_error)
+            self.fuzzy_system.set_variable("signal", signal)
 
-        error= self.errors[-1] / self.max_signal
-        prev_error = self.errors[-2]/ self.max_signal
+        return  max(-1, min(signal, 1)) * self.max_signal
 
-        if(len(self.errors)>2): self.change = error - prev_error
-        
+    def get_exact_signal(self, error : float, error_diff : float) -> float:
+        '''
+        Run Mamdani inference for provided inputs.
+        :param error: normalized control error.
+        :param error_diff: change of the normalized control error.
+        '''
         self.fuzzy_system.set_variable("error", error)
-        self.fuzzy_system.set_variable("error_diff", error - prev_error )
-        signal = self.fuzzy_system.Mamdani_inference(['signal']).get('signal')
-        self.fuzzy_system.set_variable("signal", signal)
-        
-        
-        return  max(-1, min(signal, 1)) * self.max_signal
+        self.fuzzy_system.set_variable("error_diff", error_diff)
+        return self.fuzzy_system.Mamdani_inference(['signal']).get('signal')
+
+    def get_signals(self, errors, error_diffs):
+        '''
+        Run exact Mamdani inference for whole batch of inputs, matches simpful up to rounding.
+        :param errors: normalized control errors.
+        :param error_diffs: changes of the normalized control errors.
+        '''
+        return self.engine.infer(error=errors, error_diff=error_diffs)
+
+    def compile_table(self, error_axis : list = None, error_diff_axis : list = None,
+                      deviation_samples : int = 32) -> Fuzzy_Table:
+        '''
+        Evaluate rule base once on (error, error_diff) grid and report its maximum deviation
+        from exact inference. By default grid contains every vertex of the input fuzzy sets
+        and grid_subdivisions cells between them.
+        :param error_axis: increasing grid points of the error input.
+        :param error_diff_axis: increasing grid points of the error_diff input.
+        :param deviation_samples: number of grid nodes and of points inside the cells compared with simpful.
+        '''
+        if error_axis is None:
+            error_axis = get_axis([point for fuzzy_set in self.error_sets for point in fuzzy_set[:3]],
+                                  self.grid_subdivisions)
+        if error_diff_axis is None:
+            error_diff_axis = get_axis([point for fuzzy_set in self.error_diff_sets for point in fuzzy_set[:3]],
+                                       self.grid_subdivisions)
+
+        # Controllers with other fuzzy sets or rules must not share the table
+        key = (tuple(error_axis), tuple(error_diff_axis), tuple(self.error_sets), tuple(self.error_diff_sets),
+               tuple(self.signal_sets), tuple(self.signal_universe), tuple(self.rules))
+        if key not in Fuzzy_Controller.compiled_tables:
+            table = Fuzzy_Table.compile(self.get_signals, error_axis, error_diff_axis)
+            table.measure_deviation(self.get_signals)
+            # Simpful runs one input at a time, so only a sample of the grid is compared with it
+            table.measure_deviation(np.vectorize(self.get_exact_signal, otypes=[np.float64]), deviation_samples)
+            Fuzzy_Controller.compiled_tables[key] = table
+        self.table = Fuzzy_Controller.compiled_tables[key]
+        return self.table
 
     def get_errors(self) -> list:
-        """Get all measurement errors detected by controller."""
-        return self.errors
+        """Get all measurement errors detected by controller (view of the error buffer)."""
+        return get_view(self.errors, self.samples)
+
+    def discard_measurements(self, steps : int = None) -> None:
+        '''
+        Drop recorded measurements except the latest one, which becomes the first sample.
+        :param steps: number of following steps to preallocate measurements for.
+        '''
+        self.errors = carry_over(self.errors, self.samples, get_capacity(steps))
+        self.samples = 1
 
     def set_rules(self) -> None:
         """Set rules for the fuzzy controller."""
         self.fuzzy_system = FuzzySystem()
 
-        self.fuzzy_system.add_linguistic_variable("error", LinguisticVariable([
-            TriangleFuzzySet(-0.75, -0.75, -0.25, term="LL"),
-            TriangleFuzzySet(-0.5, -0.25, -0.0, term="L"),
-            TriangleFuzzySet(-0.25, 0.0, 0.25, term="M"),
-            TriangleFuzzySet(0.0, 0.25, 0.5, term="H"),
-            TriangleFuzzySet(0.25, 0.75, 0.75, term="HH")
-        ]))
-        self.fuzzy_system.add_linguistic_variable("error_diff", LinguisticVariable([
-            TriangleFuzzySet(-0.6, -0.6, -0.05, term="CL"),
-            TriangleFuzzySet(-0.06, 0.0, 0.06, term="CM"),
-            TriangleFuzzySet(0.05, 0.6, 0.6, term="CH")
-        ]))
+        # Fuzzy sets as (a, b, c, term) triangles
+        self.error_sets = [
+            (-0.75, -0.75, -0.25, "LL"),
+            (-0.5, -0.25, -0.0, "L"),
+            (-0.25, 0.0, 0.25, "M"),
+            (0.0, 0.25, 0.5, "H"),
+            (0.25, 0.75, 0.75, "HH")
+        ]
+        self.error_diff_sets = [
+            (-0.6, -0.6, -0.05, "CL"),
+            (-0.06, 0.0, 0.06, "CM"),
+            (0.05, 0.6, 0.6, "CH")
+        ]
 
         mult = 1.0
 
         # Control variable
-        
-        self.fuzzy_system.add_linguistic_variable("signal", LinguisticVariable(
-            [
-                TriangleFuzzySet(-1.0 * mult, -1.0 * mult, -0.80 * mult,   term="PHHH"),
-                TriangleFuzzySet(-1.0 * mult, -0.80 * mult, -0.60 * mult,   term="PHH"),
-                TriangleFuzzySet(-0.80 * mult, -0.60 * mult, -0.40 * mult,   term="PH"),
-                TriangleFuzzySet(-0.60 * mult, -0.40 * mult, -0.20 * mult,  term="PMHH"),
-                TriangleFuzzySet(-0.40 * mult, -0.20 * mult, -0.00 * mult,  term="PMH"),
-                TriangleFuzzySet(-0.05 * mult, 0.0 * mult, 0.05 * mult,  term="PM"), # MIDDLE
-                TriangleFuzzySet(0.00 * mult, 0.2 * mult, 0.40 * mult,  term="PML"),
-                TriangleFuzzySet(0.20 * mult, 0.40 * mult, 0.60 * mult,  term="PMLL"),
-                TriangleFuzzySet(0.40 * mult, 0.60 * mult, 0.8 * mult, term="PL"),
-                TriangleFuzzySet(0.60 * mult, 0.80 * mult, 1.00 * mult, term="PLL"),
-                TriangleFuzzySet(0.8 * mult, 1.00 * mult, 1.00 * mult, term='PLLL')
-            ],
-            universe_of_discourse=[-1.0, 1.0]
-        ))
-
-        
-        self.fuzzy_system.add_rules([
+        self.signal_sets = [
+            (-1.0 * mult, -1.0 * mult, -0.80 * mult,   "PHHH"),
+            (-1.0 * mult, -0.80 * mult, -0.60 * mult,   "PHH"),
+            (-0.80 * mult, -0.60 * mult, -0.40 * mult,   "PH"),
+            (-0.60 * mult, -0.40 * mult, -0.20 * mult,  "PMHH"),
+            (-0.40 * mult, -0.20 * mult, -0.00 * mult,  "PMH"),
+            (-0.05 * mult, 0.0 * mult, 0.05 * mult,  "PM"), # MIDDLE
+            (0.00 * mult, 0.2 * mult, 0.40 * mult,  "PML"),
+            (0.20 * mult, 0.40 * mult, 0.60 * mult,  "PMLL"),
+            (0.40 * mult, 0.60 * mult, 0.8 * mult, "PL"),
+            (0.60 * mult, 0.80 * mult, 1.00 * mult, "PLL"),
+            (0.8 * mult, 1.00 * mult, 1.00 * mult, 'PLLL')
+        ]
+        self.signal_universe = [-1.0, 1.0]
+
+        self.rules = [
             "IF (error IS LL) THEN signal IS PHHH",
             "IF (error  IS L) AND (error_diff IS CL) THEN signal IS PHH",
             "IF (error IS L) AND (error_diff IS CM) THEN signal IS PH",
@@ -94,16 +174,29 @@ class Fuzzy_Controller:
             "IF (error IS H) AND (error_diff IS CM) THEN signal IS PL",
             "IF (error IS H) AND (error_diff IS CH) THEN signal IS PLL",
             "IF (error IS HH) THEN signal IS PLLL",
-            ])
+            ]
 
-        
+        self.fuzzy_system.add_linguistic_variable("error", LinguisticVariable(
+            [TriangleFuzzySet(a, b, c, term=term) for a, b, c, term in self.error_sets]
+        ))
+        self.fuzzy_system.add_linguistic_variable("error_diff", LinguisticVariable(
+            [TriangleFuzzySet(a, b, c, term=term) for a, b, c, term in self.error_diff_sets]
+        ))
+        self.fuzzy_system.add_linguistic_variable("signal", LinguisticVariable(
+            [TriangleFuzzySet(a, b, c, term=term) for a, b, c, term in self.signal_sets],
+            universe_of_discourse=self.signal_universe
+        ))
+        self.fuzzy_system.add_rules(self.rules)
 
-        
+        self.engine = Mamdani_Engine({"error": self.error_sets, "error_diff": self.error_diff_sets},
+                                     self.signal_sets, self.signal_universe, self.rules)
 
-    def reset(self, target_value : float = 10, init_value : float = 25 ,max_signal : int = MAX_WORK) -> None:
-        """Change parameters of the controller and reset measurements."""
+    def reset(self, target_value : float = 10, init_value : float = 25 ,max_signal : int = MAX_WORK,
+              steps : int = None) -> None:
+        """Change parameters of the controller and reset measurements (preallocated for provided steps)."""
         self.target_value = target_value
         self.max_signal = max_signal
-        self.errors = [(self.target_value - init_value)]
+        self.error = self.target_value - init_value
+        self.errors = allocate(get_capacity(steps), self.error)
+        self.samples = 1
         self.change=0
-        
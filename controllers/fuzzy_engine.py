@@ -0,0 +1,121 @@
+"""Vectorized Mamdani inference engine for triangular fuzzy sets."""
+
+import re
+
+import numpy as np
+
+def get_memberships(values : np.ndarray, a : float, b : float, c : float) -> np.ndarray:
+    '''
+    Membership of values to triangle (a, b, c), same semantics as simpful's Triangular_MF.
+    :param values: points of the universe of discourse.
+    :param a: leftmost vertex.
+    :param b: upper vertex.
+    :param c: rightmost vertex.
+    '''
+    left = (values - a) * (1 / (b - a)) if a != b else np.ones_like(values)
+    right = 1 + (values - b) * (-1 / (c - b)) if b != c else np.ones_like(values)
+    return np.clip(np.where(values < b, left, right), 0, 1)
+
+class Mamdani_Engine:
+    '''
+    Mamdani inference (min implication, max aggregation, centroid defuzzification) evaluated
+    for whole batches of inputs at once.
+    :param input_sets: input variable name -> list of (a, b, c, term) triangles.
+    :param output_sets: list of (a, b, c, term) triangles of the output variable.
+    :param output_universe: [low, high] universe of discourse of the output variable.
+    :param rules: rule strings in simpful syntax, e.g. "IF (error IS L) AND (error_diff IS CM) THEN signal IS PH".
+    :param subdivisions: number of integration points used for defuzzification (simpful default).
+    '''
+    def __init__(self, input_sets : dict, output_sets : list, output_universe : list, rules : list,
+                 subdivisions : int = 1000) -> None:
+        self.input_sets = {name: {term: (a, b, c) for a, b, c, term in sets} for name, sets in input_sets.items()}
+        self.integration_points = np.linspace(output_universe[0], output_universe[1], subdivisions)
+        self.output_memberships = {term: get_memberships(self.integration_points, a, b, c)
+                                   for a, b, c, term in output_sets}
+        self.rules = [self.parse_rule(rule) for rule in rules]
+
+    def parse_rule(self, rule : str) -> tuple:
+        '''
+        Parse rule into (antecedent tree, output term).
+        :param rule: rule string.
+        '''
+        match = re.fullmatch(r"\s*IF\s+(.+)\s+THEN\s+\w+\s+IS\s+(\w+)\s*", rule)
+        if match is None:
+            raise Exception(f"ERROR: badly formatted rule: {rule}")
+        tokens = re.findall(r"\(|\)|\w+", match.group(1))
+        antecedent, position = self.parse_expression(tokens, 0)
+        if position != len(tokens):
+            raise Exception(f"ERROR: unexpected token in rule: {rule}")
+        if match.group(2) not in self.output_memberships:
+            raise Exception(f"ERROR: unknown output term '{match.group(2)}' in rule: {rule}")
+        return antecedent, match.group(2)
+
+    def parse_expression(self, tokens : list, position : int) -> tuple:
+        '''
+        Parse chain of AND/OR operations, evaluated left to right.
+        :param tokens: antecedent tokens.
+        :param position: index of the first token of the expression.
+        '''
+        node, position = self.parse_operand(tokens, position)
+        while position < len(tokens) and tokens[position] in ("AND", "OR"):
+            operand, next_position = self.parse_operand(tokens, position + 1)
+            node, position = (tokens[position], node, operand), next_position
+        return node, position
+
+    def parse_operand(self, tokens : list, position : int) -> tuple:
+        '''
+        Parse negation, clause "(variable IS term)" or parenthesised expression.
+        :param tokens: antecedent tokens.
+        :param position: index of the first token of the operand.
+        '''
+        if tokens[position] == "NOT":
+            operand, position = self.parse_operand(tokens, position + 1)
+            return ("NOT", operand), position
+        if tokens[position] != "(":
+            raise Exception(f"ERROR: expected '(' in rule, got '{tokens[position]}'")
+        if tokens[position + 2:position + 5:2] == ["IS", ")"]:
+            variable, term = tokens[position + 1], tokens[position + 3]
+            if term not in self.input_sets.get(variable, {}):
+                raise Exception(f"ERROR: unknown clause '{variable} IS {term}'")
+            return ("IS", variable, term), position + 5
+        node, position = self.parse_expression(tokens, position + 1)
+        if position >= len(tokens) or tokens[position] != ")":
+            raise Exception("ERROR: missing ')' in rule")
+        return node, position + 1
+
+    def evaluate(self, node : tuple, inputs : dict, memberships : dict) -> np.ndarray:
+        '''
+        Evaluate antecedent tree for the whole batch.
+        :param node: antecedent tree.
+        :param inputs: variable name -> array of input values.
+        :param memberships: cache of already computed clause memberships.
+        '''
+        if node[0] == "IS":
+            if node[1:] not in memberships:
+                memberships[node[1:]] = get_memberships(inputs[node[1]], *self.input_sets[node[1]][node[2]])
+            return memberships[node[1:]]
+        if node[0] == "NOT":
+            return 1. - self.evaluate(node[1], inputs, memberships)
+        operation = np.minimum if node[0] == "AND" else np.maximum
+        return operation(self.evaluate(node[1], inputs, memberships), self.evaluate(node[2], inputs, memberships))
+
+    def infer(self, **inputs) -> np.ndarray:
+        '''
+        Run inference for batch of inputs, e.g. infer(error=errors, error_diff=error_diffs).
+        Returns 0 for inputs that fire no rule, as simpful does.
+        :param inputs: variable name -> scalar or array of input values.
+        '''
+        inputs = {name: np.asarray(value, dtype=np.float64) for name, value in inputs.items()}
+        shape = np.broadcast_shapes(*[value.shape for value in inputs.values()])
+        inputs = {name: np.broadcast_to(value, shape).ravel() for name, value in inputs.items()}
+
+        memberships = {}
+        aggregated = np.zeros((int(np.prod(shape)), len(self.integration_points)))
+        for antecedent, term in self.rules:
+            cut = self.evaluate(antecedent, inputs, memberships)
+            np.maximum(aggregated, np.minimum(cut[:, None], self.output_memberships[term]), out=aggregated)
+
+        area = aggregated.sum(axis=1)
+        moment = (aggregated * self.integration_points).sum(axis=1)
+        centroid = np.divide(moment, area, out=np.zeros_like(area), where=area != 0.0)
+        return centroid.reshape(shape)
@@ -0,0 +1,137 @@
+"""Precompiled lookup-table surface for the fuzzy controller."""
+
+from bisect import bisect_right
+
+import numpy as np
+
+def get_axis(breakpoints : list, subdivisions : int) -> list:
+    '''
+    Build grid axis containing every breakpoint and evenly spaced points between them.
+    Keeping the breakpoints on the grid keeps kinks of the membership functions on cell edges.
+    :param breakpoints: membership function vertices of the input variable.
+    :param subdivisions: number of grid cells between two neighbouring breakpoints.
+    '''
+    points = sorted(set(breakpoints))
+    axis = [points[0]]
+    for low, high in zip(points[:-1], points[1:]):
+        axis += [low + (high - low) * step / subdivisions for step in range(1, subdivisions + 1)]
+    return axis
+
+class Fuzzy_Table:
+    '''
+    Fuzzy inference surface sampled on (error, error_diff) grid, served by bilinear interpolation.
+    Inputs outside the grid are clamped to its edges, which is exact as long as the grid spans
+    all breakpoints of the input fuzzy sets (memberships are constant outside of them).
+    :param error_axis: increasing grid points of the error input.
+    :param error_diff_axis: increasing grid points of the error_diff input.
+    :param values: inference results shaped (len(error_axis), len(error_diff_axis)).
+    '''
+    def __init__(self, error_axis : list, error_diff_axis : list, values : list) -> None:
+        self.error_axis = list(error_axis)
+        self.error_diff_axis = list(error_diff_axis)
+        self.values = np.asarray(values, dtype=np.float64)
+        # Nested lists are much faster than numpy indexing for the scalar per-step lookup
+        self.rows = self.values.tolist()
+        self.max_deviation = None
+
+    @classmethod
+    def compile(cls, inference, error_axis : list, error_diff_axis : list):
+        '''
+        Evaluate inference on every grid node in one batch.
+        :param inference: function (errors, error_diffs) -> signals working on arrays.
+        :param error_axis: increasing grid points of the error input.
+        :param error_diff_axis: increasing grid points of the error_diff input.
+        '''
+        errors, error_diffs = np.meshgrid(error_axis, error_diff_axis, indexing="ij")
+        return cls(error_axis, error_diff_axis, inference(errors, error_diffs))
+
+    @staticmethod
+    def locate(axis : list, value : float) -> tuple:
+        '''
+        Find grid cell and interpolation weight of the value.
+        :param axis: increasing grid points.
+        :param value: input value.
+        '''
+        if value <= axis[0]:
+            return 0, 0.0
+        if value >= axis[-1]:
+            return len(axis) - 2, 1.0
+        idx = bisect_right(axis, value) - 1
+        return idx, (value - axis[idx]) / (axis[idx + 1] - axis[idx])
+
+    def get_value(self, error : float, error_diff : float) -> float:
+        '''
+        Get interpolated inference result for single input.
+        :param error: normalized control error.
+        :param error_diff: change of the normalized control error.
+        '''
+        row, row_weight = self.locate(self.error_axis, error)
+        col, col_weight = self.locate(self.error_diff_axis, error_diff)
+        top, bottom = self.rows[row], self.rows[row + 1]
+        upper = top[col] + col_weight * (top[col + 1] - top[col])
+        lower = bottom[col] + col_weight * (bottom[col + 1] - bottom[col])
+        return upper + row_weight * (lower - upper)
+
+    def get_values(self, errors, error_diffs) -> np.ndarray:
+        '''
+        Get interpolated inference results for arrays of inputs.
+        :param errors: normalized control errors.
+        :param error_diffs: changes of the normalized control errors.
+        '''
+        rows, row_weights = self.locate_all(np.asarray(self.error_axis), errors)
+        cols, col_weights = self.locate_all(np.asarray(self.error_diff_axis), error_diffs)
+        top_left, top_right = self.values[rows, cols], self.values[rows, cols + 1]
+        bottom_left, bottom_right = self.values[rows + 1, cols], self.values[rows + 1, cols + 1]
+        upper = top_left + col_weights * (top_right - top_left)
+        lower = bottom_left + col_weights * (bottom_right - bottom_left)
+        return upper + row_weights * (lower - upper)
+
+    @staticmethod
+    def locate_all(axis : np.ndarray, values) -> tuple:
+        '''
+        Vectorized counterpart of locate.
+        :param axis: increasing grid points.
+        :param values: input values.
+        '''
+        values = np.clip(np.asarray(values, dtype=np.float64), axis[0], axis[-1])
+        idx = np.clip(np.searchsorted(axis, values, side="right") - 1, 0, len(axis) - 2)
+        return idx, (values - axis[idx]) / (axis[idx + 1] - axis[idx])
+
+    def measure_deviation(self, inference, samples : int = None, seed : int = 0) -> float:
+        '''
+        Compare table against exact inference and store the maximum absolute deviation found so far.
+        By default the middle of every grid cell is compared, where bilinear interpolation is furthest
+        from the sampled nodes. For slow inference only samples randomly picked grid nodes and as many
+        random points inside random cells are compared, nodes also catch inference differing from
+        the one the table was compiled with.
+        :param inference: function (errors, error_diffs) -> signals working on arrays.
+        :param samples: number of compared nodes and of compared points inside the cells (middle of every cell if None).
+        :param seed: seed of the random generator picking the points.
+        '''
+        error_axis, error_diff_axis = np.asarray(self.error_axis), np.asarray(self.error_diff_axis)
+        if samples is None:
+            errors, error_diffs = (grid.ravel() for grid in
+                                   np.meshgrid((error_axis[:-1] + error_axis[1:]) / 2,
+                                               (error_diff_axis[:-1] + error_diff_axis[1:]) / 2, indexing="ij"))
+        else:
+            rng = np.random.default_rng(seed)
+            rows = rng.integers(0, len(error_axis), samples)
+            cols = rng.integers(0, len(error_diff_axis), samples)
+            errors = np.concatenate([error_axis[rows], self.get_cell_points(rng, error_axis, samples)])
+            error_diffs = np.concatenate([error_diff_axis[cols], self.get_cell_points(rng, error_diff_axis, samples)])
+        deviation = float(np.max(np.abs(np.asarray(inference(errors, error_diffs)) -
+                                        self.get_values(errors, error_diffs))))
+        self.max_deviation = deviation if self.max_deviation is None else max(self.max_deviation, deviation)
+        return self.max_deviation
+
+    @staticmethod
+    def get_cell_points(rng : np.random.Generator, axis : np.ndarray, samples : int) -> np.ndarray:
+        '''
+        Random points strictly inside random cells of the axis.
+        :param rng: random generator.
+        :param axis: increasing grid points.
+        :param samples: number of points.
+        '''
+        cells = rng.integers(0, len(axis) - 1, samples)
+        weights = rng.uniform(0.05, 0.95, samples)
+        return axis[cells] + weights * (axis[cells + 1] - axis[cells])
@@ -1,5 +1,6 @@
 """PID controller component."""
-from constants import SAMPLING
+from buffers import allocate, carry_over, get_capacity, get_view, grow
+from constants import SAMPLING, REFRIGERATOR_SIGNAL_LIMIT
 
 class PID_Controller:
     '''
@@ -8,10 +9,21 @@ class PID_Controller:
     :param proportional_coefficient: proportional coefficient of controller.
     :param integral_coefficient: integral coefficient of controller.
     :param derivative_coefficient: derivative coefficient of controller
+    :param anti_windup: stop integrating while the output is saturated in the direction of the error.
+    :param integral_limit: maximum absolute value of the accumulated error (None disables the clamp).
+    :param min_signal: lower saturation limit used by anti-windup.
+    :param max_signal: upper saturation limit used by anti-windup.
     '''
+    __slots__ = ("target_value", "proportional_gain", "reset_time", "derivative_time",
+                 "anti_windup", "integral_limit", "min_signal", "max_signal", "sums", "error",
+                 "samples", "errors")
+
     def __init__(self, target_value : float = 10, init_value : float = 25, proportional_gain : float = 1.0,
-                 reset_time : float  = 1.0, derivative_time : float  = 1.0) -> None:
-        self.reset(target_value, init_value, proportional_gain, reset_time, derivative_time)
+                 reset_time : float  = 1.0, derivative_time : float  = 1.0, anti_windup : bool = False,
+                 integral_limit : float = None, min_signal : float = -REFRIGERATOR_SIGNAL_LIMIT,
+                 max_signal : float = REFRIGERATOR_SIGNAL_LIMIT) -> None:
+        self.reset(target_value, init_value, proportional_gain, reset_time, derivative_time, anti_windup,
+                   integral_limit, min_signal, max_signal)
 
     def __str__(self) -> str:
         return "PID"
@@ -23,22 +35,76 @@ class PID_Controller:
         :param last_time: latest measurement time.
         :param time_before_that: measurement time right before list_time.
         '''
-        self.errors.append(self.target_value - last_value)
-        integral_part = (SAMPLING / self.reset_time) * sum(self.errors)
-        derivative_part = (self.derivative_time / SAMPLING) * (self.errors[-1] - self.errors[-2])
-        return self.proportional_gain * (self.errors[-1] + integral_part + derivative_part)
+        error = self.target_value - last_value
+        samples = self.samples
+        try:
+            self.errors[samples] = error
+        except IndexError:
+            # Run is longer than preallocated
+            self.errors = grow(self.errors)
+            self.errors[samples] = error
+        self.samples = samples + 1
+        previous_sums = self.sums
+        self.sums = self.sums + error
+        if self.integral_limit is not None:
+            self.sums = self.clamp_integral(self.sums)
+        derivative_part = (self.derivative_time / SAMPLING) * (error - self.error)
+        signal = self.proportional_gain * (error + (SAMPLING / self.reset_time) * self.sums + derivative_part)
+
+        if self.anti_windup and self.is_winding_up(signal, error):
+            # Conditional integration: keep the accumulator where it was while saturated
+            self.sums = previous_sums
+            signal = self.proportional_gain * (error + (SAMPLING / self.reset_time) * self.sums + derivative_part)
+        self.error = error
+        return signal
+
+    def clamp_integral(self, sums : float) -> float:
+        '''
+        Clamp accumulated error to the configured integral limit.
+        :param sums: accumulated error to clamp.
+        '''
+        if self.integral_limit is None:
+            return sums
+        return max(-self.integral_limit, min(self.integral_limit, sums))
+
+    def is_winding_up(self, signal : float, error : float) -> bool:
+        '''
+        Check if integrating the error would push the saturated output further out of bounds.
+        :param signal: unsaturated controller output.
+        :param error: latest control error.
+        '''
+        direction = error * self.proportional_gain
+        return (signal > self.max_signal and direction > 0) or (signal < self.min_signal and direction < 0)
 
     def get_errors(self) -> list:
-        """Get all measurement errors detected by controller."""
-        return self.errors
+        """Get all measurement errors detected by controller (view of the error buffer)."""
+        return get_view(self.errors, self.samples)
+
+    def discard_measurements(self, steps : int = None) -> None:
+        '''
+        Drop recorded measurements except the latest one, which becomes the first sample.
+        :param steps: number of following steps to preallocate measurements for.
+        '''
+        self.errors = carry_over(self.errors, self.samples, get_capacity(steps))
+        self.samples = 1
 
     def reset(self, target_value : float = 10, init_value : float = 25, proportional_gain : float = 1.0,
-              reset_time : float  = 0.01, derivative_time : float  = 0.0) -> None:
-        """Change parameters of the controller and reset measurements."""
+              reset_time : float  = 0.01, derivative_time : float  = 0.0, anti_windup : bool = False,
+              integral_limit : float = None, min_signal : float = -REFRIGERATOR_SIGNAL_LIMIT,
+              max_signal : float = REFRIGERATOR_SIGNAL_LIMIT,
+              steps : int = None) -> None:
+        """Change parameters of the controller and reset measurements (preallocated for provided steps)."""
 
         self.target_value = target_value
-        self.errors = [target_value - init_value]
+        self.error = target_value - init_value
+        self.errors = allocate(get_capacity(steps), self.error)
+        self.samples = 1
         self.proportional_gain = proportional_gain
         self.reset_time = reset_time
         self.derivative_time = derivative_time
-        self.sums = 0
+        self.anti_windup = anti_windup
+        self.integral_limit = integral_limit
+        self.min_signal = min_signal
+        self.max_signal = max_signal
+        # Running sum of errors, replaces sum(self.errors) on every step
+        self.sums = self.clamp_integral(self.error)
@@ -1,49 +1,244 @@
 """Database connection driver."""
 
+import hashlib
+import json
 import sqlite3
+import threading
+import zlib
 
 from datetime import datetime
+from itertools import islice
+
+import numpy as np
+
+from constants import MEASUREMENTS_CHUNK_SIZE, SAMPLING, SIMULATION_TIME, MIN_WORK, MAX_WORK, WATER_MASS, \
+    WATER_SPECIFIC_HEAT, RESERVOIR_HOT, RESERVOIR_COLD, REFRIGERATOR_SIGNAL_LIMIT
+from metrics import METRICS, get_metrics
+
+# Applied to every new connection: WAL lets readers work while a writer commits, NORMAL sync is
+# safe with WAL, page cache of 64 MB and memory-mapped reads of up to 256 MB
+CONNECTION_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY"
+]
+# Number of compiled statements kept per connection (all queries are parameterized, so they are reused)
+CACHED_STATEMENTS = 256
+
+def get_config_key(param_1 : float, param_2 : float, param_3 : float, target_value : float,
+                   controller_type : str, init_value : float = None, stop_conditions : list = None) -> str:
+    '''
+    Get canonical hash identifying simulation configuration, including simulation and process
+    constants so results computed with different constants never collide. Parameters not used
+    by the controller are left out, so they do not create distinct configurations. Simulations
+    run with stop conditions may end early, so their settings are part of the key and such
+    simulations never share it with complete ones.
+    :param param_1: first parameter (only for PI and PID)
+    :param param_2: second parameter (only for PI and PID)
+    :param param_3: third parameter (only for PID)
+    :param target_value: target value of the simulation
+    :param controller_type: controller used in simulation
+    :param init_value: initial value of the simulation
+    :param stop_conditions: stop conditions the simulation was run with (see sweep.get_stop_conditions)
+    '''
+    params = [param_1 if controller_type != 'Fuzzy' else None,
+              param_2 if controller_type != 'Fuzzy' else None,
+              param_3 if controller_type == 'PID' else None]
+    config = {
+        "controller_type": controller_type,
+        "params": [None if param is None else float(param) for param in params],
+        "init_value": None if init_value is None else float(init_value),
+        "target_value": float(target_value),
+        "simulation": [SAMPLING, SIMULATION_TIME],
+        "process": [MIN_WORK, MAX_WORK, REFRIGERATOR_SIGNAL_LIMIT, WATER_MASS, WATER_SPECIFIC_HEAT, RESERVOIR_HOT,
+                    RESERVOIR_COLD]
+    }
+    if stop_conditions:
+        config["stop_conditions"] = [[type(condition).__name__, condition.get_settings()]
+                                     for condition in stop_conditions]
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
 
 class Database:
     '''
     Database class for communication with sqlite3 database.
     :param dbpath: file location of the database
+    :param storage: "rows" stores one Measurements row per sample, "blob" stores every trajectory
+    channel as one packed array in Trajectories
+    :param blob_dtype: array type of stored trajectories ("float64" or "float32")
+    :param compress: compress stored trajectories with byte shuffle and zlib
     '''
-    def __init__(self, dbpath):
+    def __init__(self, dbpath, storage : str = "rows", blob_dtype : str = "float64", compress : bool = False):
         self.dbpath = dbpath
+        self.storage = storage
+        self.blob_dtype = blob_dtype
+        self.compress = compress
+        self.local = threading.local()
+        self.connections = []
+        self.connections_lock = threading.Lock()
         self.create_tables()
 
     def get_connection(self):
         '''
-        Get SQLite connection object.
+        Get SQLite connection object. Every thread keeps its own persistent connection,
+        opened on first use, so callers must not close it (see close).
         '''
-        conn = None
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            return conn
         try:
-            conn = sqlite3.connect(self.dbpath, check_same_thread=False)
+            conn = sqlite3.connect(self.dbpath, check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
         except sqlite3.Error as error:
             print(f"Sqlite error in get_connection: {error}")
+            return conn
+        self.local.conn = conn
+        with self.connections_lock:
+            self.connections.append(conn)
         return conn
 
+    def close(self) -> None:
+        '''
+        Close connections of all threads, next call of get_connection opens new ones.
+        '''
+        with self.connections_lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections = []
+        self.local = threading.local()
+
     def create_tables(self):
         '''
-        Create required sqlite3 tables.
+        Create required sqlite3 tables and indexes, upgrading schema of existing database if needed.
         '''
         conn = self.get_connection()
         try:
             cur = conn.cursor()
             with open("database_script.sql") as script:
                 cur.executescript(script.read())
+            self.upgrade_schema(conn)
+            with open("database_indexes.sql") as script:
+                cur.executescript(script.read())
             conn.commit()
             cur.close()
         except sqlite3.Error as error:
             print(f"Erron in create_tables: {error}")
+
+    def upgrade_schema(self, conn) -> None:
+        '''
+        Add columns missing in databases created by older versions, compute configuration keys and metrics
+        of stored simulations (all of them ran to the end).
+        Simulations stored before init_value was recorded get keys that never match new runs.
+        If the same configuration is stored more than once, only the latest simulation gets the key,
+        older duplicates are kept without it.
+        :param conn: database connection object
+        '''
+        cur = conn.cursor()
+        cur.execute("PRAGMA table_info(Simulations)")
+        columns = [column[1] for column in cur.fetchall()]
+        missing = [column for column in ["init_value", "config_key"] if column not in columns]
+        missing_metrics = [metric for metric in METRICS if metric not in columns]
+        for metric in missing_metrics:
+            cur.execute(f"ALTER TABLE Simulations ADD COLUMN {metric} REAL NULL")
+        for column in [column for column in ["stop_reason", "stop_time"] if column not in columns]:
+            cur.execute(f"ALTER TABLE Simulations ADD COLUMN {column} {'TEXT' if column == 'stop_reason' else 'REAL'} NULL")
+        if missing_metrics:
+            self.compute_metrics(conn)
+        if not missing:
+            conn.commit()
+            cur.close()
+            return
+        for column in missing:
+            cur.execute(f"ALTER TABLE Simulations ADD COLUMN {column} {'REAL' if column == 'init_value' else 'TEXT'} NULL")
+        cur.execute(
+            "SELECT simulation_id, param_1, param_2, param_3, target_value, controller_type, init_value "
+            "FROM Simulations ORDER BY simulation_date DESC, simulation_time DESC, simulation_id DESC"
+        )
+        keys = {}
+        for sim_id, param_1, param_2, param_3, target_value, controller_type, init_value in cur.fetchall():
+            keys.setdefault(get_config_key(param_1, param_2, param_3, target_value, controller_type, init_value),
+                            sim_id)
+        cur.execute("UPDATE Simulations SET config_key = NULL")
+        cur.executemany("UPDATE Simulations SET config_key = ? WHERE simulation_id = ?", keys.items())
+        conn.commit()
+        cur.close()
+
+    def compute_metrics(self, conn, batch_size : int = 256) -> int:
+        '''
+        Compute metrics of stored simulations that have none from their measurements, committing is left
+        to the caller. Returns number of updated simulations.
+        :param conn: database connection object
+        :param batch_size: number of simulations whose measurements are loaded at once
+        '''
+        updated = 0
+        try:
+            cur = conn.cursor()
+            cur.execute(f"SELECT simulation_id, target_value FROM Simulations WHERE {METRICS[0]} IS NULL")
+            targets = dict(cur.fetchall())
+            sim_ids = list(targets)
+            for idx in range(0, len(sim_ids), batch_size):
+                batch = sim_ids[idx:idx + batch_size]
+                results = self.get_trajectories(cur, batch)
+                missing_ids = [sim_id for sim_id in batch if sim_id not in results]
+                if missing_ids:
+                    results.update(self.get_measurements(cur, missing_ids))
+                for sim_id, result in results.items():
+                    if self.update_metrics(conn, sim_id, get_metrics(result, targets[sim_id])):
+                        updated += 1
+        except sqlite3.Error as error:
+            print(f"Error in compute_metrics: {error}")
         finally:
-            conn.close()
+            cur.close()
+        return updated
+
+    def update_metrics(self, conn, sim_id : int, metrics : dict) -> bool:
+        '''
+        Store metrics of the simulation, committing is left to the caller.
+        :param conn: database connection object
+        :param sim_id: id of the simulation
+        :param metrics: metrics of the simulation keyed by METRICS
+        '''
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                f"UPDATE Simulations SET {', '.join(f'{metric} = ?' for metric in METRICS)} WHERE simulation_id = ?",
+                [metrics[metric] for metric in METRICS] + [sim_id]
+            )
+        except sqlite3.Error as error:
+            print(f"Error in update_metrics: {error}")
+            return False
+        finally:
+            cur.close()
+        return True
+
+    def update_stop(self, conn, sim_id : int, stop_reason : str, stop_time : float) -> bool:
+        '''
+        Mark the simulation as stopped early, committing is left to the caller.
+        :param conn: database connection object
+        :param sim_id: id of the simulation
+        :param stop_reason: reason the simulation was stopped
+        :param stop_time: time of the latest stored sample
+        '''
+        try:
+            cur = conn.cursor()
+            cur.execute("UPDATE Simulations SET stop_reason = ?, stop_time = ? WHERE simulation_id = ?",
+                        (stop_reason, stop_time, sim_id))
+        except sqlite3.Error as error:
+            print(f"Error in update_stop: {error}")
+            return False
+        finally:
+            cur.close()
+        return True
 
     def insert_simulation(self, conn, param_1 : float, param_2 : float, param_3 : float,
-                        target_value : float, controller_type : str) -> list:
+                        target_value : float, controller_type : str, init_value : float = None,
+                        metrics : dict = None, stop_reason : str = None, stop_time : float = None,
+                        stop_conditions : list = None) -> list:
         '''
-        Insert simulation data into database.
+        Insert simulation data into database, committing is left to the caller.
+        Returns [True, None] if simulation with the same configuration is already stored.
         Because SQLite does not support variable amount of columns, number of columns is max of required parameters
         by any controller (so 3 because PID requires P, I and D).
         :param conn: database connection object
@@ -52,25 +247,33 @@ class Database:
         :param param_3: third parameter (only for PID)
         :target_value: target value of the simulation
         :controller_type: controller used in simulation
+        :init_value: initial value of the simulation
+        :metrics: metrics of the simulation keyed by METRICS (left empty if None)
+        :stop_reason: reason the simulation was stopped early (None if it ran to the end)
+        :stop_time: time the simulation was stopped at
+        :stop_conditions: stop conditions the simulation was run with (part of the configuration key)
         '''
         now = datetime.now()
         sim_id = -1
+        metrics = metrics or {}
         try:
             cur = conn.cursor()
             cur.execute(
-                f"INSERT INTO Simulations"
-                f"(simulation_date, simulation_time, param_1, "
-                f"param_2,param_3, target_value, controller_type)"
-                f"VALUES ("
-                f"{now.strftime('%Y%m%d')}, {now.strftime('%H%M%S')},"
-                f"{param_1 if param_1 is not None and controller_type != 'Fuzzy' else 'NULL'},"
-                f"{param_2 if param_2 is not None and controller_type != 'Fuzzy' else 'NULL'},"
-                f"{param_3 if param_3 is not None and controller_type == 'PID' else 'NULL'},"
-                f"{target_value}, '{controller_type}'"
-                f")"
+                "INSERT INTO Simulations"
+                "(simulation_date, simulation_time, param_1, "
+                f"param_2,param_3, target_value, controller_type, init_value, config_key, {', '.join(METRICS)}, "
+                "stop_reason, stop_time)"
+                f"VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?{', ?' * len(METRICS)}, ?, ?) ON CONFLICT(config_key) DO NOTHING",
+                (int(now.strftime('%Y%m%d')), int(now.strftime('%H%M%S')),
+                 param_1 if controller_type != 'Fuzzy' else None,
+                 param_2 if controller_type != 'Fuzzy' else None,
+                 param_3 if controller_type == 'PID' else None,
+                 target_value, controller_type, init_value,
+                 get_config_key(param_1, param_2, param_3, target_value, controller_type, init_value,
+                                stop_conditions),
+                 *[metrics.get(metric) for metric in METRICS], stop_reason, stop_time)
             )
-            conn.commit()
-            sim_id = cur.lastrowid
+            sim_id = cur.lastrowid if cur.rowcount == 1 else None
         except sqlite3.Error as error:
             print(f"Error in insert_simulation: {error}")
             return [False, -1]
@@ -78,24 +281,29 @@ class Database:
             cur.close()
         return [True, sim_id]
 
-    def insert_measurements(self, conn, sim_id : int, measurements : list) -> bool:
+    def insert_measurements(self, conn, sim_id : int, measurements : list,
+                            chunk_size : int = MEASUREMENTS_CHUNK_SIZE) -> bool:
         '''
-        Insert simulation measurements into database.
+        Insert simulation measurements into database with parameterized executemany in chunks,
+        committing is left to the caller.
         :param conn: database connection object
         :param sim_id: id of the simulation the measurements belong to
         :param measurements: list of simulation display results
+        :param chunk_size: number of rows passed to single executemany call
         '''
-        insert_query = ("INSERT INTO Measurements "
-                        "(simulation_id, measurement_time, measurement_value, measurement_signal,"
-                        "measurement_response, error) VALUES ")
-        for idx, time_measurement in enumerate(measurements[0]):
-            insert_query += f"""({sim_id}, {time_measurement}, {measurements[1][idx]}, {measurements[2][idx]},
-                            {measurements[3][idx]}, {measurements[4][idx]}), """
-        insert_query = insert_query[:-2]
+        rows = zip([sim_id] * len(measurements[0]), *measurements[:5])
+        cur = conn.cursor()
         try:
-            cur = conn.cursor()
-            cur.execute(insert_query)
-            conn.commit()
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                cur.executemany(
+                    "INSERT INTO Measurements "
+                    "(simulation_id, measurement_time, measurement_value, measurement_signal,"
+                    "measurement_response, error) VALUES (?, ?, ?, ?, ?, ?)",
+                    chunk
+                )
         except sqlite3.Error as error:
             print(f"Error in insert_measurements: {error}")
             return False
@@ -103,7 +311,114 @@ class Database:
             cur.close()
         return True
 
-    def simulation_exists(self, param_1 : float, param_2 : float, param_3 : float, target_value : float, controller_type : str) -> bool:
+    def insert_trajectory(self, conn, sim_id : int, measurements : list) -> bool:
+        '''
+        Insert simulation measurements into database as one packed array per channel,
+        committing is left to the caller.
+        :param conn: database connection object
+        :param sim_id: id of the simulation the measurements belong to
+        :param measurements: list of simulation display results
+        '''
+        channels = [np.ascontiguousarray(channel, dtype=self.blob_dtype) for channel in measurements[:5]]
+        if self.compress:
+            # Grouping n-th bytes of all values together (byte shuffle) makes smooth signals compress far better
+            channels = [zlib.compress(channel.view(np.uint8).reshape(-1, channel.itemsize).T.tobytes())
+                        for channel in channels]
+        else:
+            channels = [channel.tobytes() for channel in channels]
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "INSERT INTO Trajectories "
+                "(simulation_id, sample_count, dtype, compression, measurement_time, measurement_value,"
+                "measurement_signal, measurement_response, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [sim_id, len(measurements[0]), self.blob_dtype, "shuffle-zlib" if self.compress else None] + channels
+            )
+        except sqlite3.Error as error:
+            print(f"Error in insert_trajectory: {error}")
+            return False
+        finally:
+            cur.close()
+        return True
+
+    def get_trajectories(self, cur, sim_ids : list) -> dict:
+        '''
+        Get measurements of simulations stored as packed arrays with a single query, uncompressed
+        arrays are read-only views of the fetched blobs (no copy). Simulations not stored in
+        Trajectories are left out of the result.
+        :param cur: database cursor object
+        :param sim_ids: ids of the simulations
+        '''
+        cur.execute(
+            f"SELECT simulation_id, dtype, compression, measurement_time, measurement_value, measurement_signal,"
+            f"measurement_response, error FROM Trajectories WHERE simulation_id IN ({', '.join('?' * len(sim_ids))})",
+            sim_ids
+        )
+        trajectories = {}
+        for row in cur.fetchall():
+            if row[2] is None:
+                trajectories[row[0]] = [np.frombuffer(blob, dtype=row[1]) for blob in row[3:]]
+                continue
+            itemsize = np.dtype(row[1]).itemsize
+            trajectories[row[0]] = [
+                np.ascontiguousarray(np.frombuffer(zlib.decompress(blob), dtype=np.uint8).reshape(itemsize, -1).T)
+                .view(row[1]).ravel() for blob in row[3:]
+            ]
+        return trajectories
+
+    def get_measurements(self, cur, sim_ids : list) -> dict:
+        '''
+        Get measurement rows of simulations with a single query and split them into per-channel arrays.
+        Simulations without measurement rows are left out of the result.
+        :param cur: database cursor object
+        :param sim_ids: ids of the simulations
+        '''
+        cur.execute(
+            f"SELECT simulation_id, measurement_time, measurement_value, measurement_signal, measurement_response,"
+            f"error FROM Measurements WHERE simulation_id IN ({', '.join('?' * len(sim_ids))})",
+            sim_ids
+        )
+        rows = np.array(cur.fetchall(), dtype=np.float64).reshape(-1, 6)
+        # Sorting here is much cheaper than ORDER BY building a temporary B-tree in SQLite
+        rows = rows[np.lexsort((rows[:, 1], rows[:, 0]))]
+        # Rows are sorted by simulation, so every simulation is one contiguous block
+        bounds = np.flatnonzero(np.diff(rows[:, 0])) + 1
+        return {int(block[0, 0]): list(np.ascontiguousarray(block[:, 1:].T))
+                for block in np.split(rows, bounds) if len(block) > 0}
+
+    def migrate_measurements(self, vacuum : bool = True) -> int:
+        '''
+        Move every simulation stored in Measurements rows into Trajectories, using blob_dtype and
+        compress of this database object. Returns number of migrated simulations.
+        :param vacuum: reclaim space freed by deleted rows
+        '''
+        conn = self.get_connection()
+        migrated = 0
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT DISTINCT simulation_id FROM Measurements")
+            for (sim_id,) in cur.fetchall():
+                cur.execute(
+                    "SELECT measurement_time, measurement_value, measurement_signal, measurement_response,"
+                    "error FROM Measurements WHERE simulation_id = ? ORDER BY measurement_time",
+                    (sim_id,)
+                )
+                measurements = np.array(cur.fetchall(), dtype=np.float64).T
+                if not self.insert_trajectory(conn, sim_id, measurements):
+                    conn.rollback()
+                    continue
+                cur.execute("DELETE FROM Measurements WHERE simulation_id = ?", (sim_id,))
+                conn.commit()
+                migrated += 1
+            cur.close()
+            if vacuum:
+                conn.execute("VACUUM")
+        except sqlite3.Error as error:
+            print(f"Error in migrate_measurements: {error}")
+        return migrated
+
+    def simulation_exists(self, param_1 : float, param_2 : float, param_3 : float, target_value : float, controller_type : str,
+                          init_value : float = None, stop_conditions : list = None) -> bool:
         '''
         Check if simulation using provided parameters already exists in the database.
         :param param_1: first parameter (only for PI and PID)
@@ -111,38 +426,28 @@ class Database:
         :param param_3: third parameter (only for PID)
         :param target_value: target value of the simulation
         :param controller_type: controller used in simulation
+        :param init_value: initial value of the simulation
+        :param stop_conditions: stop conditions the simulation was run with
         '''
         conn = self.get_connection()
-        test_query = ""
-        if controller_type == "PI":
-            test_query += (
-                f"SELECT * FROM Simulations WHERE param_1 = {float(param_1)} AND param_2 "
-                f" = {float(param_2)} AND param_3 IS NULL AND "
-            )
-        elif controller_type == "PID":
-            test_query += (
-                f"SELECT * FROM Simulations WHERE param_1 = {float(param_1)} AND param_2 "
-                f" = {float(param_2)} AND param_3 = {float(param_3)} AND "
-            )
-        else:
-            test_query += "SELECT * FROM Simulations WHERE "
-        test_query += f"target_value = {float(target_value)} AND controller_type = '{controller_type}'"
-
         try:
             cur = conn.cursor()
-            cur.execute(test_query)
-            if cur.fetchall() != []:
-                return True
-            return False
+            cur.execute(
+                "SELECT 1 FROM Simulations WHERE config_key = ?",
+                (get_config_key(param_1, param_2, param_3, target_value, controller_type, init_value,
+                                stop_conditions),)
+            )
+            return cur.fetchone() is not None
         except sqlite3.Error as error:
             print(f"Error in simulation_exists: {error}")
             return False
         finally:
             cur.close()
-            conn.close()
 
     def insert_data(self, param_1 : float, param_2 : float, param_3 : float,
-                    target_value : float, controller_type : str, measurements : list) -> bool:
+                    target_value : float, controller_type : str, measurements : list,
+                    init_value : float = None, metrics : dict = None,
+                    stop_reason : str = None, stop_conditions : list = None) -> bool:
         '''
         Insert simulation and display results data into database.
         :param param_1: first parameter (only for PI and PID)
@@ -151,19 +456,27 @@ class Database:
         :param target_value: target value of the simulation
         :param controller_type: controller used in simulation
         :param measurements: display results of simulation
+        :param init_value: initial value of the simulation
+        :param metrics: metrics of the simulation (computed from measurements if None)
+        :param stop_reason: reason the simulation was stopped early (None if it ran to the end)
+        :param stop_conditions: stop conditions the simulation was run with (part of the configuration key)
         '''
         conn = self.get_connection()
-        success = True
-        try:
-            success, sim_id = self.insert_simulation(conn, param_1, param_2, param_3, target_value, controller_type)
-            if sim_id == -1:
-                return False
-            return success and self.insert_measurements(conn, sim_id, measurements)
-        finally:
-            conn.close()
+        # Stopped simulation ends with its latest measurement
+        stop_time = float(measurements[0][-1]) if stop_reason is not None else None
+        if metrics is None:
+            metrics = get_metrics(measurements, target_value, SIMULATION_TIME if stop_reason is not None else None)
+        # Simulation row and its measurements are stored in a single transaction
+        success, sim_id = self.insert_simulation(conn, param_1, param_2, param_3, target_value, controller_type,
+                                                 init_value, metrics, stop_reason, stop_time, stop_conditions)
+        if success and sim_id is not None and self.insert_results(conn, sim_id, measurements):
+            conn.commit()
+            return True
+        conn.rollback()
+        return False
 
     def update_data(self, param_1 : float, param_2 : float, param_3 : float,
-                    target_value : float, controller_type : str) -> bool:
+                    target_value : float, controller_type : str, init_value : float = None) -> bool:
         '''
         Update timestamp of simulation with provided parameters.
         :param param_1: first parameter (only for PI and PID)
@@ -171,87 +484,214 @@ class Database:
         :param param_3: third parameter (only for PID)
         :target_value: target value of the simulation
         :controller_type: controller name used in simulation
+        :init_value: initial value of the simulation
         '''
         conn = self.get_connection()
+        success = self.update_timestamp(conn, get_config_key(param_1, param_2, param_3, target_value,
+                                                             controller_type, init_value))
+        conn.commit()
+        return success
+
+    def update_timestamp(self, conn, config_key : str) -> bool:
+        '''
+        Update timestamp of simulation with provided configuration key, committing is left to the caller.
+        :param conn: database connection object
+        :param config_key: key of the simulation configuration (see get_config_key)
+        '''
         now = datetime.now()
         try:
             cur = conn.cursor()
             cur.execute(
-                f"SELECT simulation_id FROM Simulations WHERE controller_type = '{controller_type}' AND "
-                f"param_1 {f'= {param_1}' if param_1 is not None and controller_type != 'Fuzzy' else 'IS NULL'} AND "
-                f"param_2 {f'= {param_2}' if param_2 is not None and controller_type != 'Fuzzy' else 'IS NULL'} AND "
-                f"param_3 {f'= {param_3}' if param_3 is not None and controller_type == 'PID' else 'IS NULL'} AND "
-                f"target_value = {target_value}"
-            )
-            sim_id = cur.fetchall()[0][0]
-            cur.execute(
-                f"UPDATE Simulations SET simulation_date = {now.strftime('%Y%m%d')},"
-                f"simulation_time = {now.strftime('%H%M%S')} WHERE simulation_id = {sim_id}"
+                "UPDATE Simulations SET simulation_date = ?, simulation_time = ? WHERE config_key = ?",
+                (int(now.strftime('%Y%m%d')), int(now.strftime('%H%M%S')), config_key)
             )
-            conn.commit()
-            return True
+            return cur.rowcount == 1
         except sqlite3.Error as error:
             print(f"Error in update_data : {error}")
             return False
         finally:
-            conn.close()
-        
+            cur.close()
+
+    def insert_results(self, conn, sim_id : int, measurements : list) -> bool:
+        '''
+        Insert simulation measurements using configured storage mode, committing is left to the caller.
+        :param conn: database connection object
+        :param sim_id: id of the simulation the measurements belong to
+        :param measurements: list of simulation display results
+        '''
+        if self.storage == "blob":
+            return self.insert_trajectory(conn, sim_id, measurements)
+        return self.insert_measurements(conn, sim_id, measurements)
+
     def insert_or_update_data(self, param_1 : float, param_2 : float, param_3 : float,
-                              target_value : float, controller_type : str, measurements : list) -> bool:
+                              target_value : float, controller_type : str, measurements : list,
+                              init_value : float = None, metrics : dict = None,
+                              stop_reason : str = None, stop_conditions : list = None) -> bool:
         '''
         Insert new simulation data if no simulation exists for provided parameters or update
-        timestamp of existing one.
+        timestamp of existing one. Existing simulation is updated before any metrics are computed,
+        the insert still resolves the same configuration stored meanwhile by the unique configuration key.
         :param param_1: first parameter (only for PI and PID)
         :param param_2: second parameter (only for PI and PID)
         :param param_3: third parameter (only for PID)
         :param target_value: target value of the simulation
         :param controller_type: name of the controller used in simulation
         :param measurements: list of results to insert into DB
+        :param init_value: initial value of the simulation
+        :param metrics: metrics of the simulation (computed from measurements if None)
+        :param stop_reason: reason the simulation was stopped early (None if it ran to the end)
+        :param stop_conditions: stop conditions the simulation was run with (part of the configuration key)
         '''
-        if not self.simulation_exists(param_1, param_2, param_3, target_value, controller_type):
-            self.insert_data(param_1, param_2, param_3, target_value, controller_type, measurements)
+        conn = self.get_connection()
+        config_key = get_config_key(param_1, param_2, param_3, target_value, controller_type, init_value,
+                                    stop_conditions)
+        if self.update_timestamp(conn, config_key):
+            conn.commit()
+            return True
+        # Stopped simulation ends with its latest measurement
+        stop_time = float(measurements[0][-1]) if stop_reason is not None else None
+        if metrics is None:
+            metrics = get_metrics(measurements, target_value, SIMULATION_TIME if stop_reason is not None else None)
+        success, sim_id = self.insert_simulation(conn, param_1, param_2, param_3, target_value, controller_type,
+                                                 init_value, metrics, stop_reason, stop_time, stop_conditions)
+        if success and sim_id is None:
+            # Stored by another connection since the update
+            success = self.update_timestamp(conn, config_key)
+        elif success:
+            success = self.insert_results(conn, sim_id, measurements)
+        if success:
+            conn.commit()
         else:
-            self.update_data(param_1, param_2, param_3, target_value, controller_type)
+            conn.rollback()
+        return success
 
-    def get_latest_simulations(self, n_simulations : int, target_value : float):
+    def get_simulation_results(self, config_key : str) -> list:
         '''
-        Get n latest simulation results from the database.
+        Get display results of stored simulation with provided configuration key, None if not stored.
+        :param config_key: key of the simulation configuration (see get_config_key)
+        '''
+        conn = self.get_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT simulation_id FROM Simulations WHERE config_key = ?", (config_key,))
+            row = cur.fetchone()
+            if row is None:
+                return None
+            results = self.get_trajectories(cur, [row[0]]) or self.get_measurements(cur, [row[0]])
+            return results.get(row[0])
+        except sqlite3.Error as error:
+            print(f"Error in get_simulation_results: {error}")
+            return None
+        finally:
+            cur.close()
+
+    def get_stored_metrics(self, config_keys : list) -> dict:
+        '''
+        Get metrics of stored simulations with provided configuration keys with a single query, keyed by
+        configuration key. Configurations not stored (or stored without metrics) are left out.
+        :param config_keys: keys of the simulation configurations (see get_config_key)
+        '''
+        if not config_keys:
+            return {}
+        conn = self.get_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                f"SELECT config_key, {', '.join(METRICS)} FROM Simulations WHERE {METRICS[0]} IS NOT NULL "
+                f"AND config_key IN ({', '.join('?' * len(config_keys))})",
+                list(config_keys)
+            )
+            return {row[0]: dict(zip(METRICS, row[1:])) for row in cur.fetchall()}
+        except sqlite3.Error as error:
+            print(f"Error in get_stored_metrics: {error}")
+            return {}
+        finally:
+            cur.close()
+
+    def get_latest_simulations(self, n_simulations : int, target_value : float, cached_ids : set = None):
+        '''
+        Get n latest simulation results from the database, every channel is returned as an array,
+        followed by controller type, parameters and simulation id.
         :param n_simulations: number of simulations to fetch
         :param target_value: filter results to only show simulations for this target value
+        :param cached_ids: ids of simulations the caller already has measurements of, they are returned
+        with empty channels
         '''
         conn = self.get_connection()
         try:
             cur = conn.cursor()
             cur.execute(
-                f"SELECT simulation_id, controller_type, param_1, param_2, param_3 FROM Simulations WHERE target_value = {target_value} "
-                f"ORDER BY simulation_date DESC, simulation_time DESC LIMIT {n_simulations}"
+                "SELECT simulation_id, controller_type, param_1, param_2, param_3 FROM Simulations WHERE target_value = ? "
+                "ORDER BY simulation_date DESC, simulation_time DESC LIMIT ?",
+                (target_value, n_simulations)
             )
             sims = [ [val[0], val[1], [val[2], val[3], val[4]]] for val in cur.fetchall() ]
 
-            if sims == [None]:
-                return None
+            if sims == []:
+                return []
 
-            results = []
-            for sim in sims:
-                cur.execute(
-                    f"SELECT measurement_time, measurement_value, measurement_signal, measurement_response,"
-                    f"error FROM Measurements "
-                    f"WHERE simulation_id = {sim[0]} ORDER BY measurement_time"
-                )
-                parsed_measurements = [[], [], [], [], []]
-                for measure in cur.fetchall():
-                    parsed_measurements[0].append(measure[0])
-                    parsed_measurements[1].append(measure[1])
-                    parsed_measurements[2].append(measure[2])
-                    parsed_measurements[3].append(measure[3])
-                    parsed_measurements[4].append(measure[4])
-                parsed_measurements.append(sim[1])
-                parsed_measurements.append(sim[2])
-                results.append(parsed_measurements)
-            return results
+            sim_ids = [sim[0] for sim in sims if cached_ids is None or sim[0] not in cached_ids]
+            trajectories = self.get_trajectories(cur, sim_ids) if sim_ids else {}
+            missing_ids = [sim_id for sim_id in sim_ids if sim_id not in trajectories]
+            if missing_ids:
+                trajectories.update(self.get_measurements(cur, missing_ids))
+
+            empty = [np.empty(0)] * 5
+            return [trajectories.get(sim[0], empty) + [sim[1], sim[2], sim[0]] for sim in sims]
         except sqlite3.Error as error:
             print(f"Error in get_latest_simulations: {error}")
             return []
         finally:
             cur.close()
-            conn.close()
+
+    def rank_simulations(self, metric : str, n_simulations : int = 10, descending : bool = False,
+                         controller_type : str = None, target_value : float = None, init_value : float = None,
+                         limits : dict = None) -> list:
+        '''
+        Get stored simulations ordered by the metric, using only Simulations columns (no measurements
+        are read). Simulations without the metric are left out. Every simulation is returned as a dict
+        of its configuration, metrics and stop reason.
+        :param metric: metric to order by (see metrics.METRICS)
+        :param n_simulations: number of simulations to fetch
+        :param descending: order from the highest value of the metric
+        :param controller_type: filter results to only show simulations of this controller
+        :param target_value: filter results to only show simulations for this target value
+        :param init_value: filter results to only show simulations with this initial value
+        :param limits: bounds of metrics as metric -> (lower, upper), None leaves the side open
+        '''
+        limits = limits or {}
+        unknown = [name for name in [metric, *limits] if name not in METRICS]
+        if unknown:
+            print(f"Error in rank_simulations: unknown metrics {unknown}")
+            return []
+        conditions = [f"{metric} IS NOT NULL"]
+        params = []
+        for column, value in [("controller_type", controller_type), ("target_value", target_value),
+                              ("init_value", init_value)]:
+            if value is not None:
+                # Unary plus keeps SQLite from using Simulations_latest, so rows are read in order of the metric index
+                conditions.append(f"+{column} = ?")
+                params.append(value)
+        for name, (lower, upper) in limits.items():
+            if lower is not None:
+                conditions.append(f"{name} >= ?")
+                params.append(lower)
+            if upper is not None:
+                conditions.append(f"{name} <= ?")
+                params.append(upper)
+        columns = ["simulation_id", "controller_type", "param_1", "param_2", "param_3", "target_value",
+                   "init_value"] + METRICS + ["stop_reason", "stop_time"]
+        conn = self.get_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                f"SELECT {', '.join(columns)} FROM Simulations WHERE {' AND '.join(conditions)} "
+                f"ORDER BY {metric} {'DESC' if descending else 'ASC'} LIMIT ?",
+                params + [n_simulations]
+            )
+            return [dict(zip(columns, row)) for row in cur.fetchall()]
+        except sqlite3.Error as error:
+            print(f"Error in rank_simulations: {error}")
+            return []
+        finally:
+            cur.close()
@@ -0,0 +1,19 @@
+CREATE UNIQUE INDEX IF NOT EXISTS Simulations_config_key ON Simulations(config_key);
+
+CREATE INDEX IF NOT EXISTS Simulations_latest ON Simulations(target_value, simulation_date, simulation_time);
+
+CREATE INDEX IF NOT EXISTS Simulations_iae ON Simulations(iae);
+
+CREATE INDEX IF NOT EXISTS Simulations_ise ON Simulations(ise);
+
+CREATE INDEX IF NOT EXISTS Simulations_itae ON Simulations(itae);
+
+CREATE INDEX IF NOT EXISTS Simulations_overshoot ON Simulations(overshoot);
+
+CREATE INDEX IF NOT EXISTS Simulations_settling_time ON Simulations(settling_time);
+
+CREATE INDEX IF NOT EXISTS Simulations_rise_time ON Simulations(rise_time);
+
+CREATE INDEX IF NOT EXISTS Simulations_total_work ON Simulations(total_work);
+
+CREATE INDEX IF NOT EXISTS Measurements_simulation ON Measurements(simulation_id, measurement_time);
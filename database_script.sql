@@ -6,7 +6,18 @@ CREATE TABLE IF NOT EXISTS Simulations(
     param_2 REAL NULL,
     param_3 REAL NULL,
     target_value REAL NOT NULL,
-    controller_type TEXT NOT NULL
+    controller_type TEXT NOT NULL,
+    init_value REAL NULL,
+    config_key TEXT NULL,
+    iae REAL NULL,
+    ise REAL NULL,
+    itae REAL NULL,
+    overshoot REAL NULL,
+    settling_time REAL NULL,
+    rise_time REAL NULL,
+    total_work REAL NULL,
+    stop_reason TEXT NULL,
+    stop_time REAL NULL
 );
 
 CREATE TABLE IF NOT EXISTS Measurements(
@@ -18,3 +29,15 @@ CREATE TABLE IF NOT EXISTS Measurements(
     measurement_response REAL NOT NULL,
     error REAL NOT NULL
 );
+
+CREATE TABLE IF NOT EXISTS Trajectories(
+    simulation_id INTEGER PRIMARY KEY REFERENCES Simulations(simulation_id),
+    sample_count INTEGER NOT NULL,
+    dtype TEXT NOT NULL,
+    compression TEXT NULL,
+    measurement_time BLOB NOT NULL,
+    measurement_value BLOB NOT NULL,
+    measurement_signal BLOB NOT NULL,
+    measurement_response BLOB NOT NULL,
+    error BLOB NOT NULL
+);
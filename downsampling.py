@@ -0,0 +1,91 @@
+"""Downsampling of result series for graphs, keeps the visual shape of a series with a bounded number of points."""
+
+import numpy as np
+
+def get_buckets(size : int, n_buckets : int) -> np.ndarray:
+    '''
+    Indexes of samples in every bucket as a matrix with one bucket per row. Buckets split the samples into
+    nearly equal contiguous parts, shorter buckets repeat their last index.
+    :param size: number of samples
+    :param n_buckets: number of buckets
+    '''
+    edges = np.linspace(0, size, n_buckets + 1).astype(np.int64)
+    width = int(np.max(np.diff(edges)))
+    return np.minimum(edges[:-1, np.newaxis] + np.arange(width), edges[1:, np.newaxis] - 1)
+
+def check_max_points(max_points : int) -> None:
+    """Raise ValueError if max_points leaves no room for the first and last samples."""
+    if max_points < 2:
+        raise ValueError(f"At least 2 points are needed to keep the first and last samples, got {max_points}")
+
+def min_max(x : np.ndarray, y : np.ndarray, max_points : int) -> np.ndarray:
+    '''
+    Indexes of the minimum and maximum of every bucket (in order), first and last samples are always kept
+    (only them if max_points leaves no room for a bucket).
+    :param x: sample times
+    :param y: sample values
+    :param max_points: maximum number of kept samples (at least 2)
+    '''
+    check_max_points(max_points)
+    size = len(y)
+    if size <= max_points:
+        return np.arange(size)
+    if max_points < 4:
+        return np.array([0, size - 1])
+    buckets = get_buckets(size - 2, (max_points - 2) // 2) + 1
+    values = y[buckets]
+    rows = np.arange(len(buckets))
+    # Each bucket contributes its extremes in order of time, so the line passes through both
+    extremes = np.sort(np.stack([buckets[rows, np.argmin(values, axis=1)],
+                                 buckets[rows, np.argmax(values, axis=1)]], axis=1), axis=1)
+    return np.unique(np.concatenate([[0], extremes.ravel(), [size - 1]]))
+
+def lttb(x : np.ndarray, y : np.ndarray, max_points : int) -> np.ndarray:
+    '''
+    Indexes of samples selected by largest-triangle-three-buckets, first and last samples are always kept.
+    Every bucket keeps the sample forming the largest triangle with the sample kept from the previous bucket
+    and the average of the next one.
+    :param x: sample times
+    :param y: sample values
+    :param max_points: maximum number of kept samples (at least 2)
+    '''
+    check_max_points(max_points)
+    size = len(y)
+    if size <= max_points:
+        return np.arange(size)
+    if max_points < 3:
+        return np.array([0, size - 1])
+    buckets = get_buckets(size - 2, max_points - 2) + 1
+    bucket_x, bucket_y = x[buckets], y[buckets]
+    # Average of the next bucket, the last one uses the last sample
+    next_x = np.append(bucket_x[1:].mean(axis=1), x[-1])
+    next_y = np.append(bucket_y[1:].mean(axis=1), y[-1])
+    selected = np.empty(len(buckets) + 2, dtype=np.int64)
+    selected[0], selected[-1] = 0, size - 1
+    previous = 0
+    for idx in range(len(buckets)):
+        # Doubled triangle areas, the constant factor does not change the maximum
+        areas = np.abs((x[previous] - next_x[idx]) * (bucket_y[idx] - y[previous]) -
+                       (x[previous] - bucket_x[idx]) * (next_y[idx] - y[previous]))
+        previous = buckets[idx, np.argmax(areas)]
+        selected[idx + 1] = previous
+    return selected
+
+def downsample(x : np.ndarray, y : np.ndarray, max_points : int, method : str = "minmax",
+               x_range : list = None) -> list:
+    '''
+    Downsample series to at most max_points samples, returns [x, y] of the kept samples.
+    :param x: sample times
+    :param y: sample values
+    :param max_points: maximum number of kept samples
+    :param method: "minmax" (extremes of every bucket) or "lttb" (largest-triangle-three-buckets)
+    :param x_range: [start, end] of the shown times, samples outside it (except the nearest neighbours
+    keeping the line continuous) are dropped before downsampling
+    '''
+    x, y = np.asarray(x), np.asarray(y)
+    if x_range is not None:
+        first = max(int(np.searchsorted(x, x_range[0], side="left")) - 1, 0)
+        last = int(np.searchsorted(x, x_range[1], side="right")) + 1
+        x, y = x[first:last], y[first:last]
+    kept = lttb(x, y, max_points) if method == "lttb" else min_max(x, y, max_points)
+    return [x[kept], y[kept]]
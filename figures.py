@@ -0,0 +1,237 @@
+"""Result figures of all graphs, series of every simulation are prepared once and shared by the figures."""
+
+import threading
+
+from collections import OrderedDict
+
+import numpy as np
+import plotly.graph_objs as go
+
+from dash import Patch
+
+from constants import GRAPH_POINTS, GRAPH_DOWNSAMPLING, WEBGL_POINTS, FIGURE_CACHE_SIZE, NUM_SIMULATIONS
+from database import Database
+from downsampling import downsample
+from utils import RESULT_GRAPHS, get_line_color, get_line_name
+
+# Layout of every result figure, includes the default template as go.Figure does
+BASE_LAYOUT = go.Figure().to_dict()["layout"]
+
+def get_compact(values : np.ndarray, digits : int = 7) -> np.ndarray:
+    '''
+    Round values to significant digits of the largest one, so they serialize into short JSON numbers
+    without visible change of the graph.
+    :param values: series values
+    :param digits: number of kept significant digits
+    '''
+    values = np.asarray(values, dtype=np.float64)
+    scale = np.max(np.abs(values), where=np.isfinite(values), initial=0.0)
+    if scale == 0:
+        return values
+    return np.round(values, digits - 1 - int(np.floor(np.log10(scale))))
+
+def get_live_figure() -> dict:
+    """Empty figure of the running simulation, every channel has its own row sharing the time axis."""
+    rows = len(RESULT_GRAPHS)
+    layout = dict(BASE_LAYOUT)
+    layout.update({"title": {"text": "Running simulation"}, "showlegend": False, "height": 150 * rows,
+                   "xaxis": {"title": {"text": "Time [s]"}, "anchor": f"y{rows}"}})
+    data = []
+    for row, [label, title] in enumerate(RESULT_GRAPHS, start=1):
+        axis = str(row) if row > 1 else ""
+        top = 1 - (row - 1) / rows
+        layout[f"yaxis{axis}"] = {"title": {"text": title}, "domain": [top - 1 / rows + 0.03, top]}
+        data.append({"type": "scatter", "x": [], "y": [], "name": label, "yaxis": f"y{axis}",
+                     "line": dict(color="#fa07f2")})
+    return {"data": data, "layout": layout}
+
+def get_live_update(updates : list) -> list:
+    '''
+    extendData of the live figure appending progress updates of the running simulation, None if there are none.
+    :param updates: progress updates (see Job_Manager.get_progress)
+    '''
+    if not updates:
+        return None
+    channels = range(len(RESULT_GRAPHS))
+    return [{"x": [get_compact(np.concatenate([update[channel][0] for update in updates]), 12) for channel in channels],
+             "y": [get_compact(np.concatenate([update[channel][1] for update in updates])) for channel in channels]},
+            list(channels)]
+
+class Figure_Builder:
+    '''
+    Builds figures of result graphs as plain dicts (no go.Figure validation). Downsampled series of every
+    simulation are kept by simulation id, so only simulations new since the previous call are loaded
+    from the database and prepared. Whole sets of figures are cached by ids of the shown simulations,
+    figures of zoomed time ranges by the ids, channel and range. Traces with more than webgl_points points
+    are drawn with WebGL (Scattergl).
+    :param db: database storing the simulations
+    :param max_points: maximum number of points of every trace
+    :param webgl_points: number of points of a trace above which WebGL is used
+    :param cache_size: number of cached sets of figures (series of up to NUM_SIMULATIONS times as many
+    simulations are kept)
+    '''
+    def __init__(self, db : Database, max_points : int = GRAPH_POINTS, webgl_points : int = WEBGL_POINTS,
+                 cache_size : int = FIGURE_CACHE_SIZE) -> None:
+        self.db = db
+        self.max_points = max_points
+        self.webgl_points = webgl_points
+        self.cache_size = cache_size
+        # Simulation id -> [x, y] of every channel
+        self.series = OrderedDict()
+        # Ids of shown simulations -> figure of every channel
+        self.figures = OrderedDict()
+        # Ids of shown simulations, channel and shown time range -> zoomed figure of the channel
+        self.zoomed = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_series(self, result : list, channel : int, x_range : list = None) -> list:
+        '''
+        Downsampled and rounded [x, y] of one channel of the results. Times keep more digits,
+        so samples of long simulations stay distinct.
+        :param result: results of the simulation (see Database.get_latest_simulations)
+        :param channel: index of the channel in the results (1 - 4)
+        :param x_range: [start, end] of the shown times (whole simulation if None)
+        '''
+        x, y = downsample(result[0], result[channel], self.max_points, GRAPH_DOWNSAMPLING, x_range)
+        return [get_compact(x, 12), get_compact(y)]
+
+    def get_trace(self, idx : int, result : list, x : np.ndarray, y : np.ndarray) -> dict:
+        '''
+        Trace of single simulation.
+        :param idx: index of the simulation (0 is the latest one)
+        :param result: results of the simulation
+        :param x: shown times
+        :param y: shown values
+        '''
+        return {"type": "scattergl" if len(x) > self.webgl_points else "scatter", "x": x, "y": y,
+                "name": get_line_name(idx, result),
+                "line": get_line_color(result[5]) if idx > 0 else dict(color="#fa07f2")}
+
+    def get_layout(self, channel : int, x_range : list = None) -> dict:
+        '''
+        Layout of the channel figure.
+        :param channel: index of the shown channel in the results (1 - 4)
+        :param x_range: [start, end] of the shown times (whole simulation if None)
+        '''
+        layout = dict(BASE_LAYOUT)
+        layout["xaxis"] = {"title": {"text": "Time [s]"}}
+        layout["yaxis"] = {"title": {"text": RESULT_GRAPHS[channel - 1][1]}}
+        if x_range is not None:
+            layout["xaxis"]["range"] = list(x_range)
+        return layout
+
+    def get_figures(self, target_value : float, n_simulations : int = NUM_SIMULATIONS) -> list:
+        '''
+        Ids of the latest simulations and figure of every channel showing them.
+        :param target_value: filter results to only show simulations for this target value
+        :param n_simulations: number of shown simulations
+        '''
+        with self.lock:
+            cached_ids = set(self.series)
+        results = self.db.get_latest_simulations(n_simulations, target_value, cached_ids)
+        key = tuple(result[7] for result in results)
+        with self.lock:
+            if key in self.figures:
+                self.figures.move_to_end(key)
+                return [list(key), self.figures[key]]
+            series = [self.series.get(result[7]) for result in results]
+        if any(item is None and result[7] in cached_ids for item, result in zip(series, results)):
+            # Series were evicted by another callback meanwhile, load all measurements again
+            results = self.db.get_latest_simulations(n_simulations, target_value)
+        series = [item if item is not None else
+                  [self.get_series(result, channel) for channel in range(1, len(RESULT_GRAPHS) + 1)]
+                  for item, result in zip(series, results)]
+
+        figures = [
+            {"data": [self.get_trace(idx, result, *item[channel - 1])
+                      for idx, [result, item] in enumerate(zip(results, series))],
+             "layout": self.get_layout(channel)}
+            for channel in range(1, len(RESULT_GRAPHS) + 1)
+        ]
+        with self.lock:
+            for result, item in zip(results, series):
+                self.series[result[7]] = item
+                self.series.move_to_end(result[7])
+            while len(self.series) > self.cache_size * NUM_SIMULATIONS:
+                self.series.popitem(last=False)
+            self.figures[key] = figures
+            while len(self.figures) > self.cache_size:
+                self.figures.popitem(last=False)
+        return [list(key), figures]
+
+    def get_zoomed_figure(self, target_value : float, channel : int, x_range : list,
+                          n_simulations : int = NUM_SIMULATIONS) -> list:
+        '''
+        Ids of the latest simulations and figure of the channel showing them within the time range, with
+        full resolution (up to the point limit).
+        :param target_value: filter results to only show simulations for this target value
+        :param channel: index of the shown channel in the results (1 - 4)
+        :param x_range: [start, end] of the shown times
+        :param n_simulations: number of shown simulations
+        '''
+        # Ids of the latest simulations come from the cached figures, only new ranges load measurements
+        ids, _ = self.get_figures(target_value, n_simulations)
+        key = (tuple(ids), channel, tuple(x_range))
+        with self.lock:
+            if key in self.zoomed:
+                self.zoomed.move_to_end(key)
+                return [ids, self.zoomed[key]]
+        results = self.db.get_latest_simulations(n_simulations, target_value)
+        ids = [result[7] for result in results]
+        figure = self.get_figure(results, channel, x_range)
+        with self.lock:
+            self.zoomed[(tuple(ids), channel, tuple(x_range))] = figure
+            while len(self.zoomed) > self.cache_size:
+                self.zoomed.popitem(last=False)
+        return [ids, figure]
+
+    def get_update(self, target_value : float, channel : int, shown : dict = None, x_range : list = None) -> list:
+        '''
+        Update of the shown figure to the latest simulations, returns the update and state of the updated
+        figure. If a single simulation was added since the shown unzoomed figure, update is a Patch adding
+        its trace, dropping the oldest one and renaming the rest (no arrays of other simulations are sent).
+        Otherwise it is the whole figure (always for zoomed figures, so resolutions are not mixed), None if
+        nothing changed.
+        :param target_value: filter results to only show simulations for this target value
+        :param channel: index of the shown channel in the results (1 - 4)
+        :param shown: state of the shown figure (target_value, channel, simulation ids and time range)
+        returned by the previous update
+        :param x_range: [start, end] of the shown times (whole simulation if None)
+        '''
+        if x_range is not None:
+            ids, figure = self.get_zoomed_figure(target_value, channel, x_range)
+            state = {"target_value": target_value, "channel": channel, "ids": ids, "x_range": list(x_range)}
+            return [None if shown == state else figure, state]
+        ids, figures = self.get_figures(target_value)
+        figure = figures[channel - 1]
+        state = {"target_value": target_value, "channel": channel, "ids": ids, "x_range": None}
+        if shown is None or shown["target_value"] != target_value or shown["channel"] != channel or \
+                shown.get("x_range") is not None:
+            return [figure, state]
+        shown_ids = shown["ids"]
+        if ids == shown_ids:
+            return [None, state]
+        if not ids or ids[0] in shown_ids or ids[1:] != shown_ids[:len(ids) - 1] or \
+                len(shown_ids) not in [len(ids) - 1, len(ids)]:
+            return [figure, state]
+
+        patch = Patch()
+        patch["data"].prepend(figure["data"][0])
+        if len(shown_ids) == len(ids):
+            del patch["data"][len(ids)]
+        # Color of the latest simulation and names of Fuzzy simulations depend on position
+        for idx in range(1, len(ids)):
+            patch["data"][idx]["name"] = figure["data"][idx]["name"]
+            patch["data"][idx]["line"] = figure["data"][idx]["line"]
+        return [patch, state]
+
+    def get_figure(self, results : list, channel : int, x_range : list = None) -> dict:
+        '''
+        Figure of one channel of full resolution results, every trace is downsampled to the shown times.
+        :param results: results of the simulations (see Database.get_latest_simulations)
+        :param channel: index of the shown channel in the results (1 - 4)
+        :param x_range: [start, end] of the shown times (whole simulation if None)
+        '''
+        data = [self.get_trace(idx, result, *self.get_series(result, channel, x_range))
+                for idx, result in enumerate(results)]
+        return {"data": data, "layout": self.get_layout(channel, x_range)}
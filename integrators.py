@@ -0,0 +1,136 @@
+"""Integrators of process dynamics between controller samples (signal is held constant over the sample)."""
+
+import math
+
+import numpy as np
+
+class Euler_Integrator:
+    '''
+    Explicit Euler method with fixed number of steps per controller sample.
+    :param substeps: number of integration steps per controller sample.
+    '''
+    def __init__(self, substeps : int = 1) -> None:
+        self.substeps = substeps
+        self.reset()
+
+    def __str__(self) -> str:
+        return "Euler"
+
+    def reset(self) -> None:
+        """Reset step statistics."""
+        self.steps = 0
+        self.evaluations = 0
+
+    def integrate(self, derivatives, state : np.ndarray, duration : float) -> np.ndarray:
+        '''
+        Integrate the state over single controller sample.
+        :param derivatives: function returning derivatives of the state
+        :param state: state at the start of the sample
+        :param duration: length of the sample
+        '''
+        step = duration / self.substeps
+        for _ in range(self.substeps):
+            state = state + step * derivatives(state)
+        self.steps += self.substeps
+        self.evaluations += self.substeps
+        return state
+
+class RK4_Integrator(Euler_Integrator):
+    '''
+    Classic fourth order Runge-Kutta method with fixed number of steps per controller sample.
+    :param substeps: number of integration steps per controller sample.
+    '''
+    def __str__(self) -> str:
+        return "RK4"
+
+    def integrate(self, derivatives, state : np.ndarray, duration : float) -> np.ndarray:
+        '''
+        Integrate the state over single controller sample.
+        :param derivatives: function returning derivatives of the state
+        :param state: state at the start of the sample
+        :param duration: length of the sample
+        '''
+        step = duration / self.substeps
+        for _ in range(self.substeps):
+            k1 = derivatives(state)
+            k2 = derivatives(state + step / 2 * k1)
+            k3 = derivatives(state + step / 2 * k2)
+            k4 = derivatives(state + step * k3)
+            state = state + step / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+        self.steps += self.substeps
+        self.evaluations += 4 * self.substeps
+        return state
+
+class RK45_Integrator:
+    '''
+    Adaptive Dormand-Prince 5(4) method, step size is controlled by the difference of embedded
+    fourth and fifth order solutions and carried over between controller samples.
+    :param rtol: relative tolerance of a single step.
+    :param atol: absolute tolerance of a single step.
+    :param max_step: maximum step size (controller sample length if None).
+    '''
+    # Dormand-Prince tableau
+    nodes = [[],
+             [1/5],
+             [3/40, 9/40],
+             [44/45, -56/15, 32/9],
+             [19372/6561, -25360/2187, 64448/6561, -212/729],
+             [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656]]
+    weights = np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0])
+    # Difference of fifth and fourth order weights
+    error_weights = weights - np.array([5179/57600, 0, 7571/16695, 393/640, -92097/339200, 187/2100, 1/40])
+
+    def __init__(self, rtol : float = 1e-6, atol : float = 1e-9, max_step : float = None) -> None:
+        self.rtol = rtol
+        self.atol = atol
+        self.max_step = max_step
+        self.reset()
+
+    def __str__(self) -> str:
+        return "RK45"
+
+    def reset(self) -> None:
+        """Reset step statistics and step size."""
+        self.steps = 0
+        self.rejected_steps = 0
+        self.evaluations = 0
+        self.step_size = None
+
+    def integrate(self, derivatives, state : np.ndarray, duration : float) -> np.ndarray:
+        '''
+        Integrate the state over single controller sample.
+        :param derivatives: function returning derivatives of the state
+        :param state: state at the start of the sample
+        :param duration: length of the sample
+        '''
+        max_step = duration if self.max_step is None else min(self.max_step, duration)
+        min_step = duration * 1e-9
+        step_size = min(self.step_size or max_step, max_step)
+        time = 0.0
+        slopes = [derivatives(state)]
+        self.evaluations += 1
+        while time < duration:
+            step = min(step_size, duration - time)
+            slopes = slopes[:1]
+            for row in self.nodes[1:]:
+                slopes.append(derivatives(state + step * sum(weight * slope for weight, slope in zip(row, slopes))))
+            new_state = state + step * sum(weight * slope for weight, slope in zip(self.weights, slopes))
+            # Last slope is evaluated at the new state and reused as first slope of the next step
+            slopes.append(derivatives(new_state))
+            self.evaluations += 6
+
+            scale = self.atol + self.rtol * np.maximum(np.abs(state), np.abs(new_state))
+            error = math.sqrt(np.mean((step * sum(weight * slope for weight, slope in
+                                                  zip(self.error_weights, slopes)) / scale) ** 2))
+            if error <= 1 or step <= min_step:
+                time += step
+                state = new_state
+                slopes = slopes[-1:]
+                self.steps += 1
+                factor = 5.0 if error == 0 else min(5.0, 0.9 * error ** -0.2)
+            else:
+                self.rejected_steps += 1
+                factor = max(0.2, 0.9 * error ** -0.2) if math.isfinite(error) else 0.2
+            step_size = min(step * factor, max_step)
+        self.step_size = step_size
+        return state
@@ -0,0 +1,220 @@
+"""Background simulation jobs, keeps long simulations out of Dash request threads."""
+
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+import uuid
+
+from concurrent.futures import ProcessPoolExecutor
+
+from constants import JOB_WORKERS, JOB_TTL
+from database import get_config_key
+from result_cache import Result_Cache
+from sweep import run_live_simulation
+
+logger = logging.getLogger(__name__)
+
+class Job_Manager:
+    '''
+    Runs simulations in background worker processes. Submitting returns job id right away,
+    identical jobs already in flight are coalesced into one and finished results are written
+    into the result cache (and through it into the database) by this process. Running jobs send
+    their progress through queues of a multiprocessing manager and can be aborted. Finished jobs
+    nobody picked up are dropped after ttl seconds.
+    :param cache: result cache storing finished simulations
+    :param workers: number of worker processes (all cores by default)
+    :param ttl: time in seconds finished jobs are kept for their clients
+    '''
+    def __init__(self, cache : Result_Cache, workers : int = JOB_WORKERS, ttl : float = JOB_TTL) -> None:
+        self.cache = cache
+        self.ttl = ttl
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        # Plain queues and events can not be passed to pool workers, proxies of the manager can
+        self.manager = multiprocessing.Manager()
+        # Job id -> job (config, key, status, future, number of clients waiting for it, progress queue,
+        # received progress updates, abort event and time it finished at)
+        self.jobs = {}
+        # Configuration key -> id of the job simulating it
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def submit(self, config : dict) -> str:
+        '''
+        Submit simulation job and return its id, stored configurations finish immediately.
+        :param config: simulation configuration (controller_type, target_value, init_value, param_1,
+        param_2, param_3)
+        '''
+        # Own copy, so the caller changing its config does not affect the job
+        config = dict(config)
+        key = get_config_key(config["param_1"], config["param_2"], config["param_3"], config["target_value"],
+                             config["controller_type"], config["init_value"])
+        with self.lock:
+            self.expire()
+            if key in self.in_flight:
+                job_id = self.in_flight[key]
+                self.jobs[job_id]["clients"] += 1
+                return job_id
+            job_id = uuid.uuid4().hex
+            self.jobs[job_id] = {"config": config, "key": key, "status": "queued", "future": None, "clients": 1,
+                                 "queue": None, "progress": [], "abort": None, "finished": None}
+            self.in_flight[key] = job_id
+
+        if self.cache.get(key) is not None:
+            self.cache.db.update_data(config["param_1"], config["param_2"], config["param_3"],
+                                      config["target_value"], config["controller_type"], config["init_value"])
+            self.complete(job_id, "done")
+            return job_id
+
+        progress, abort = self.manager.Queue(), self.manager.Event()
+        future = self.executor.submit(run_live_simulation, config, progress, abort)
+        with self.lock:
+            self.jobs[job_id].update({"future": future, "queue": progress, "abort": abort})
+        future.add_done_callback(lambda future: self.finish(job_id, future))
+        return job_id
+
+    def finish(self, job_id : str, future) -> None:
+        '''
+        Store result of finished job, called by the executor once the future is done.
+        :param job_id: id of the job
+        :param future: future of the job
+        '''
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            return
+        if future.cancelled():
+            self.complete(job_id, "cancelled")
+            return
+        if future.exception() is not None:
+            logger.error("Simulation job %s failed", job_id, exc_info=future.exception())
+            self.complete(job_id, "failed")
+            return
+        config, result = job["config"], future.result()
+        if result is None:
+            self.complete(job_id, "aborted")
+            return
+        self.cache.db.insert_or_update_data(config["param_1"], config["param_2"], config["param_3"],
+                                            config["target_value"], config["controller_type"], result,
+                                            config["init_value"])
+        self.cache.put(job["key"], result)
+        self.complete(job_id, "done")
+
+    def complete(self, job_id : str, status : str) -> None:
+        '''
+        Mark job as no longer in flight.
+        :param job_id: id of the job
+        :param status: final status of the job (done, cancelled, aborted or failed)
+        '''
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return
+            job["status"] = status
+            job["finished"] = time.monotonic()
+            if self.in_flight.get(job["key"]) == job_id:
+                del self.in_flight[job["key"]]
+            # Nobody polls the job left by all its clients
+            if job["clients"] <= 0:
+                del self.jobs[job_id]
+
+    def expire(self) -> None:
+        """Drop finished jobs older than ttl, clients never polled them (called with the lock held)."""
+        deadline = time.monotonic() - self.ttl
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job["finished"] is not None and job["finished"] < deadline]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def get_status(self, job_id : str) -> str:
+        '''
+        Get status of the job: queued, running, done, cancelled, aborted, failed or unknown.
+        :param job_id: id of the job
+        '''
+        with self.lock:
+            self.expire()
+            job = self.jobs.get(job_id)
+            if job is None:
+                return "unknown"
+            # Finished simulation is still running until its results are stored
+            if job["status"] == "queued" and job["future"] is not None and \
+                    (job["future"].running() or job["future"].done()):
+                return "running"
+            return job["status"]
+
+    def cancel(self, job_id : str) -> bool:
+        '''
+        Leave the job and cancel it if it has not started yet, running jobs are left to finish (and are stored).
+        Coalesced jobs are cancelled only once no other client waits for them.
+        :param job_id: id of the job
+        '''
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or self.leave(job_id) > 0 or job["future"] is None:
+                return False
+            future = job["future"]
+        return future.cancel()
+
+    def get_progress(self, job_id : str, offset : int = 0) -> list:
+        '''
+        Get progress updates of the job received since the client got offset of them, every update
+        holds [times, values] of every channel (see sweep.run_live_simulation). Updates are kept with the job,
+        so every client of a coalesced job gets all of them.
+        :param job_id: id of the job
+        :param offset: number of updates the client already got
+        '''
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job["queue"] is None:
+                return []
+            progress = job["queue"]
+            while True:
+                try:
+                    job["progress"].append(progress.get_nowait())
+                except queue.Empty:
+                    break
+            return job["progress"][offset:]
+
+    def abort(self, job_id : str) -> bool:
+        '''
+        Leave the job and stop it, queued job is cancelled and running one is aborted (and not stored).
+        Coalesced jobs are stopped only once no other client waits for them.
+        :param job_id: id of the job
+        '''
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or self.leave(job_id) > 0 or job["future"] is None:
+                return False
+            future, abort = job["future"], job["abort"]
+        if future.cancel():
+            return True
+        abort.set()
+        return not future.done()
+
+    def forget(self, job_id : str) -> None:
+        '''
+        Leave the job once its client picked up the final state, coalesced job is dropped only after
+        all its clients left (or by expiry).
+        :param job_id: id of the job
+        '''
+        with self.lock:
+            if job_id in self.jobs:
+                self.leave(job_id)
+
+    def leave(self, job_id : str) -> int:
+        '''
+        Remove one client of the job and return number of clients left, finished job nobody waits for
+        is dropped (called with the lock held).
+        :param job_id: id of the job
+        '''
+        job = self.jobs[job_id]
+        job["clients"] -= 1
+        if job["clients"] <= 0 and job["finished"] is not None:
+            del self.jobs[job_id]
+        return job["clients"]
+
+    def shutdown(self) -> None:
+        """Cancel queued jobs and stop worker processes."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.manager.shutdown()
@@ -0,0 +1,202 @@
+"""Piecewise linear simulation component, advances PI/PID + Refrigerator loop by whole stretches of steps."""
+
+import numpy as np
+
+from buffers import get_view, grow
+from constants import SAMPLING, REFRIGERATOR_SIGNAL_LIMIT as SIGNAL_LIMIT
+from simulation import Simulation
+
+# Operating modes of a single step of the closed loop
+LINEAR = 0
+SATURATED_HIGH = 1
+SATURATED_LOW = 2
+NONLINEAR = 3
+
+def get_powers(matrix : np.ndarray, count : int) -> np.ndarray:
+    '''
+    First powers of the matrix (matrix^1 ... matrix^count), computed by doubling.
+    :param matrix: square matrix
+    :param count: number of powers
+    '''
+    powers = np.empty((count,) + matrix.shape)
+    powers[0] = matrix
+    filled = 1
+    while filled < count:
+        size = min(filled, count - filled)
+        # A^(i+1) @ A^filled = A^(filled+i+1)
+        powers[filled:filled + size] = powers[:size] @ powers[filled - 1]
+        filled += size
+    return powers
+
+class Linear_Simulation(Simulation):
+    '''
+    Simulation object for PI/PID + Refrigerator loops. Refrigerator response is linear in the clamped signal,
+    so while the signal stays inside (or stays beyond one of) its limits the closed loop is an affine recurrence
+    of the state (temperature, accumulated error, previous error). Such stretches are advanced with precomputed
+    matrix powers instead of a Python call per step, steps where anti-windup or the integral clamp act are
+    stepped exactly by the controller and process objects. Other controllers and processes use Simulation.start.
+    Results match Simulation.start up to floating point rounding.
+    :param controller: controller object to use in the simulation (new PI controller by default).
+    :param process: process object that simulation simulates (new refrigerator by default).
+    :param max_chunk: maximum number of steps advanced at once.
+    '''
+    def __init__(self, controller = None, process = None, max_chunk : int = 4096) -> None:
+        super().__init__(controller, process)
+        self.max_chunk = max_chunk
+        self.min_chunk = 16
+
+    def is_linear(self) -> bool:
+        '''
+        Check if selected controller and process form a piecewise linear loop. The recurrence is the single
+        Euler step of the process, so runs with an integrator of the process dynamics are stepped.
+        '''
+        return (str(self.process) == "Refrigerator" and str(self.controller) in ["PI", "PID"] and
+                self.integrator is None)
+
+    def get_signal_row(self) -> np.ndarray:
+        """Coefficients of the unclamped controller signal in the state (temperature, sums, error, 1)."""
+        controller = self.controller
+        integral_gain = SAMPLING / controller.reset_time
+        derivative_gain = controller.derivative_time / SAMPLING if str(controller) == "PID" else 0.0
+        # u = kp * ((1 + a + c) * (r - T) + a * S - c * e_prev)
+        gain = controller.proportional_gain * (1 + integral_gain + derivative_gain)
+        return np.array([-gain, controller.proportional_gain * integral_gain,
+                         -controller.proportional_gain * derivative_gain, gain * controller.target_value])
+
+    def get_transitions(self) -> dict:
+        """Affine step of the state in every linear mode, as matrices acting on (temperature, sums, error, 1)."""
+        process = self.process
+        target_value = self.controller.target_value
+        # T' = T - gain * clamped signal
+        gain = (self.sampling * self.sampling * process.coefficient /
+                (process.water_mass * process.water_specific_heat))
+        transitions = {}
+        for mode, temperature_row in [(LINEAR, np.array([1.0, 0.0, 0.0, 0.0]) - gain * self.get_signal_row()),
+                                      (SATURATED_HIGH, np.array([1.0, 0.0, 0.0, -gain * SIGNAL_LIMIT])),
+                                      (SATURATED_LOW, np.array([1.0, 0.0, 0.0, gain * SIGNAL_LIMIT]))]:
+            transitions[mode] = np.array([
+                temperature_row,
+                # S' = S + (r - T)
+                [-1.0, 1.0, 0.0, target_value],
+                # e' = r - T
+                [-1.0, 0.0, 0.0, target_value],
+                [0.0, 0.0, 0.0, 1.0]
+            ])
+        return transitions
+
+    def get_modes(self, states : np.ndarray) -> np.ndarray:
+        '''
+        Mode of the step taken from every state.
+        :param states: states (temperature, sums, error, 1) before the step, one per row
+        '''
+        controller = self.controller
+        signals = states @ self.get_signal_row()
+        modes = np.where(signals > SIGNAL_LIMIT, SATURATED_HIGH,
+                         np.where(signals < -SIGNAL_LIMIT, SATURATED_LOW, LINEAR))
+        nonlinear = ~np.isfinite(signals)
+        errors = controller.target_value - states[:, 0]
+        if controller.integral_limit is not None:
+            nonlinear |= np.abs(states[:, 1] + errors) > controller.integral_limit
+        if controller.anti_windup:
+            direction = errors * controller.proportional_gain
+            nonlinear |= ((signals > controller.max_signal) & (direction > 0)) | \
+                         ((signals < controller.min_signal) & (direction < 0))
+        modes[nonlinear] = NONLINEAR
+        return modes
+
+    def get_state(self) -> np.ndarray:
+        """Current state (temperature, sums, error, 1) of the controller and process."""
+        return np.array([self.process.temperature, self.controller.sums, self.controller.error, 1.0])
+
+    def write(self, owner, name : str, offset : int, values : np.ndarray) -> None:
+        '''
+        Write values into measurement buffer of the owner, growing it if needed.
+        :param owner: object owning the buffer
+        :param name: attribute name of the buffer
+        :param offset: index of the first written sample
+        :param values: written samples
+        '''
+        buffer = getattr(owner, name)
+        while len(buffer) < offset + len(values):
+            buffer = grow(buffer)
+        setattr(owner, name, buffer)
+        get_view(buffer, offset + len(values))[offset:] = values
+
+    def record(self, idx : int, states : np.ndarray, next_states : np.ndarray, mode : int) -> None:
+        '''
+        Record stretch of steps taken in a single linear mode.
+        :param idx: index of the first step
+        :param states: states before every step
+        :param next_states: states after every step
+        :param mode: mode of all steps
+        '''
+        controller, process = self.controller, self.process
+        count = len(states)
+        if mode == LINEAR:
+            signals = states @ self.get_signal_row()
+        else:
+            signals = np.full(count, SIGNAL_LIMIT if mode == SATURATED_HIGH else -SIGNAL_LIMIT, dtype=np.float64)
+        temperatures = next_states[:, 0]
+
+        self.write(self, "time_measurements", self.samples, np.arange(idx, idx + count) * self.sampling)
+        self.write(controller, "errors", controller.samples, controller.target_value - states[:, 0])
+        self.write(process, "work_measurements", process.samples, self.sampling * signals)
+        self.write(process, "temperature_measurements", process.samples, temperatures)
+        self.write(process, "heat_measurements", process.samples, process.water_mass * process.water_specific_heat *
+                   (temperatures - states[:, 0]))
+        self.samples += count
+        controller.samples += count
+        process.samples += count
+        controller.sums = float(next_states[-1, 1])
+        controller.error = float(next_states[-1, 2])
+        process.temperature = float(temperatures[-1])
+
+    def step(self, idx : int) -> None:
+        '''
+        Advance the simulation by a single exact step of the controller and process objects.
+        :param idx: index of the step
+        '''
+        last_time = idx*self.sampling
+        self.write(self, "time_measurements", self.samples, [last_time])
+        self.samples += 1
+        signal = self.controller.get_signal(self.process.get_latest_measurement(), last_time,
+                                            self.time_measurements[self.samples - 2])
+        self.process.add_signal(signal, self.sampling)
+
+    def advance(self, first : int, last : int) -> None:
+        '''
+        Run steps with indexes from first to last (both included).
+        :param first: index of the first step
+        :param last: index of the last step
+        '''
+        if not self.is_linear():
+            super().advance(first, last)
+            return
+
+        transitions = self.get_transitions()
+        powers = {}
+        chunk = self.min_chunk
+        state = self.get_state()
+        idx = first
+        while idx <= last:
+            mode = self.get_modes(state[np.newaxis])[0]
+            if mode == NONLINEAR:
+                self.step(idx)
+                state = self.get_state()
+                idx += 1
+                continue
+
+            if mode not in powers:
+                powers[mode] = get_powers(transitions[mode], min(self.max_chunk, last - first + 1))
+            count = min(chunk, last - idx + 1)
+            # One matrix-vector product for the whole stretch
+            next_states = (powers[mode][:count].reshape(-1, len(state)) @ state).reshape(count, len(state))
+            states = np.vstack([state, next_states[:-1]])
+            # Stretch ends right before the first step taken in a different mode
+            changed = np.flatnonzero(self.get_modes(states) != mode)
+            accepted = changed[0] if len(changed) else count
+            self.record(idx, states[:accepted], next_states[:accepted], mode)
+            state = next_states[accepted - 1]
+            idx += accepted
+            # Stretches tend to be long, grow the chunk until the mode changes
+            chunk = min(2 * chunk, self.max_chunk) if accepted == count else self.min_chunk
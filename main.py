@@ -1,25 +1,36 @@
 """Main app file, starts Dash display and database connection."""
 import dash_bootstrap_components as dbc
 
-from dash import Dash, Input, Output, State
+from dash import Dash, Input, Output, State, ctx, no_update
 
-from constants import NUM_SIMULATIONS
 from database import Database
-from simulation import Simulation
-from utils import get_controls, get_result_graphs, get_app_layout, form_valid
+from figures import Figure_Builder, get_live_figure, get_live_update
+from jobs import Job_Manager
+from result_cache import Result_Cache
+from utils import get_controls, get_app_layout, get_zoom_range, form_valid
 
 class Display:
     def __init__(self):
         self.db = Database("database.db")
-        self.simulation = Simulation()
+        self.cache = Result_Cache(self.db)
+        self.figures = Figure_Builder(self.db)
+        self.jobs = Job_Manager(self.cache)
         self.app = Dash(external_stylesheets=[dbc.themes.BOOTSTRAP])
         self.app.css.config.serve_locally = True
         self.app.scripts.config.serve_locally = True
         self.app.layout = get_app_layout()
         self.app.callback(
         [
-            Output("simulation-result", "children"),
-            Output("controls", "children")
+            Output("results-version", "data"),
+            Output("controls", "children"),
+            Output("job-id", "data"),
+            Output("job-poll", "disabled"),
+            Output("job-status", "children"),
+            Output("live-graph", "figure"),
+            Output("live-graph", "extendData"),
+            Output("live-graph", "style"),
+            Output("live-offset", "data"),
+            Output("abort-button", "disabled")
         ],
         [
             Input("controller-type", "value"),
@@ -28,25 +39,111 @@ class Display:
             State("param-1", "value"),
             State("param-2", "value"),
             State("param-3", "value"),
-            Input("simulation-button", "n_clicks")
+            Input("simulation-button", "n_clicks"),
+            Input("job-poll", "n_intervals"),
+            Input("abort-button", "n_clicks"),
+            State("job-id", "data"),
+            State("results-version", "data"),
+            State("live-offset", "data")
         ])(self.make_graph)
+        self.app.callback(
+        [
+            Output("result-graph", "figure"),
+            Output("shown-results", "data")
+        ],
+        [
+            Input("results-version", "data"),
+            Input("result-tab", "value"),
+            Input("result-graph", "relayoutData"),
+            State("target-value", "value"),
+            State("shown-results", "data")
+        ])(self.update_graph)
+
+    def make_graph(self, controller_type, init_value, target_value, param_1, param_2, param_3, _, __, ___, job_id,
+                   version, offset):
+        """Submit simulation based on user input, poll its job and update graphs once it finishes."""
+        if ctx.triggered_id == "job-poll":
+            return self.poll_job(job_id, version, offset)
+        if ctx.triggered_id == "abort-button":
+            return self.abort_job(job_id, version)
+
+        # Newer input replaces previous job, drop it if it did not start yet
+        if job_id is not None:
+            self.jobs.cancel(job_id)
+            job_id = None
+        if all(form_valid(controller_type, init_value, target_value, param_1, param_2, param_3)):
+            # Do not run the simulation on controller change (let the user set parameters first),
+            # controller type is kept by the client so every session picks its own
+            if ctx.triggered_id != "controller-type":
+                job_id = self.jobs.submit({"controller_type": controller_type, "target_value": target_value,
+                                           "init_value": init_value, "param_1": param_1, "param_2": param_2,
+                                           "param_3": param_3})
+
+        status = "Simulation queued..." if job_id is not None else ""
+        # Stored simulations finish right away, there is nothing to show running
+        live = self.get_live_outputs(job_id is not None and self.jobs.get_status(job_id) != "done")
+        # Controls are only rebuilt for a new controller, a click only refreshes the graph
+        if ctx.triggered_id == "controller-type":
+            return (no_update, get_controls(controller_type, param_1, param_2, param_3), job_id, job_id is None,
+                    status) + live
+        return (version + 1, no_update, job_id, job_id is None, status) + live
+
+    def poll_job(self, job_id, version, offset):
+        '''
+        Check status of the background job, extend the live graph with its progress while it runs
+        and show results once it is finished. Progress is sent at most once per poll interval.
+        '''
+        status = self.jobs.get_status(job_id)
+        if status in ["queued", "running"]:
+            updates = self.jobs.get_progress(job_id, offset)
+            extend_data = get_live_update(updates)
+            message = "Simulation queued..." if status == "queued" else "Simulation running..."
+            return (no_update, no_update, no_update, False, message, no_update,
+                    extend_data if extend_data is not None else no_update, no_update,
+                    offset + len(updates) if updates else no_update, no_update)
+        self.jobs.forget(job_id)
+        message = "Simulation failed." if status == "failed" else ""
+        return (version + 1, no_update, None, True, message) + self.get_live_outputs(False)
+
+    def abort_job(self, job_id, version):
+        """Stop the background job (unless other clients wait for it) and stop polling it."""
+        if job_id is None:
+            return (no_update,) * 10
+        self.jobs.abort(job_id)
+        # Job may have finished meanwhile, stored results are shown in that case
+        return (version + 1, no_update, None, True, "Simulation aborted.") + self.get_live_outputs(False)
+
+    def get_live_outputs(self, running : bool) -> tuple:
+        '''
+        Live graph outputs (figure, extendData, style, progress offset and abort button disabled),
+        empty graph is shown for a new running job and the graph is hidden once there is none.
+        :param running: whether a new job is running
+        '''
+        if running:
+            return get_live_figure(), no_update, {}, 0, False
+        return no_update, no_update, {"display": "none"}, 0, True
+
+    def update_graph(self, _, tab, relayout_data, target_value, shown):
+        '''
+        Update graph of the selected channel, new simulation is sent as a Patch of the shown figure.
+        Zoomed time range is shown with full resolution (up to the point limit) and stays zoomed when
+        new simulations are shown, until the zoom is reset or another channel or target value is selected.
+        '''
+        channel = int(tab)
+        if target_value is None:
+            return no_update, no_update
+        if ctx.triggered_id == "result-graph":
+            x_range = get_zoom_range(relayout_data)
+            if x_range is None:
+                return no_update, no_update
+            x_range = x_range or None
+        elif shown is not None and shown["target_value"] == target_value and shown["channel"] == channel:
+            x_range = shown.get("x_range")
+        else:
+            x_range = None
+        figure, shown = self.figures.get_update(target_value, channel, shown, x_range)
+        return (figure if figure is not None else no_update), shown
 
-    def make_graph(self, controller_type, init_value, target_value, param_1, param_2, param_3, _):
-        """Update graphs based on user input and database state."""
-        if form_valid(controller_type, init_value, target_value, param_1, param_2, param_3):
-            # Do not run the simulation on controller change (let the user set parameters first)
-            if controller_type != None and controller_type != self.simulation.get_controller_type():
-                self.simulation.set_controller(controller_type)
-            else:
-                self.simulation.reset_controller(target_value, init_value, param_1, param_2, param_3)
-                self.simulation.reset(init_value)
-                self.simulation.start()
-                result = self.simulation.get_display_results()
-                self.db.insert_or_update_data(param_1, param_2, param_3, target_value, controller_type, result)
-
-        results = self.db.get_latest_simulations(NUM_SIMULATIONS, target_value)
-        return get_result_graphs(results), get_controls(controller_type, param_1, param_2, param_3)
-    
     def run_server(self):
         self.app.run_server()
 
@@ -0,0 +1,133 @@
+"""Control quality metrics of a step response, computed in a single pass over result chunks."""
+
+import numpy as np
+
+from constants import SETTLING_BAND
+
+# Names of the metrics, they are also the names of Simulations columns storing them
+METRICS = ["iae", "ise", "itae", "overshoot", "settling_time", "rise_time", "total_work"]
+
+class Online_Metrics:
+    '''
+    Metrics updated with consecutive chunks of results in the Simulation.get_display_results layout,
+    the first chunk starts with the initial sample. Error integrals use the length of every step.
+    :param target_value: target value of the simulation
+    :param settling_band: band around the target value the settled response stays within, as a fraction
+    of the step (absolute value if the step is zero)
+    '''
+    def __init__(self, target_value : float, settling_band : float = SETTLING_BAND) -> None:
+        self.target_value = target_value
+        self.settling_band = settling_band
+        self.init_value = None
+        self.start_time = None
+        self.previous_time = None
+        self.iae = 0.0
+        self.ise = 0.0
+        self.itae = 0.0
+        self.total_work = 0.0
+        # Latest error, work and step length, held by hold_until
+        self.last_error = 0.0
+        self.last_work = 0.0
+        self.last_duration = 0.0
+        # Largest deviation past the target value in the direction of the step
+        self.peak = None
+        # Times the response first covers 10% and 90% of the step
+        self.rise_start = None
+        self.rise_end = None
+        # Time of the first sample after the last one outside the band (None while outside)
+        self.settled_since = None
+
+    def update(self, chunk : list) -> None:
+        '''
+        Add next chunk of results.
+        :param chunk: results of the following samples
+        '''
+        times, values, signals = (np.asarray(result, dtype=np.float64) for result in chunk[:3])
+        if len(times) == 0:
+            return
+        if self.init_value is None:
+            self.init_value = float(values[0])
+            self.start_time = self.previous_time = float(times[0])
+        step = self.target_value - self.init_value
+        direction = 1.0 if step >= 0 else -1.0
+
+        # Initial sample has zero duration, so it only counts in the time based metrics
+        durations = np.diff(times, prepend=self.previous_time)
+        errors = np.abs(self.target_value - values)
+        self.iae += float(errors @ durations)
+        self.ise += float((errors * errors) @ durations)
+        self.itae += float((errors * (times - self.start_time)) @ durations)
+        self.total_work += float(np.sum(np.abs(signals)))
+        self.previous_time = float(times[-1])
+        self.last_error = float(errors[-1])
+        self.last_work = abs(float(signals[-1]))
+        self.last_duration = float(durations[-1]) or self.last_duration
+
+        peak = float(np.max(direction * (values - self.target_value)))
+        self.peak = peak if self.peak is None or peak > self.peak else self.peak
+        if step != 0:
+            progress = direction * (values - self.init_value) / abs(step)
+            if self.rise_start is None:
+                reached = np.flatnonzero(progress >= 0.1)
+                self.rise_start = float(times[reached[0]]) if len(reached) else None
+            if self.rise_end is None:
+                reached = np.flatnonzero(progress >= 0.9)
+                self.rise_end = float(times[reached[0]]) if len(reached) else None
+
+        band = self.settling_band * abs(step) if step != 0 else self.settling_band
+        outside = np.flatnonzero(~(errors <= band))
+        if len(outside):
+            self.settled_since = float(times[outside[-1] + 1]) if outside[-1] + 1 < len(times) else None
+        elif self.settled_since is None:
+            self.settled_since = float(times[0])
+
+    def hold_until(self, end_time : float) -> None:
+        '''
+        Extend error integrals and work as if the latest sample was held until end_time, used for
+        simulations stopped early. Settled simulation stays settled, the one that diverged keeps its
+        (large) error, so both compare fairly with simulations that ran to the end.
+        :param end_time: time the simulation would have ended at
+        '''
+        if self.init_value is None or end_time <= self.previous_time:
+            return
+        # Integral of t over the held interval
+        duration = end_time - self.previous_time
+        moment = (end_time * end_time - self.previous_time * self.previous_time) / 2 - self.start_time * duration
+        self.iae += self.last_error * duration
+        self.ise += self.last_error * self.last_error * duration
+        self.itae += self.last_error * moment
+        if self.last_duration:
+            self.total_work += self.last_work * round(duration / self.last_duration)
+        self.previous_time = end_time
+
+    def get_metrics(self) -> dict:
+        '''
+        Metrics of the results added so far, keyed by METRICS. Overshoot is a percentage of the step,
+        time based metrics are None if the response has not reached them.
+        '''
+        if self.init_value is None:
+            return dict.fromkeys(METRICS)
+        step = abs(self.target_value - self.init_value)
+        return {
+            "iae": self.iae,
+            "ise": self.ise,
+            "itae": self.itae,
+            "overshoot": max(self.peak, 0.0) / step * 100 if step != 0 else None,
+            "settling_time": self.settled_since - self.start_time if self.settled_since is not None else None,
+            "rise_time": self.rise_end - self.rise_start if self.rise_end is not None else None,
+            "total_work": self.total_work
+        }
+
+def get_metrics(results : list, target_value : float, end_time : float = None) -> dict:
+    '''
+    Metrics of complete simulation results.
+    :param results: display results of the simulation
+    :param target_value: target value of the simulation
+    :param end_time: time the latest sample is held until (see Online_Metrics.hold_until), if the
+    simulation was stopped early
+    '''
+    metrics = Online_Metrics(target_value)
+    metrics.update(results)
+    if end_time is not None:
+        metrics.hold_until(end_time)
+    return metrics.get_metrics()
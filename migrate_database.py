@@ -0,0 +1,15 @@
+"""Database migration tool, moves stored measurement rows into packed trajectory blobs."""
+import argparse
+
+from constants import DB_FILEPATH
+from database import Database
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert Measurements rows into Trajectories blobs.")
+    parser.add_argument("dbpath", nargs="?", default=DB_FILEPATH)
+    parser.add_argument("--dtype", choices=["float64", "float32"], default="float64")
+    parser.add_argument("--compress", action="store_true")
+    args = parser.parse_args()
+
+    migrated = Database(args.dbpath, storage="blob", blob_dtype=args.dtype, compress=args.compress).migrate_measurements()
+    print(f"Migrated {migrated} simulations")
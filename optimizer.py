@@ -0,0 +1,248 @@
+"""Gain tuning of PI and PID controllers, searches parameters minimizing a cost of simulation metrics."""
+import argparse
+import itertools
+import math
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from constants import DB_FILEPATH
+from database import Database, get_config_key
+from metrics import METRICS
+from sweep import run_stoppable_simulation, save_result
+
+# Default search bounds of (kp, Ti) and (kp, Ti, Td), parameters are searched in log scale
+GAIN_BOUNDS = {
+    "PI": [[0.01, 100.0], [0.1, 1000.0]],
+    "PID": [[0.01, 100.0], [0.1, 1000.0], [0.01, 100.0]]
+}
+# Significant digits of simulated parameters, points closer than that share one stored simulation
+SIGNIFICANT_DIGITS = 6
+
+def get_cost(metrics : dict, cost : str = "iae", work_weight : float = 0.0) -> float:
+    '''
+    Cost of simulation metrics, infinite if the metric is missing or not finite.
+    :param metrics: metrics of the simulation (see metrics.METRICS)
+    :param cost: minimized metric
+    :param work_weight: weight of total work added to the metric
+    '''
+    value = metrics.get(cost)
+    if value is None:
+        return math.inf
+    value += work_weight * metrics["total_work"]
+    return value if math.isfinite(value) else math.inf
+
+class Gain_Optimizer:
+    '''
+    Searches controller parameters minimizing the cost. Every search works on points in log10 scale
+    of the parameters, batches of points are simulated in parallel worker processes. Every simulated
+    point is stored in the database with its metrics, so points stored by earlier searches (or sweeps)
+    with the same stop conditions are not simulated again.
+    :param db: database simulations are stored in
+    :param controller_type: tuned controller (PI or PID)
+    :param target_value: target value of the simulations
+    :param init_value: initial value of the simulations
+    :param cost: minimized metric (see metrics.METRICS)
+    :param work_weight: weight of total work added to the metric
+    :param bounds: [lower, upper] bound of every parameter (GAIN_BOUNDS of the controller by default)
+    :param workers: number of worker processes (all cores by default)
+    :param stop_conditions: stop conditions of every simulation (see sweep.get_stop_conditions)
+    '''
+    def __init__(self, db : Database, controller_type : str, target_value : float, init_value : float,
+                 cost : str = "iae", work_weight : float = 0.0, bounds : list = None, workers : int = None,
+                 stop_conditions : list = None) -> None:
+        self.db = db
+        self.controller_type = controller_type
+        self.target_value = target_value
+        self.init_value = init_value
+        self.cost = cost
+        self.work_weight = work_weight
+        self.bounds = np.log10(np.array(bounds or GAIN_BOUNDS[controller_type], dtype=np.float64))
+        self.workers = workers
+        self.stop_conditions = stop_conditions
+        self.executor = None
+        # Parameters -> cost of every evaluated point
+        self.costs = {}
+        # Number of simulations run (points found in the database are not counted)
+        self.simulations = 0
+
+    def get_params(self, point) -> tuple:
+        '''
+        Parameters of the point, clipped to the bounds and rounded to SIGNIFICANT_DIGITS.
+        :param point: parameters in log10 scale
+        '''
+        point = np.clip(np.asarray(point, dtype=np.float64), self.bounds[:, 0], self.bounds[:, 1])
+        return tuple(float(f"{10 ** value:.{SIGNIFICANT_DIGITS}g}") for value in point)
+
+    def get_config(self, params : tuple) -> dict:
+        '''
+        Simulation configuration of the parameters.
+        :param params: controller parameters
+        '''
+        params = list(params) + [None] * (3 - len(params))
+        return {"controller_type": self.controller_type, "target_value": self.target_value,
+                "init_value": self.init_value, "param_1": params[0], "param_2": params[1], "param_3": params[2]}
+
+    def evaluate(self, points : list) -> list:
+        '''
+        Costs of the points. Points not evaluated yet are looked up in the database and the rest
+        is simulated in parallel and stored.
+        :param points: parameters in log10 scale
+        '''
+        params = [self.get_params(point) for point in points]
+        missing = list(dict.fromkeys(param for param in params if param not in self.costs))
+        configs = {param: self.get_config(param) for param in missing}
+        # Stop conditions are part of the keys, so complete and stopped runs are never mixed
+        keys = {param: get_config_key(config["param_1"], config["param_2"], config["param_3"],
+                                      config["target_value"], config["controller_type"], config["init_value"],
+                                      self.stop_conditions)
+                for param, config in configs.items()}
+        stored = self.db.get_stored_metrics(list(keys.values()))
+        missing = [param for param in missing if keys[param] not in stored]
+        for param, key in keys.items():
+            if key in stored:
+                self.costs[param] = get_cost(stored[key], self.cost, self.work_weight)
+
+        if missing:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            results = self.executor.map(run_stoppable_simulation, [configs[param] for param in missing],
+                                        [self.stop_conditions] * len(missing))
+            # Results are written by this process only, as in sweep.run_sweep
+            for param, result in zip(missing, results):
+                save_result(self.db, configs[param], result, self.stop_conditions)
+                self.costs[param] = get_cost(result[1], self.cost, self.work_weight)
+                self.simulations += 1
+        return [self.costs[param] for param in params]
+
+    def get_best(self) -> list:
+        """Get parameters and cost of the best point evaluated so far."""
+        params = min(self.costs, key=self.costs.get)
+        return [params, self.costs[params]]
+
+    def grid_search(self, points_per_axis : int = 5, levels : int = 3) -> list:
+        '''
+        Coarse-to-fine grid search, every level evaluates a grid around the best point of the previous
+        one, spanning its neighbours. Returns parameters and cost of the best point.
+        :param points_per_axis: number of grid points along every parameter
+        :param levels: number of grids
+        '''
+        low, high = self.bounds[:, 0].copy(), self.bounds[:, 1].copy()
+        for _ in range(levels):
+            points = list(itertools.product(*[np.linspace(lower, upper, points_per_axis)
+                                               for lower, upper in zip(low, high)]))
+            costs = self.evaluate(points)
+            best = np.array(points[int(np.argmin(costs))])
+            spacing = (high - low) / (points_per_axis - 1)
+            low = np.maximum(best - spacing, self.bounds[:, 0])
+            high = np.minimum(best + spacing, self.bounds[:, 1])
+        return self.get_best()
+
+    def nelder_mead(self, start : list = None, max_iterations : int = 100, tolerance : float = 1e-6) -> list:
+        '''
+        Nelder-Mead simplex search. Initial simplex and shrinking are evaluated in parallel, reflected
+        and expanded points are evaluated together. Returns parameters and cost of the best point.
+        :param start: initial parameters (center of the bounds by default)
+        :param max_iterations: maximum number of simplex updates
+        :param tolerance: stop once costs of the simplex differ less than this
+        '''
+        if start is None:
+            start = self.bounds.mean(axis=1)
+        else:
+            start = np.log10(np.asarray(start, dtype=np.float64))
+        size = len(start)
+        step = (self.bounds[:, 1] - self.bounds[:, 0]) / 4
+        simplex = [np.clip(start, self.bounds[:, 0], self.bounds[:, 1])]
+        simplex += [np.clip(start + step[idx] * np.eye(size)[idx], self.bounds[:, 0], self.bounds[:, 1])
+                    for idx in range(size)]
+        costs = self.evaluate(simplex)
+
+        for _ in range(max_iterations):
+            order = np.argsort(costs)
+            simplex = [simplex[idx] for idx in order]
+            costs = [costs[idx] for idx in order]
+            if abs(costs[-1] - costs[0]) <= tolerance:
+                break
+            centroid = np.mean(simplex[:-1], axis=0)
+            reflected = np.clip(2 * centroid - simplex[-1], self.bounds[:, 0], self.bounds[:, 1])
+            expanded = np.clip(3 * centroid - 2 * simplex[-1], self.bounds[:, 0], self.bounds[:, 1])
+            reflected_cost, expanded_cost = self.evaluate([reflected, expanded])
+            if reflected_cost < costs[0]:
+                simplex[-1], costs[-1] = ((expanded, expanded_cost) if expanded_cost < reflected_cost
+                                          else (reflected, reflected_cost))
+                continue
+            if reflected_cost < costs[-2]:
+                simplex[-1], costs[-1] = reflected, reflected_cost
+                continue
+            contracted = (centroid + reflected) / 2 if reflected_cost < costs[-1] else (centroid + simplex[-1]) / 2
+            contracted_cost = self.evaluate([contracted])[0]
+            if contracted_cost < min(reflected_cost, costs[-1]):
+                simplex[-1], costs[-1] = contracted, contracted_cost
+                continue
+            # Shrink towards the best point
+            simplex = [simplex[0]] + [(simplex[0] + point) / 2 for point in simplex[1:]]
+            costs = [costs[0]] + self.evaluate(simplex[1:])
+        return self.get_best()
+
+    def differential_evolution(self, population : int = 16, generations : int = 20, mutation : float = 0.7,
+                               crossover : float = 0.9, seed : int = None) -> list:
+        '''
+        Differential evolution (rand/1/bin), every generation is evaluated in parallel.
+        Returns parameters and cost of the best point.
+        :param population: number of points in the population
+        :param generations: number of generations
+        :param mutation: scale of the difference vector
+        :param crossover: probability of taking parameter from the mutated point
+        :param seed: seed of the random generator
+        '''
+        rng = np.random.default_rng(seed)
+        low, high = self.bounds[:, 0], self.bounds[:, 1]
+        size = len(low)
+        points = low + rng.random((population, size)) * (high - low)
+        costs = np.array(self.evaluate(list(points)))
+        for _ in range(generations):
+            trials = np.empty_like(points)
+            for idx in range(population):
+                first, second, third = rng.choice([other for other in range(population) if other != idx], 3,
+                                                  replace=False)
+                mutated = np.clip(points[first] + mutation * (points[second] - points[third]), low, high)
+                taken = rng.random(size) < crossover
+                # At least one parameter comes from the mutated point
+                taken[rng.integers(size)] = True
+                trials[idx] = np.where(taken, mutated, points[idx])
+            trial_costs = np.array(self.evaluate(list(trials)))
+            improved = trial_costs <= costs
+            points[improved] = trials[improved]
+            costs[improved] = trial_costs[improved]
+        return self.get_best()
+
+    def close(self) -> None:
+        """Shut down worker processes."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune PI/PID gains and store every simulated point in the database.")
+    parser.add_argument("--controller", choices=["PI", "PID"], default="PI")
+    parser.add_argument("--target", type=float, default=10.0)
+    parser.add_argument("--init", type=float, default=25.0)
+    parser.add_argument("--method", choices=["grid", "nelder-mead", "evolution"], default="grid")
+    parser.add_argument("--cost", choices=METRICS, default="iae")
+    parser.add_argument("--work-weight", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    optimizer = Gain_Optimizer(Database(DB_FILEPATH), args.controller, args.target, args.init, args.cost,
+                               args.work_weight, workers=args.workers)
+    try:
+        if args.method == "grid":
+            params, cost = optimizer.grid_search()
+        elif args.method == "nelder-mead":
+            params, cost = optimizer.nelder_mead()
+        else:
+            params, cost = optimizer.differential_evolution()
+    finally:
+        optimizer.close()
+    print(f"Best parameters {params}, {args.cost} {cost:.4f} ({optimizer.simulations} simulations run)")
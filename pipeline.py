@@ -0,0 +1,255 @@
+"""Pipeline stages consuming result chunks of Simulation.stream."""
+
+import math
+import time
+
+import numpy as np
+
+from constants import SIMULATION_TIME, STREAM_CHUNK_SIZE, GRAPH_POINTS, LIVE_UPDATE_INTERVAL
+from database import Database, get_config_key
+from downsampling import downsample
+from metrics import Online_Metrics
+from simulation import Simulation
+
+class Consumer:
+    '''
+    Pipeline stage receiving result chunks in the Simulation.get_display_results layout.
+    Stages stopping the simulation set stop_reason.
+    '''
+    def __init__(self) -> None:
+        self.stop_reason = None
+
+    def consume(self, chunk : list) -> bool:
+        '''
+        Process next chunk of results, returns True to stop the simulation.
+        :param chunk: results of the following samples
+        '''
+        return False
+
+    def close(self, stop_reason : str = None) -> None:
+        '''
+        Finish processing once the simulation ended.
+        :param stop_reason: reason the simulation was stopped early (None if it ran to the end)
+        '''
+
+    def get_settings(self) -> dict:
+        """Settings deciding when the stage stops the simulation (part of configuration keys)."""
+        return {}
+
+class Settling_Detector(Consumer):
+    '''
+    Stops the simulation once the error stays within the tolerance band long enough.
+    :param tolerance: maximum absolute error of settled simulation
+    :param hold_time: time the error has to stay within the band
+    '''
+    def __init__(self, tolerance : float = 0.1, hold_time : float = 10.0) -> None:
+        super().__init__()
+        self.tolerance = tolerance
+        self.hold_time = hold_time
+        # Time since which the error stays within the band (None if it is outside)
+        self.settled_since = None
+
+    def get_settings(self) -> dict:
+        return {"tolerance": self.tolerance, "hold_time": self.hold_time}
+
+    def consume(self, chunk : list) -> bool:
+        times, errors = chunk[0], chunk[4]
+        if len(times) == 0:
+            return False
+        outside = np.flatnonzero(~(np.abs(errors) <= self.tolerance))
+        if len(outside):
+            self.settled_since = times[outside[-1] + 1] if outside[-1] + 1 < len(times) else None
+        elif self.settled_since is None:
+            self.settled_since = times[0]
+        if self.settled_since is not None and times[-1] - self.settled_since >= self.hold_time:
+            self.stop_reason = "settled"
+            return True
+        return False
+
+class Divergence_Detector(Consumer):
+    '''
+    Stops the simulation once the error leaves the allowed range ("diverged") or is not finite
+    ("not finite", NaN or infinite state).
+    :param error_limit: maximum absolute error of the simulation (infinite to only stop on non-finite state)
+    '''
+    def __init__(self, error_limit : float = 100.0) -> None:
+        super().__init__()
+        self.error_limit = error_limit
+
+    def get_settings(self) -> dict:
+        return {"error_limit": self.error_limit}
+
+    def consume(self, chunk : list) -> bool:
+        errors = np.abs(chunk[4])
+        if np.any(~(errors <= self.error_limit)):
+            self.stop_reason = "diverged" if np.all(np.isfinite(errors)) else "not finite"
+            return True
+        return False
+
+class Metrics_Consumer(Consumer):
+    '''
+    Computes metrics of the streamed results chunk by chunk, without keeping the results. Metrics of
+    simulations stopped early hold the latest sample until end_time.
+    :param target_value: target value of the simulation
+    :param end_time: time the simulation would end at
+    '''
+    def __init__(self, target_value : float, end_time : float = SIMULATION_TIME) -> None:
+        super().__init__()
+        self.metrics = Online_Metrics(target_value)
+        self.end_time = end_time
+
+    def consume(self, chunk : list) -> bool:
+        self.metrics.update(chunk)
+        return False
+
+    def close(self, stop_reason : str = None) -> None:
+        if stop_reason is not None and stop_reason != "error":
+            self.metrics.hold_until(self.end_time)
+
+    def get_metrics(self) -> dict:
+        """Get metrics of the results consumed so far."""
+        return self.metrics.get_metrics()
+
+class Live_Plot_Feeder(Consumer):
+    '''
+    Sends streamed results to a live plot, samples received since the previous update are sent at most
+    once per interval (and the rest once the simulation ends) as [times, values] of every channel,
+    downsampled to their share of max_points.
+    :param target: queue the updates are put into, or callback called with every update
+    :param samples: number of samples of the whole simulation (every update gets max_points if None)
+    :param interval: minimum time between updates [ms]
+    :param max_points: number of points of every channel over the whole simulation
+    '''
+    def __init__(self, target, samples : int = None, interval : float = LIVE_UPDATE_INTERVAL,
+                 max_points : int = GRAPH_POINTS) -> None:
+        super().__init__()
+        self.send = target.put if hasattr(target, "put") else target
+        self.samples = samples
+        self.interval = interval
+        self.max_points = max_points
+        self.unsent = []
+        self.sent_at = time.monotonic()
+
+    def consume(self, chunk : list) -> bool:
+        self.unsent.append(chunk)
+        if (time.monotonic() - self.sent_at) * 1000 >= self.interval:
+            self.flush()
+        return False
+
+    def close(self, stop_reason : str = None) -> None:
+        if stop_reason != "error":
+            self.flush()
+        self.unsent = []
+
+    def flush(self) -> None:
+        """Send samples received since the previous update."""
+        if not self.unsent:
+            return
+        update = [np.concatenate(channel) for channel in zip(*self.unsent)]
+        points = self.max_points
+        if self.samples is not None:
+            points = max(math.ceil(self.max_points * len(update[0]) / self.samples), 4)
+        self.send([downsample(update[0], channel, points) for channel in update[1:]])
+        self.unsent = []
+        self.sent_at = time.monotonic()
+
+class Database_Writer(Consumer):
+    '''
+    Writes streamed results into the database in a single transaction committed once the simulation ends.
+    Simulations stopped early are stored up to the stop and marked with the stop reason, their metrics hold
+    the latest sample until SIMULATION_TIME. Simulations stopped by an error are rolled back.
+    In "rows" storage every chunk is inserted right away, so memory stays bounded. Trajectory blobs are
+    written at once, so "blob" storage keeps the chunks until the end. Metrics are computed from the chunks
+    and stored with the results.
+    :param db: database the results are written to
+    :param config: simulation configuration (controller_type, target_value, init_value, param_1, param_2,
+    param_3)
+    :param stop_conditions: stop conditions of the pipeline, simulations that may stop early are stored
+    under their own configuration key
+    '''
+    def __init__(self, db : Database, config : dict, stop_conditions : list = None) -> None:
+        super().__init__()
+        self.db = db
+        self.config = config
+        self.stop_conditions = stop_conditions
+        self.conn = None
+        self.sim_id = None
+        self.chunks = []
+        self.metrics = Online_Metrics(config["target_value"])
+        self.last_time = None
+        self.success = True
+
+    def consume(self, chunk : list) -> bool:
+        config = self.config
+        if self.conn is None:
+            self.conn = self.db.get_connection()
+            self.success, self.sim_id = self.db.insert_simulation(
+                self.conn, config["param_1"], config["param_2"], config["param_3"], config["target_value"],
+                config["controller_type"], config["init_value"], stop_conditions=self.stop_conditions)
+        # Stored configuration only gets its timestamp updated in close
+        if not self.success or self.sim_id is None:
+            return False
+        self.metrics.update(chunk)
+        self.last_time = float(chunk[0][-1]) if len(chunk[0]) else self.last_time
+        if self.db.storage == "blob":
+            self.chunks.append([np.array(result) for result in chunk])
+        else:
+            self.success = self.db.insert_measurements(self.conn, self.sim_id, chunk)
+        return False
+
+    def close(self, stop_reason : str = None) -> None:
+        if self.conn is None:
+            return
+        if stop_reason == "error":
+            self.success = False
+        elif self.success and self.sim_id is None:
+            self.success = self.db.update_timestamp(self.conn, self.get_config_key())
+        if self.success and self.sim_id is not None and self.chunks:
+            self.success = self.db.insert_results(self.conn, self.sim_id,
+                                                  [np.concatenate(channel) for channel in zip(*self.chunks)])
+        if self.success and self.sim_id is not None and stop_reason is not None:
+            self.metrics.hold_until(SIMULATION_TIME)
+            self.success = self.db.update_stop(self.conn, self.sim_id, stop_reason, self.last_time)
+        if self.success and self.sim_id is not None:
+            self.success = self.db.update_metrics(self.conn, self.sim_id, self.metrics.get_metrics())
+        if self.success:
+            self.conn.commit()
+        else:
+            self.conn.rollback()
+        self.chunks = []
+
+    def get_config_key(self) -> str:
+        """Configuration key of the written simulation."""
+        config = self.config
+        return get_config_key(config["param_1"], config["param_2"], config["param_3"], config["target_value"],
+                              config["controller_type"], config["init_value"], self.stop_conditions)
+
+def run_pipeline(simulation : Simulation, consumers : list, chunk_size : int = STREAM_CHUNK_SIZE) -> str:
+    '''
+    Stream the simulation through the consumers until it ends or one of them stops it.
+    Returns the stop reason (None if the simulation ran to the end, "error" if a stage raised).
+    :param simulation: simulation ready to start
+    :param consumers: pipeline stages, every chunk is passed to them in order
+    :param chunk_size: maximum number of steps per chunk
+    '''
+    stop_reason = None
+    stream = simulation.stream(chunk_size)
+    try:
+        for chunk in stream:
+            for consumer in consumers:
+                # Every stage sees the chunk, first stage asking to stop gives the reason
+                if consumer.consume(chunk) and stop_reason is None:
+                    stop_reason = consumer.stop_reason
+            if stop_reason is not None:
+                simulation.stop_reason = stop_reason
+                simulation.stop_time = float(chunk[0][-1])
+                simulation.metrics.hold_until(simulation.get_steps() * simulation.sampling)
+                break
+    except BaseException:
+        stop_reason = "error"
+        raise
+    finally:
+        stream.close()
+        for consumer in consumers:
+            consumer.close(stop_reason)
+    return stop_reason
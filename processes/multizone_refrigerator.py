@@ -0,0 +1,200 @@
+"""Cooling coupled zones (compartments, rooms) of refrigerator process."""
+import numpy as np
+
+from buffers import allocate, carry_over, get_capacity, get_view, grow
+from constants import WATER_MASS, WATER_SPECIFIC_HEAT, RESERVOIR_HOT, RESERVOIR_COLD, AMBIENT_TEMPERATURE, \
+    MAX_PREALLOCATED_SAMPLES, REFRIGERATOR_SIGNAL_LIMIT
+
+class Multizone_Refrigerator:
+    '''
+    Cooling zones exchanging heat with each other and leaking it to the ambient, process object.
+    Temperatures of all zones are a vector advanced with a single vectorized step:
+    m_i * c * dT_i/dt = sum_j G_ij * (T_j - T_i) + L_i * (T_a - T_i) - cooling_i * coefficient * work
+    Controller sees the temperature of the sensor zone, single zone without coupling and leakage
+    is the Refrigerator process.
+    :param zones: number of zones
+    :param conductances: dense zones x zones symmetric matrix of heat conductances between zones [W/K]
+    with zero diagonal, applied as a matrix product (for densely coupled zones)
+    :param edges: sparse list of (zone, zone, conductance) edges, applied per edge (for zones coupled only
+    with their neighbours, e.g. rooms of a warehouse), used if conductances are None
+    :param leakage: conductance of every zone to the ambient [W/K], single value or one per zone
+    :param ambient: ambient temperature
+    :param masses: mass of water in every zone [kg], single value or one per zone
+    :param cooling: share of the work cooling every zone (all of it cools the sensor zone if None)
+    :param sensor: index of the zone measured by the controller
+    '''
+    __slots__ = ("zones", "water_specific_heat", "temp_high", "temp_low", "coefficient", "capacities", "cooling",
+                 "sensor", "laplacian", "sources", "targets", "edge_conductances", "leakage", "ambient_flows",
+                 "temperatures", "samples", "zone_measurements", "work_measurements", "temperature_measurements",
+                 "heat_measurements")
+
+    def __init__(self, zones : int = 1, conductances = None, edges : list = None, leakage = 0.0,
+                 ambient : float = AMBIENT_TEMPERATURE, masses = WATER_MASS, cooling = None, sensor : int = 0) -> None:
+        self.zones = zones
+        self.water_specific_heat = WATER_SPECIFIC_HEAT #c [J/kg]
+        self.temp_high = RESERVOIR_HOT #T_h [K]
+        self.temp_low = RESERVOIR_COLD #T_l [K]
+        #coefficient = -T_l / (T_h - T_l)
+        self.coefficient = -self.temp_low / (self.temp_high - self.temp_low)
+        #m * c of every zone
+        self.capacities = np.broadcast_to(np.asarray(masses, dtype=np.float64), zones) * self.water_specific_heat
+        if cooling is None:
+            cooling = np.zeros(zones)
+            cooling[sensor] = 1.0
+        self.cooling = np.broadcast_to(np.asarray(cooling, dtype=np.float64), zones).copy()
+        self.sensor = sensor
+
+        self.leakage = np.broadcast_to(np.asarray(leakage, dtype=np.float64), zones).copy()
+        # Constant heat flow from the ambient, the part depending on the zone temperature is in the coupling
+        self.ambient_flows = self.leakage * ambient
+        self.laplacian = None
+        self.sources = self.targets = self.edge_conductances = None
+        if conductances is not None:
+            conductances = np.array(conductances, dtype=np.float64).reshape(zones, zones)
+            # Heat flows between two zones the same way in both directions, a zone has no conductance to itself
+            if not np.array_equal(conductances, conductances.T):
+                raise ValueError("Conductances between zones must be a symmetric matrix")
+            if np.any(np.diag(conductances) != 0.0):
+                raise ValueError("Conductances between zones must have a zero diagonal")
+            # Flows of all zones are laplacian @ T + ambient_flows
+            self.laplacian = conductances - np.diag(conductances.sum(axis=1) + self.leakage)
+        elif edges is not None and len(edges):
+            edges = np.asarray(edges, dtype=np.float64).reshape(-1, 3)
+            zone_1, zone_2 = edges[:, 0].astype(np.int64), edges[:, 1].astype(np.int64)
+            # Both directions of every edge, so the flows are a single weighted bincount
+            self.sources = np.concatenate([zone_1, zone_2])
+            self.targets = np.concatenate([zone_2, zone_1])
+            self.edge_conductances = np.concatenate([edges[:, 2], edges[:, 2]])
+        self.reset()
+
+    def __str__(self) -> str:
+        return "Multizone refrigerator"
+
+    def get_flows(self, temperatures : np.ndarray) -> np.ndarray:
+        '''
+        Heat flowing into every zone from other zones and the ambient [W].
+        :param temperatures: temperatures of the zones.
+        '''
+        if self.laplacian is not None:
+            return self.laplacian @ temperatures + self.ambient_flows
+        flows = self.ambient_flows - self.leakage * temperatures
+        if self.sources is not None:
+            flows += np.bincount(self.sources, self.edge_conductances * (temperatures[self.targets] -
+                                 temperatures[self.sources]), self.zones)
+        return flows
+
+    def record(self, temperatures : np.ndarray, work : float) -> None:
+        '''
+        Store measurements of the following sample.
+        :param temperatures: temperatures of the zones.
+        :param work: work performed over the sample.
+        '''
+        # Heat removed from (or added to) all zones
+        heat = float(self.capacities @ (temperatures - self.temperatures))
+        samples = self.samples
+        while samples >= len(self.temperature_measurements) or samples >= len(self.zone_measurements):
+            if samples >= len(self.temperature_measurements):
+                self.work_measurements = grow(self.work_measurements)
+                self.temperature_measurements = grow(self.temperature_measurements)
+                self.heat_measurements = grow(self.heat_measurements)
+            if samples >= len(self.zone_measurements):
+                zone_measurements = np.empty((2 * len(self.zone_measurements), self.zones))
+                zone_measurements[:samples] = self.zone_measurements[:samples]
+                self.zone_measurements = zone_measurements
+        self.work_measurements[samples] = work
+        self.temperature_measurements[samples] = temperatures[self.sensor]
+        self.heat_measurements[samples] = heat
+        self.zone_measurements[samples] = temperatures
+        self.temperatures = temperatures
+        self.samples = samples + 1
+
+    def add_signal(self, signal : float, sampling : float) -> None:
+        '''
+        Calculate system response and environment variables.
+        :param signal: signal from the controller.
+        :param sampling: sampling rate of the simulation.
+        '''
+        # Same limits as the Refrigerator process
+        signal = signal if signal > -REFRIGERATOR_SIGNAL_LIMIT else -REFRIGERATOR_SIGNAL_LIMIT
+        work = sampling * (signal if signal < REFRIGERATOR_SIGNAL_LIMIT else REFRIGERATOR_SIGNAL_LIMIT)
+
+        # Cooling is applied as in Refrigerator, so a single uncoupled zone gives the same results
+        temperatures = self.temperatures - sampling * (work * self.coefficient * self.cooling / self.capacities)
+        temperatures += sampling * (self.get_flows(self.temperatures) / self.capacities)
+        self.record(temperatures, work)
+
+    def get_state(self) -> np.ndarray:
+        """Get state of the process (temperatures of the zones)."""
+        return self.temperatures.copy()
+
+    def get_derivatives(self, state : np.ndarray, signal : float, sampling : float) -> np.ndarray:
+        '''
+        Rate of change of the state while the signal is held, explicit Euler step of it is add_signal.
+        :param state: state of the process.
+        :param signal: signal from the controller.
+        :param sampling: sampling rate of the simulation.
+        '''
+        work = sampling * min(REFRIGERATOR_SIGNAL_LIMIT, max(-REFRIGERATOR_SIGNAL_LIMIT, signal))
+        return (self.get_flows(state) - work * self.coefficient * self.cooling) / self.capacities
+
+    def integrate_signal(self, signal : float, sampling : float, integrator) -> None:
+        '''
+        Calculate system response with provided integrator instead of a single Euler step.
+        :param signal: signal from the controller.
+        :param sampling: sampling rate of the simulation.
+        :param integrator: integrator of the process dynamics.
+        '''
+        temperatures = integrator.integrate(lambda state: self.get_derivatives(state, signal, sampling),
+                                            self.get_state(), sampling)
+        self.record(temperatures, sampling * min(REFRIGERATOR_SIGNAL_LIMIT, max(-REFRIGERATOR_SIGNAL_LIMIT, signal)))
+
+    def get_latest_measurement(self) -> float:
+        """Get latest temperature measurement of the sensor zone."""
+        return float(self.temperatures[self.sensor])
+
+    def get_results(self) -> list:
+        """Get process display results (temperature of the sensor zone, work and heat of all zones)."""
+        return [get_view(self.temperature_measurements, self.samples), get_view(self.work_measurements, self.samples),
+                get_view(self.heat_measurements, self.samples)]
+
+    def get_zone_results(self) -> np.ndarray:
+        """Get temperatures of all zones, one row per sample (view of the measurement buffer)."""
+        return self.zone_measurements[:self.samples]
+
+    def get_zone_capacity(self, steps : int = None) -> int:
+        '''
+        Number of samples of zone temperatures to preallocate, all zones together take at most as much
+        memory as MAX_PREALLOCATED_SAMPLES samples.
+        :param steps: number of simulation steps.
+        '''
+        return max(min(get_capacity(steps), MAX_PREALLOCATED_SAMPLES // self.zones), 1)
+
+    def discard_measurements(self, steps : int = None) -> None:
+        '''
+        Drop recorded measurements except the latest one, which becomes the first sample.
+        :param steps: number of following steps to preallocate measurements for.
+        '''
+        capacity = get_capacity(steps)
+        self.work_measurements = carry_over(self.work_measurements, self.samples, capacity)
+        self.temperature_measurements = carry_over(self.temperature_measurements, self.samples, capacity)
+        self.heat_measurements = carry_over(self.heat_measurements, self.samples, capacity)
+        zone_measurements = np.empty((self.get_zone_capacity(steps), self.zones))
+        zone_measurements[0] = self.zone_measurements[self.samples - 1]
+        self.zone_measurements = zone_measurements
+        self.samples = 1
+
+    def reset(self, init_value = 25.0, steps : int = None) -> None:
+        '''
+        Reset process.
+        :param init_value: initial temperature, single value or one per zone.
+        :param steps: number of simulation steps to preallocate measurements for.
+        '''
+        capacity = get_capacity(steps)
+        self.temperatures = np.broadcast_to(np.asarray(init_value, dtype=np.float64), self.zones).copy()
+        # Measurements
+        self.work_measurements = allocate(capacity)
+        self.temperature_measurements = allocate(capacity, self.temperatures[self.sensor])
+        self.heat_measurements = allocate(capacity)
+        self.zone_measurements = np.empty((self.get_zone_capacity(steps), self.zones))
+        self.zone_measurements[0] = self.temperatures
+        self.samples = 1
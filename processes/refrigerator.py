@@ -1,14 +1,25 @@
 """Cooling water in refrigerator process."""
-from constants import MIN_WORK, MAX_WORK, WATER_MASS, WATER_SPECIFIC_HEAT, RESERVOIR_HOT, RESERVOIR_COLD
+import numpy as np
+
+from buffers import allocate, carry_over, get_capacity, get_view, grow
+from constants import MIN_WORK, MAX_WORK, WATER_MASS, WATER_SPECIFIC_HEAT, RESERVOIR_HOT, RESERVOIR_COLD, \
+    REFRIGERATOR_SIGNAL_LIMIT
 
 class Refrigerator:
     """Cooling water in refrigerator process object."""
+    __slots__ = ("water_mass", "water_specific_heat", "temp_high", "temp_low", "coefficient", "temperature",
+                 "samples", "work_measurements", "temperature_measurements", "heat_measurements")
+
     def __init__(self) -> None:
 
         self.water_mass = WATER_MASS #m [kg]
         self.water_specific_heat = WATER_SPECIFIC_HEAT #c [J/kg]
         self.temp_high = RESERVOIR_HOT #T_h [K]
         self.temp_low = RESERVOIR_COLD #T_l [K]
+
+        #coefficient = -T_l / m * c * (T_h - T_l)
+        self.coefficient = -self.temp_low / (
+             self.temp_high-self.temp_low)
         
         self.reset()
 
@@ -26,40 +37,99 @@ class Refrigerator:
         '''
         
         
-        self.work_measurements.append( sampling * min(50, max(-50,  signal)))
-
-        
-        #coefficient = -T_l / m * c * (T_h - T_l)
-        coefficient = -self.temp_low / (
-             self.temp_high-self.temp_low)
+        # Same as min(limit, max(-limit, signal)) without the builtin calls
+        signal = signal if signal > -REFRIGERATOR_SIGNAL_LIMIT else -REFRIGERATOR_SIGNAL_LIMIT
+        work = sampling * (signal if signal < REFRIGERATOR_SIGNAL_LIMIT else REFRIGERATOR_SIGNAL_LIMIT)
 
         #[T[-1] - sampling * (work * coefficient/(mass*specific heat of water put in refrigerator)) ]
-        self.temperature_measurements.append( 
-             ( self.temperature_measurements[-1]  - sampling *
-               ( self.work_measurements[-1] *  coefficient/(self.water_mass* self.water_specific_heat)))
-        )    
+        temperature = self.temperature - sampling * (work * self.coefficient/(self.water_mass* self.water_specific_heat))
 
         #mass * specific heat * change in temperature
-        self.heat_measurements.append(self.water_mass * self.water_specific_heat *
-                                       (self.temperature_measurements[-1]-self.temperature_measurements[-2]))
-        
-        
-         
+        heat = self.water_mass * self.water_specific_heat * (temperature - self.temperature)
+
+        samples = self.samples
+        try:
+            self.work_measurements[samples] = work
+            self.temperature_measurements[samples] = temperature
+            self.heat_measurements[samples] = heat
+        except IndexError:
+            # Run is longer than preallocated
+            self.work_measurements = grow(self.work_measurements)
+            self.temperature_measurements = grow(self.temperature_measurements)
+            self.heat_measurements = grow(self.heat_measurements)
+            self.work_measurements[samples] = work
+            self.temperature_measurements[samples] = temperature
+            self.heat_measurements[samples] = heat
+        self.temperature = temperature
+        self.samples = samples + 1
+
+    def get_state(self) -> np.ndarray:
+        """Get state of the process (temperature)."""
+        return np.array([self.temperature])
+
+    def get_derivatives(self, state : np.ndarray, signal : float, sampling : float) -> np.ndarray:
+        '''
+        Rate of change of the state while the signal is held, explicit Euler step of it is add_signal.
+        :param state: state of the process.
+        :param signal: signal from the controller.
+        :param sampling: sampling rate of the simulation.
+        '''
+        work = sampling * min(REFRIGERATOR_SIGNAL_LIMIT, max(-REFRIGERATOR_SIGNAL_LIMIT, signal))
+        return np.array([-(work * self.coefficient/(self.water_mass* self.water_specific_heat))])
+
+    def integrate_signal(self, signal : float, sampling : float, integrator) -> None:
+        '''
+        Calculate system response with provided integrator instead of a single Euler step.
+        :param signal: signal from the controller.
+        :param sampling: sampling rate of the simulation.
+        :param integrator: integrator of the process dynamics.
+        '''
+        temperature = float(integrator.integrate(lambda state: self.get_derivatives(state, signal, sampling),
+                                                 self.get_state(), sampling)[0])
+        work = sampling * min(REFRIGERATOR_SIGNAL_LIMIT, max(-REFRIGERATOR_SIGNAL_LIMIT, signal))
+        heat = self.water_mass * self.water_specific_heat * (temperature - self.temperature)
+
+        samples = self.samples
+        while samples >= len(self.temperature_measurements):
+            self.work_measurements = grow(self.work_measurements)
+            self.temperature_measurements = grow(self.temperature_measurements)
+            self.heat_measurements = grow(self.heat_measurements)
+        self.work_measurements[samples] = work
+        self.temperature_measurements[samples] = temperature
+        self.heat_measurements[samples] = heat
+        self.temperature = temperature
+        self.samples = samples + 1
 
-        
     def get_latest_measurement(self) -> float:
         """Get latest temperature measurement."""
-        return self.temperature_measurements[-1] 
+        return self.temperature
 
     def get_results(self) -> list:
-        """Get process display results."""
-        return [self.temperature_measurements, self.work_measurements, self.heat_measurements]
+        """Get process display results (views of the measurement buffers)."""
+        return [get_view(self.temperature_measurements, self.samples), get_view(self.work_measurements, self.samples),
+                get_view(self.heat_measurements, self.samples)]
+
+    def discard_measurements(self, steps : int = None) -> None:
+        '''
+        Drop recorded measurements except the latest one, which becomes the first sample.
+        :param steps: number of following steps to preallocate measurements for.
+        '''
+        capacity = get_capacity(steps)
+        self.work_measurements = carry_over(self.work_measurements, self.samples, capacity)
+        self.temperature_measurements = carry_over(self.temperature_measurements, self.samples, capacity)
+        self.heat_measurements = carry_over(self.heat_measurements, self.samples, capacity)
+        self.samples = 1
 
-    def reset(self, init_value : float = 25.0) -> None:
-        """Reset process."""
+    def reset(self, init_value : float = 25.0, steps : int = None) -> None:
+        '''
+        Reset process.
+        :param init_value: initial temperature.
+        :param steps: number of simulation steps to preallocate measurements for.
+        '''
+        capacity = get_capacity(steps)
         # Measurements
-        self.work_measurements = [0.0]
-        self.temperature_measurements = [ init_value]
-        self.heat_measurements=[0.0]
-        
-        
+        self.work_measurements = allocate(capacity)
+        self.temperature_measurements = allocate(capacity, init_value)
+        self.heat_measurements = allocate(capacity)
+        self.temperature = init_value
+        self.samples = 1
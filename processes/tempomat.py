@@ -1,9 +1,15 @@
 """Car tempomat process."""
 
+import numpy as np
+
+from buffers import allocate, carry_over, get_capacity, get_view, grow
 from constants import MASS, MIN_RESPONSE, MAX_RESPONSE, MIN_SIGNAL, MAX_SIGNAL, RESISTANCE
 
 class Tempomat:
     """Car tempomat process object."""
+    __slots__ = ("mass", "resistance", "min_pull_force", "max_pull_force", "min_signal", "max_signal", "pull_force",
+                 "velocity", "position", "samples", "velocity_measurements", "position_measurements", "signals")
+
     def __init__(self) -> None:
         self.mass = MASS
         self.resistance = RESISTANCE
@@ -33,28 +39,100 @@ class Tempomat:
         :param signal: signal from the controller.
         :param sampling: sampling rate of the simulation.
         '''
-        self.signals.append(min(self.max_signal, max(self.min_signal, signal)))
-        self.pull_force = self.get_signal_response(self.signals[-1])
+        # Same as min(max_signal, max(min_signal, signal)) without the builtin calls
+        signal = signal if signal > self.min_signal else self.min_signal
+        signal = signal if signal < self.max_signal else self.max_signal
+        self.pull_force = self.get_signal_response(signal)
         # v(n+1) = Tp * (Fc(n) - beta*v(n)^2)*m + v(n)
-        self.velocity_measurements.append(sampling * (self.pull_force -
-                                                      (self.resistance*self.velocity_measurements[-1]**2)) /
-                                                      self.mass + self.velocity_measurements[-1]
-                                        )
+        velocity = sampling * (self.pull_force - (self.resistance*self.velocity**2)) / self.mass + self.velocity
         # x = v[-2] * p + x[-1]
-        self.position_measurements.append(sampling * self.velocity_measurements[-2] + self.position_measurements[-1])
+        self.position = sampling * self.velocity + self.position
+        self.velocity = velocity
+
+        samples = self.samples
+        try:
+            self.signals[samples] = signal
+            self.velocity_measurements[samples] = velocity
+            self.position_measurements[samples] = self.position
+        except IndexError:
+            # Run is longer than preallocated
+            self.velocity_measurements = grow(self.velocity_measurements)
+            self.position_measurements = grow(self.position_measurements)
+            self.signals = grow(self.signals)
+            self.signals[samples] = signal
+            self.velocity_measurements[samples] = velocity
+            self.position_measurements[samples] = self.position
+        self.samples = samples + 1
+
+    def get_state(self) -> np.ndarray:
+        """Get state of the process (velocity and position)."""
+        return np.array([self.velocity, self.position])
+
+    def get_derivatives(self, state : np.ndarray, signal : float, sampling : float) -> np.ndarray:
+        '''
+        Rate of change of the state while the signal is held, explicit Euler step of it is add_signal.
+        :param state: state of the process.
+        :param signal: signal from the controller.
+        :param sampling: unused, sampling rate of the simulation.
+        '''
+        pull_force = self.get_signal_response(min(self.max_signal, max(self.min_signal, signal)))
+        # dv/dt = (Fc - beta*v^2)/m, dx/dt = v
+        return np.array([(pull_force - self.resistance*state[0]**2) / self.mass, state[0]])
+
+    def integrate_signal(self, signal : float, sampling : float, integrator) -> None:
+        '''
+        Calculate system response with provided integrator instead of a single Euler step.
+        :param signal: signal from the controller.
+        :param sampling: sampling rate of the simulation.
+        :param integrator: integrator of the process dynamics.
+        '''
+        signal = min(self.max_signal, max(self.min_signal, signal))
+        self.pull_force = self.get_signal_response(signal)
+        self.velocity, self.position = map(float, integrator.integrate(
+            lambda state: self.get_derivatives(state, signal, sampling), self.get_state(), sampling))
+
+        samples = self.samples
+        while samples >= len(self.velocity_measurements):
+            self.velocity_measurements = grow(self.velocity_measurements)
+            self.position_measurements = grow(self.position_measurements)
+            self.signals = grow(self.signals)
+        self.signals[samples] = signal
+        self.velocity_measurements[samples] = self.velocity
+        self.position_measurements[samples] = self.position
+        self.samples = samples + 1
 
     def get_latest_measurement(self) -> float:
         """Get latest velocity measurement."""
-        return self.velocity_measurements[-1] 
+        return self.velocity
 
     def get_results(self) -> list:
-        """Get process display results."""
-        return [self.velocity_measurements, self.position_measurements, self.signals]
+        """Get process display results (views of the measurement buffers)."""
+        return [get_view(self.velocity_measurements, self.samples), get_view(self.position_measurements, self.samples),
+                get_view(self.signals, self.samples)]
 
-    def reset(self, init_value : float = 0.0) -> None:
-        """Reset process."""
+    def discard_measurements(self, steps : int = None) -> None:
+        '''
+        Drop recorded measurements except the latest one, which becomes the first sample.
+        :param steps: number of following steps to preallocate measurements for.
+        '''
+        capacity = get_capacity(steps)
+        self.velocity_measurements = carry_over(self.velocity_measurements, self.samples, capacity)
+        self.position_measurements = carry_over(self.position_measurements, self.samples, capacity)
+        self.signals = carry_over(self.signals, self.samples, capacity)
+        self.samples = 1
+
+    def reset(self, init_value : float = 0.0, steps : int = None) -> None:
+        '''
+        Reset process.
+        :param init_value: initial velocity.
+        :param steps: number of simulation steps to preallocate measurements for.
+        '''
+        capacity = get_capacity(steps)
         # Measurements
-        self.velocity_measurements = [init_value]
-        self.position_measurements = [0.0]
+        self.velocity_measurements = allocate(capacity, init_value)
+        self.position_measurements = allocate(capacity)
         self.pull_force = 0 #N [Fc]
-        self.signals = [0.0] #V [U]
+        self.signals = allocate(capacity) #V [U]
+        self.velocity = init_value
+        self.position = 0.0
+        self.samples = 1
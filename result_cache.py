@@ -0,0 +1,79 @@
+"""Content-addressed cache of simulation results."""
+
+import threading
+
+from collections import OrderedDict
+
+import numpy as np
+
+from constants import RESULT_CACHE_SIZE
+from database import Database, get_config_key
+
+class Result_Cache:
+    '''
+    Cache of simulation display results keyed by configuration hash (see get_config_key).
+    Lookups go through in-memory LRU tier first and the database second, so configurations
+    that were already simulated never run the simulation loop again.
+    :param db: database storing all simulation results
+    :param max_bytes: maximum size of results kept in memory
+    '''
+    def __init__(self, db : Database, max_bytes : int = RESULT_CACHE_SIZE) -> None:
+        self.db = db
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, config_key : str) -> list:
+        '''
+        Get cached display results, None if configuration was never simulated.
+        :param config_key: key of the simulation configuration
+        '''
+        with self.lock:
+            if config_key in self.entries:
+                self.entries.move_to_end(config_key)
+                return self.entries[config_key]
+        result = self.db.get_simulation_results(config_key)
+        if result is not None:
+            self.put(config_key, result)
+        return result
+
+    def put(self, config_key : str, result : list) -> list:
+        '''
+        Keep display results in memory, evicting least recently used results above max_bytes.
+        Results are copied into arrays, so later changes of the simulation do not affect them.
+        :param config_key: key of the simulation configuration
+        :param result: display results of the simulation
+        '''
+        result = [np.array(channel, dtype=np.float64) for channel in result[:5]]
+        size = sum(channel.nbytes for channel in result)
+        if size > self.max_bytes:
+            return result
+        with self.lock:
+            if config_key in self.entries:
+                self.size -= sum(channel.nbytes for channel in self.entries.pop(config_key))
+            self.entries[config_key] = result
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= sum(channel.nbytes for channel in evicted)
+        return result
+
+    def get_or_run(self, config : dict, run) -> list:
+        '''
+        Get display results of configuration, running and storing the simulation only on cache miss.
+        Timestamp of stored simulation is refreshed on hit, so it shows up among latest simulations.
+        :param config: simulation configuration (controller_type, target_value, init_value, param_1,
+        param_2, param_3)
+        :param run: function running the simulation and returning its display results
+        '''
+        params = [config["param_1"], config["param_2"], config["param_3"], config["target_value"],
+                  config["controller_type"]]
+        config_key = get_config_key(*params, config["init_value"])
+        result = self.get(config_key)
+        if result is not None:
+            self.db.update_data(*params, config["init_value"])
+            return result
+        result = run()
+        self.db.insert_or_update_data(*params, result, config["init_value"])
+        return self.put(config_key, result)
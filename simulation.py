@@ -2,49 +2,183 @@
 
 import math
 
-from constants import SAMPLING, SIMULATION_TIME
+import numpy as np
+
+from buffers import allocate, carry_over, get_capacity, get_view, grow
+from constants import SAMPLING, SIMULATION_TIME, STREAM_CHUNK_SIZE, STOP_CHECK_INTERVAL
 from controllers.pi_controller import PI_Controller
 from controllers.pid_controller import PID_Controller
 from controllers.fuzzy_controller import Fuzzy_Controller
+from metrics import Online_Metrics
 from processes.tempomat import Tempomat
 from processes.refrigerator import Refrigerator
 
 class Simulation:
     '''
     Simulation object.
-    :param controller: controller object to use in the simulation.
-    :param process: process object that simulation simulates.
+    :param controller: controller object to use in the simulation (new PI controller by default).
+    :param process: process object that simulation simulates (new refrigerator by default).
+    :param integrator: integrator of the process dynamics between controller samples (None keeps the
+    single explicit Euler step of the process).
     '''
-    def __init__(self, controller = PI_Controller(), process = Refrigerator()) -> None:
+    def __init__(self, controller = None, process = None, integrator = None) -> None:
         self.sampling = SAMPLING
         self.simulation_time = SIMULATION_TIME
-        self.controller = controller
-        self.process = process
-        self.time_measurements = [0.0]
+        # Every simulation owns its controller and process, so concurrent simulations do not share state
+        self.controller = controller if controller is not None else PI_Controller()
+        self.process = process if process is not None else Refrigerator()
+        self.integrator = integrator
+        self.time_measurements = allocate(get_capacity(self.get_steps()))
+        self.samples = 1
+        # Control quality metrics and number of current samples already added to them
+        self.metrics = None
+        self.metered = 0
+        # Reason and time of an early stop (None if the simulation ran to the end)
+        self.stop_reason = None
+        self.stop_time = None
+
+    @classmethod
+    def from_config(cls, config : dict) -> "Simulation":
+        '''
+        Build new simulation ready to start, nothing is shared with other simulations or the config.
+        :param config: simulation configuration (controller_type, target_value, init_value, param_1,
+        param_2, param_3)
+        '''
+        simulation = cls()
+        simulation.set_controller(config["controller_type"])
+        simulation.reset_controller(config["target_value"], config["init_value"],
+                                    config["param_1"], config["param_2"], config["param_3"])
+        simulation.reset(config["init_value"])
+        return simulation
 
-    def start(self) -> None:
-        """Start the simulation."""
+    def start(self, stop_conditions : list = None, check_interval : int = STOP_CHECK_INTERVAL) -> str:
+        '''
+        Start the simulation, returns the stop reason (None if the simulation ran to the end).
+        Metrics are updated with every chunk of steps. Results of stopped simulation end at the stop time,
+        its metrics hold the latest sample until the end of the simulation time.
+        :param stop_conditions: objects checking new samples with consume(chunk) -> bool and setting
+        stop_reason (e.g. pipeline.Settling_Detector, pipeline.Divergence_Detector)
+        :param check_interval: number of steps between checks of the stop conditions and metrics updates
+        '''
+        steps = self.get_steps()
+        stop_conditions = stop_conditions or []
+        # Only stop conditions need short chunks, without them metrics are updated per stream chunk
+        chunk_size = check_interval if stop_conditions else STREAM_CHUNK_SIZE
+        checked = 0
+        for idx in range(1, steps + 1, chunk_size):
+            self.advance(idx, min(idx + chunk_size - 1, steps))
+            self.update_metrics()
+            if not stop_conditions:
+                continue
+            chunk = [result[checked:] for result in self.get_display_results()]
+            checked = self.samples
+            for condition in stop_conditions:
+                # First condition met gives the reason
+                if condition.consume(chunk) and self.stop_reason is None:
+                    self.stop_reason = condition.stop_reason
+            if self.stop_reason is not None:
+                self.stop_time = self.time_measurements[self.samples - 1]
+                break
+        if self.stop_reason is not None:
+            self.metrics.hold_until(steps * self.sampling)
+        return self.stop_reason
+
+    def advance(self, first : int, last : int) -> None:
+        '''
+        Run steps with indexes from first to last (both included).
+        :param first: index of the first step
+        :param last: index of the last step
+        '''
+        previous_time = self.time_measurements[self.samples - 1]
+        if self.integrator is None:
+            add_signal = self.process.add_signal
+        else:
+            # Controller keeps its sampling, signal is held while the integrator advances the process
+            add_signal = lambda signal, sampling: self.process.integrate_signal(signal, sampling, self.integrator)
         # Main loop
-        for idx in range(1, math.floor(self.simulation_time / self.sampling) + 1):
-            self.time_measurements.append(idx*self.sampling)
-            signal = self.controller.get_signal(self.process.get_latest_measurement(),
-                                               self.time_measurements[-1],
-                                               self.time_measurements[-2])
-            self.process.add_signal(signal, self.sampling)
+        for idx in range(first, last + 1):
+            last_time = idx*self.sampling
+            try:
+                self.time_measurements[self.samples] = last_time
+            except IndexError:
+                # Run is longer than preallocated (or simulation was started again without reset)
+                self.time_measurements = grow(self.time_measurements)
+                self.time_measurements[self.samples] = last_time
+            self.samples += 1
+            signal = self.controller.get_signal(self.process.get_latest_measurement(), last_time, previous_time)
+            add_signal(signal, self.sampling)
+            previous_time = last_time
+
+    def stream(self, chunk_size : int = STREAM_CHUNK_SIZE):
+        '''
+        Run the simulation as a generator of result chunks in the get_display_results layout, the first chunk
+        includes the initial sample. Samples of yielded chunks are dropped from the simulation, so memory
+        stays bounded for any simulation time. Closing the generator stops the simulation.
+        :param chunk_size: maximum number of steps per chunk
+        '''
+        steps = self.get_steps()
+        self.discard_measurements(min(chunk_size, steps))
+        first = True
+        for idx in range(1, steps + 1, chunk_size):
+            last = min(idx + chunk_size - 1, steps)
+            if not first:
+                self.discard_measurements(last - idx + 1)
+            self.advance(idx, last)
+            self.update_metrics()
+            results = self.get_display_results()
+            yield results if first else [result[1:] for result in results]
+            first = False
+
+    def discard_measurements(self, steps : int = None) -> None:
+        '''
+        Drop recorded results except the latest sample, which becomes the first one.
+        :param steps: number of following steps to preallocate results for.
+        '''
+        self.time_measurements = carry_over(self.time_measurements, self.samples, get_capacity(steps))
+        self.samples = 1
+        # Carried over sample was already added to the metrics
+        self.metered = min(self.metered, 1)
+        self.process.discard_measurements(steps)
+        self.controller.discard_measurements(steps)
 
     def reset(self, init_value) -> None:
         """Reset simulation and its parameters."""
-        self.time_measurements = [0.0]
-        self.process.reset(init_value)
+        self.time_measurements = allocate(get_capacity(self.get_steps()))
+        self.samples = 1
+        self.metrics = None
+        self.metered = 0
+        self.stop_reason = None
+        self.stop_time = None
+        self.process.reset(init_value, self.get_steps())
+        if self.integrator is not None:
+            self.integrator.reset()
+
+    def update_metrics(self) -> None:
+        """Add samples recorded since the last update to the control quality metrics."""
+        if self.metered == self.samples:
+            return
+        if self.metrics is None:
+            self.metrics = Online_Metrics(self.controller.target_value)
+        self.metrics.update([result[self.metered:] for result in self.get_display_results()])
+        self.metered = self.samples
+
+    def get_metrics(self) -> dict:
+        """Get control quality metrics of the simulation so far (see metrics.METRICS)."""
+        self.update_metrics()
+        return self.metrics.get_metrics()
+
+    def get_steps(self) -> int:
+        """Get number of simulation steps."""
+        return math.floor(self.simulation_time / self.sampling)
 
     def reset_controller(self, target_value, init_value, param_1, param_2, param_3):
         """Reset selected controller object."""
         if str(self.controller) == "PI":
-            self.controller.reset(target_value, init_value, param_1, param_2)
+            self.controller.reset(target_value, init_value, param_1, param_2, steps=self.get_steps())
         elif str(self.controller) == "PID":
-            self.controller.reset(target_value, init_value, param_1, param_2, param_3)
+            self.controller.reset(target_value, init_value, param_1, param_2, param_3, steps=self.get_steps())
         else:
-            self.controller.reset(target_value, init_value)
+            self.controller.reset(target_value, init_value, steps=self.get_steps())
 
     def get_controller_type(self) -> str:
         """Get name of selected controller."""
@@ -63,6 +197,18 @@ class Simulation:
         """Change simulated process to provided process."""
         self.process = process
 
-    def get_display_results(self) -> list:
-        """Return simulation results to display."""
-        return [self.time_measurements] + self.process.get_results() + [self.controller.get_errors()]
+    def set_integrator(self, integrator) -> None:
+        """Change integrator of the process dynamics (None for the single Euler step of the process)."""
+        self.integrator = integrator
+
+    def get_display_results(self, time_grid : list = None) -> list:
+        '''
+        Return simulation results to display.
+        :param time_grid: times to resample results onto by linear interpolation (controller samples if None).
+        '''
+        results = ([get_view(self.time_measurements, self.samples)] + self.process.get_results() +
+                   [self.controller.get_errors()])
+        if time_grid is None:
+            return results
+        time_grid = np.asarray(time_grid, dtype=np.float64)
+        return [time_grid] + [np.interp(time_grid, results[0], result) for result in results[1:]]
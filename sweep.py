@@ -0,0 +1,183 @@
+"""Parallel parameter sweep, runs simulations on all cores and streams results into the database."""
+import argparse
+import itertools
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from constants import DB_FILEPATH, GRAPH_POINTS, LIVE_UPDATE_INTERVAL
+from database import Database
+from pipeline import Divergence_Detector, Live_Plot_Feeder, Settling_Detector
+from simulation import Simulation
+
+def get_grid(controller_type : str, target_values : list, init_values : list, param_1s : list = (None,),
+             param_2s : list = (None,), param_3s : list = (None,)) -> list:
+    '''
+    Build list of simulation configurations from every combination of provided values.
+    :param controller_type: name of the controller (PI, PID or Fuzzy)
+    :param target_values: target values of the simulation
+    :param init_values: initial values of the simulation
+    :param param_1s: values of the first parameter (only for PI and PID)
+    :param param_2s: values of the second parameter (only for PI and PID)
+    :param param_3s: values of the third parameter (only for PID)
+    '''
+    if controller_type == "Fuzzy":
+        param_1s, param_2s, param_3s = (None,), (None,), (None,)
+    elif controller_type == "PI":
+        param_3s = (None,)
+    return [
+        {"controller_type": controller_type, "target_value": target_value, "init_value": init_value,
+         "param_1": param_1, "param_2": param_2, "param_3": param_3}
+        for target_value, init_value, param_1, param_2, param_3
+        in itertools.product(target_values, init_values, param_1s, param_2s, param_3s)
+    ]
+
+def run_simulation(config : dict) -> list:
+    '''
+    Run single simulation in a worker process.
+    :param config: simulation configuration (see get_grid)
+    '''
+    simulation = Simulation.from_config(config)
+    simulation.start()
+    return simulation.get_display_results()
+
+def run_live_simulation(config : dict, progress, abort, interval : float = LIVE_UPDATE_INTERVAL,
+                        max_points : int = GRAPH_POINTS) -> list:
+    '''
+    Run single simulation in a worker process, sending progress while it runs. Samples simulated since
+    the previous update are put into the progress queue at most once per interval, as [times, values]
+    of every channel downsampled to their share of max_points (the whole simulation sent this way has
+    about max_points points per channel). Returns display results, None if the simulation was aborted.
+    :param config: simulation configuration (see get_grid)
+    :param progress: queue receiving the updates
+    :param abort: event stopping the simulation once set
+    :param interval: minimum time between updates [ms]
+    :param max_points: number of points of every channel over the whole simulation
+    '''
+    simulation = Simulation.from_config(config)
+    # Samples after the latest update come with the results, so the feeder is never closed
+    feeder = Live_Plot_Feeder(progress, simulation.get_steps() + 1, interval, max_points)
+    stream = simulation.stream()
+    chunks = []
+    for chunk in stream:
+        chunks.append(chunk)
+        if abort.is_set():
+            stream.close()
+            return None
+        feeder.consume(chunk)
+    return [np.concatenate(channel) for channel in zip(*chunks)]
+
+def run_stoppable_simulation(config : dict, stop_conditions : list = None) -> list:
+    '''
+    Run single simulation in a worker process until it ends or meets one of the stop conditions,
+    returns its display results, metrics and stop reason.
+    :param config: simulation configuration (see get_grid)
+    :param stop_conditions: stop conditions of Simulation.start, every worker call gets its own copy
+    '''
+    simulation = Simulation.from_config(config)
+    stop_reason = simulation.start(stop_conditions)
+    return [simulation.get_display_results(), simulation.get_metrics(), stop_reason]
+
+def get_stop_conditions(settling_tolerance : float = None, hold_time : float = 10.0,
+                        error_limit : float = None) -> list:
+    '''
+    Build stop conditions of sweep simulations. If any is requested, simulations with non-finite state
+    are stopped as well.
+    :param settling_tolerance: maximum absolute error of settled simulation (never stop settled if None)
+    :param hold_time: time the error has to stay within the settling tolerance
+    :param error_limit: maximum absolute error of the simulation (no limit if None)
+    '''
+    if settling_tolerance is None and error_limit is None:
+        return []
+    stop_conditions = [Divergence_Detector(error_limit if error_limit is not None else float("inf"))]
+    if settling_tolerance is not None:
+        stop_conditions.append(Settling_Detector(settling_tolerance, hold_time))
+    return stop_conditions
+
+def save_result(db : Database, config : dict, result : list, stop_conditions : list = None) -> None:
+    '''
+    Write finished simulation into the database.
+    :param db: database the results are written to
+    :param config: simulation configuration (see get_grid)
+    :param result: display results, metrics and stop reason of the simulation
+    :param stop_conditions: stop conditions the simulation was run with
+    '''
+    measurements, metrics, stop_reason = result
+    db.insert_or_update_data(config["param_1"], config["param_2"], config["param_3"],
+                             config["target_value"], config["controller_type"], measurements, config["init_value"],
+                             metrics, stop_reason, stop_conditions)
+
+def run_sweep(configs : list, db : Database, workers : int = None, resume : bool = False,
+              progress : bool = True, stop_conditions : list = None) -> int:
+    '''
+    Run simulations for all configurations in parallel. Workers only simulate, every result
+    is written by this (single) process to avoid SQLite lock contention. Results are written
+    in the order of configs, regardless of the order in which workers finish.
+    :param configs: list of simulation configurations (see get_grid)
+    :param db: database the results are written to
+    :param workers: number of worker processes (all cores by default)
+    :param resume: skip configurations already present in the database (with the same stop conditions)
+    :param progress: print progress after every written result
+    :param stop_conditions: stop conditions of every simulation (see get_stop_conditions), simulations run
+    with them are stored under keys of their own, stopped ones up to the stop and marked with the stop reason
+    '''
+    if resume:
+        configs = [config for config in configs if not db.simulation_exists(
+            config["param_1"], config["param_2"], config["param_3"], config["target_value"],
+            config["controller_type"], config["init_value"], stop_conditions)]
+
+    workers = workers or os.cpu_count()
+    # Bound results held in memory (running and waiting for their predecessors) for long sweeps
+    window = workers * 4
+    pending_configs = iter(enumerate(configs))
+    start_time = time.time()
+    running = {}
+    finished = {}
+    next_idx = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            for idx, config in itertools.islice(pending_configs, window - len(running) - len(finished)):
+                running[executor.submit(run_stoppable_simulation, config, stop_conditions)] = idx
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                finished[running.pop(future)] = future.result()
+            # Stream every result that is next in order, keep the rest until its predecessors finish
+            while next_idx in finished:
+                save_result(db, configs[next_idx], finished.pop(next_idx), stop_conditions)
+                next_idx += 1
+                if progress:
+                    elapsed = time.time() - start_time
+                    print(f"[{next_idx}/{len(configs)}] {elapsed:.1f}s elapsed, "
+                          f"{elapsed / next_idx * (len(configs) - next_idx):.1f}s remaining")
+    return next_idx
+
+def parse_values(text : str) -> list:
+    '''
+    Parse comma separated list of floats.
+    :param text: e.g. "0.1,0.5,1.0"
+    '''
+    return [float(value) for value in text.split(",")]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run grid of simulations and store them in the database.")
+    parser.add_argument("--controller", choices=["PI", "PID", "Fuzzy"], default="PI")
+    parser.add_argument("--target", type=parse_values, default=[10.0])
+    parser.add_argument("--init", type=parse_values, default=[25.0])
+    parser.add_argument("--kp", type=parse_values, default=[1.0])
+    parser.add_argument("--ti", type=parse_values, default=[1.0])
+    parser.add_argument("--td", type=parse_values, default=[1.0])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--resume", action="store_true")
+    parser.add_argument("--settling-tolerance", type=float, default=None)
+    parser.add_argument("--hold-time", type=float, default=10.0)
+    parser.add_argument("--error-limit", type=float, default=None)
+    args = parser.parse_args()
+
+    configs = get_grid(args.controller, args.target, args.init, args.kp, args.ti, args.td)
+    run_sweep(configs, Database(DB_FILEPATH), args.workers, args.resume,
+              stop_conditions=get_stop_conditions(args.settling_tolerance, args.hold_time, args.error_limit))
@@ -0,0 +1,16 @@
+"""Shared setup of the tests, modules of the application are imported from the repository root."""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from database import Database
+
+@pytest.fixture
+def database(tmp_path, monkeypatch) -> Database:
+    """Empty database in a temporary directory, table scripts are read from the repository root."""
+    monkeypatch.chdir(ROOT)
+    return Database(str(tmp_path / "database.db"))
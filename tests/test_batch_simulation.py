@@ -0,0 +1,34 @@
+"""Tests of the batch simulation against single simulations."""
+import numpy as np
+import pytest
+
+from batch_simulation import Batch_Simulation
+from controllers.pi_controller import PI_Controller
+from controllers.pid_controller import PID_Controller
+from processes.refrigerator import Refrigerator
+from simulation import Simulation
+
+# Target value, initial value, proportional gain, reset time and derivative time
+CONFIGS = [(10, 25, 1.0, 1.0, 0.0), (5, 20, 0.3, 2.0, 0.0), (10, 25, 1.0, 1.0, 1.0), (15, 25, 0.5, 3.0, 0.2)]
+
+def run_single(config : tuple, anti_windup : bool = False, integral_limit : float = None) -> list:
+    """Results of the configuration simulated by Simulation."""
+    target_value, init_value, proportional_gain, reset_time, derivative_time = config
+    if derivative_time == 0.0:
+        controller = PI_Controller(target_value, init_value, proportional_gain, reset_time, anti_windup,
+                                   integral_limit)
+    else:
+        controller = PID_Controller(target_value, init_value, proportional_gain, reset_time, derivative_time,
+                                    anti_windup, integral_limit)
+    simulation = Simulation(controller, Refrigerator())
+    simulation.reset(init_value)
+    simulation.start()
+    return simulation.get_display_results()
+
+@pytest.mark.parametrize("anti_windup, integral_limit", [(False, None), (True, None), (False, 20.0)])
+def test_batch_matches_single_simulations(anti_windup, integral_limit):
+    batch = Batch_Simulation(*zip(*CONFIGS), anti_windup=anti_windup, integral_limit=integral_limit)
+    batch.start()
+    for idx, config in enumerate(CONFIGS):
+        for expected, result in zip(run_single(config, anti_windup, integral_limit), batch.get_display_results(idx)):
+            np.testing.assert_array_equal(result, expected)
@@ -0,0 +1,44 @@
+"""Tests of the trajectory blob storage mode of the database."""
+import numpy as np
+import pytest
+
+from database import Database, get_config_key
+from simulation import Simulation
+
+CONFIG = {"controller_type": "PID", "target_value": 10, "init_value": 25, "param_1": 1.0, "param_2": 2.0,
+          "param_3": 0.5}
+KEY = get_config_key(1.0, 2.0, 0.5, 10, "PID", 25)
+
+def get_results() -> list:
+    simulation = Simulation.from_config(CONFIG)
+    simulation.start()
+    return simulation.get_display_results()
+
+def store(db : Database, results : list) -> None:
+    assert db.insert_or_update_data(1.0, 2.0, 0.5, 10, "PID", results, 25)
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_blob_round_trip(database, compress):
+    results = get_results()
+    db = Database(database.dbpath, storage="blob", compress=compress)
+    store(db, results)
+    for expected, result in zip(results, db.get_simulation_results(KEY)):
+        np.testing.assert_array_equal(result, expected)
+
+def test_float32_blob_round_trip(database):
+    results = get_results()
+    db = Database(database.dbpath, storage="blob", blob_dtype="float32")
+    store(db, results)
+    for expected, result in zip(results, db.get_simulation_results(KEY)):
+        np.testing.assert_array_equal(result, np.asarray(expected, dtype=np.float32))
+
+def test_migrated_rows_match_blobs(database):
+    results = get_results()
+    store(database, results)
+    rows = database.get_simulation_results(KEY)
+    assert Database(database.dbpath, storage="blob").migrate_measurements(vacuum=False) == 1
+    assert database.get_connection().execute("SELECT COUNT(*) FROM Measurements").fetchone()[0] == 0
+    latest = database.get_latest_simulations(1, 10)
+    for expected, stored, migrated in zip(results, rows, latest[0][:5]):
+        np.testing.assert_array_equal(stored, expected)
+        np.testing.assert_array_equal(migrated, expected)
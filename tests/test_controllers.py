@@ -0,0 +1,81 @@
+"""Tests of the PI and PID controllers against their original implementation and of anti-windup."""
+import numpy as np
+import pytest
+
+from constants import SAMPLING
+from controllers.pi_controller import PI_Controller
+from controllers.pid_controller import PID_Controller
+
+class Baseline_PI:
+    """Original PI controller summing all errors on every step."""
+    def __init__(self, target_value : float, init_value : float, proportional_gain : float,
+                 reset_time : float) -> None:
+        self.target_value = target_value
+        self.errors = [target_value - init_value]
+        self.proportional_gain = proportional_gain
+        self.reset_time = reset_time
+
+    def get_signal(self, last_value : float, last_time : int, time_before_that : int) -> float:
+        self.errors.append(self.target_value - last_value)
+        return self.proportional_gain * (self.errors[-1] + ((SAMPLING / self.reset_time) * sum(self.errors)))
+
+class Baseline_PID(Baseline_PI):
+    """Original PID controller summing all errors on every step."""
+    def __init__(self, target_value : float, init_value : float, proportional_gain : float, reset_time : float,
+                 derivative_time : float) -> None:
+        super().__init__(target_value, init_value, proportional_gain, reset_time)
+        self.derivative_time = derivative_time
+
+    def get_signal(self, last_value : float, last_time : int, time_before_that : int) -> float:
+        self.errors.append(self.target_value - last_value)
+        integral_part = (SAMPLING / self.reset_time) * sum(self.errors)
+        derivative_part = (self.derivative_time / SAMPLING) * (self.errors[-1] - self.errors[-2])
+        return self.proportional_gain * (self.errors[-1] + integral_part + derivative_part)
+
+def get_values(steps : int = 2000) -> np.ndarray:
+    """Noisy temperatures settling from the initial value towards the target."""
+    rng = np.random.default_rng(0)
+    times = np.arange(steps) * SAMPLING
+    return 10 + 15 * np.exp(-times / 20) * np.cos(times) + 0.1 * rng.standard_normal(steps)
+
+def get_signals(controller, values : np.ndarray) -> np.ndarray:
+    return np.array([controller.get_signal(value, step * SAMPLING, (step - 1) * SAMPLING)
+                     for step, value in enumerate(values, 1)])
+
+@pytest.mark.parametrize("controllers", [
+    (PI_Controller(10, 25, 1.0, 2.0, max_signal=np.inf, min_signal=-np.inf), Baseline_PI(10, 25, 1.0, 2.0)),
+    (PID_Controller(10, 25, 0.5, 3.0, 0.2), Baseline_PID(10, 25, 0.5, 3.0, 0.2))
+])
+def test_running_sums_match_baseline(controllers):
+    controller, baseline = controllers
+    values = get_values()
+    np.testing.assert_array_equal(get_signals(controller, values), get_signals(baseline, values))
+    assert controller.sums == sum(baseline.errors)
+
+def get_controller(controller_type : str, anti_windup : bool):
+    """Controller with the output limited to +-5, PID without the derivative part."""
+    if controller_type == "PI":
+        return PI_Controller(10, 25, 1.0, 1.0, anti_windup, min_signal=-5.0, max_signal=5.0)
+    return PID_Controller(10, 25, 1.0, 1.0, 0.0, anti_windup, min_signal=-5.0, max_signal=5.0)
+
+@pytest.mark.parametrize("controller_type", ["PI", "PID"])
+def test_anti_windup_holds_integral_while_saturated(controller_type):
+    controller = get_controller(controller_type, True)
+    # Error of -15 keeps the output below its lower limit, integrating it would push it further
+    signals = get_signals(controller, np.full(100, 25.0))
+    assert controller.sums == -15.0 and np.all(signals < controller.min_signal)
+
+    # Integration resumes once the output is back within its limits
+    signal = controller.get_signal(12.0, 0.0, 0.0)
+    assert controller.min_signal <= signal <= controller.max_signal and controller.sums == -17.0
+
+    windup = get_controller(controller_type, False)
+    get_signals(windup, np.full(100, 25.0))
+    assert windup.sums == -15.0 * 101
+
+def test_integral_limit_clamps_sums():
+    controller = PI_Controller(10, 25, 1.0, 1.0, integral_limit=100.0)
+    get_signals(controller, np.full(100, 25.0))
+    assert controller.sums == -100.0
+    get_signals(controller, np.full(5, 5.0))
+    assert controller.sums == -75.0
@@ -0,0 +1,56 @@
+"""Tests of downsampling of result series for graphs."""
+import numpy as np
+import pytest
+
+from downsampling import downsample, get_buckets, lttb, min_max
+
+def get_series(size : int = 10000) -> tuple:
+    """Noisy oscillating series with a single spike."""
+    rng = np.random.default_rng(0)
+    x = np.linspace(0.0, 100.0, size)
+    y = np.sin(x) + 0.1 * rng.standard_normal(size)
+    y[size // 3] = 10.0
+    return x, y
+
+def test_buckets_cover_all_samples():
+    buckets = get_buckets(1003, 10)
+    assert np.array_equal(np.unique(buckets), np.arange(1003))
+
+@pytest.mark.parametrize("method", [min_max, lttb])
+@pytest.mark.parametrize("max_points", [4, 5, 100, 1001])
+def test_kept_samples(method, max_points):
+    x, y = get_series()
+    kept = method(x, y, max_points)
+    assert len(kept) <= max_points
+    assert kept[0] == 0 and kept[-1] == len(y) - 1
+    assert np.all(np.diff(kept) > 0)
+
+def test_min_max_keeps_extremes():
+    x, y = get_series()
+    kept = min_max(x, y, 100)
+    assert np.argmax(y) in kept and np.argmin(y) in kept
+
+@pytest.mark.parametrize("method", [min_max, lttb])
+def test_short_series_is_kept(method):
+    x, y = get_series(50)
+    assert np.array_equal(method(x, y, 100), np.arange(50))
+
+@pytest.mark.parametrize("method, max_points", [(min_max, 2), (min_max, 3), (lttb, 2)])
+def test_without_room_for_buckets(method, max_points):
+    x, y = get_series()
+    assert np.array_equal(method(x, y, max_points), [0, len(y) - 1])
+
+@pytest.mark.parametrize("method", [min_max, lttb])
+@pytest.mark.parametrize("max_points", [0, 1])
+def test_without_room_for_endpoints(method, max_points):
+    x, y = get_series()
+    with pytest.raises(ValueError):
+        method(x, y, max_points)
+
+def test_downsample_range():
+    x, y = get_series()
+    kept_x, kept_y = downsample(x, y, 100, x_range=[40.0, 60.0])
+    # Nearest samples outside the range keep the line continuous up to its edges
+    assert kept_x[0] < 40.0 and kept_x[1] >= 40.0
+    assert kept_x[-1] > 60.0 and kept_x[-2] <= 60.0
+    assert len(kept_x) <= 100 and np.array_equal(np.interp(kept_x, x, y), kept_y)
@@ -0,0 +1,48 @@
+"""Tests of result figures updates."""
+import json
+
+import plotly
+
+from figures import Figure_Builder
+from simulation import Simulation
+
+def add_simulation(database, param_1 : float) -> None:
+    """Simulate PI controller with the proportional gain and store its results."""
+    config = {"controller_type": "PI", "target_value": 10, "init_value": 25, "param_1": param_1, "param_2": 2.0,
+              "param_3": None}
+    simulation = Simulation.from_config(config)
+    simulation.start()
+    database.insert_or_update_data(param_1, 2.0, None, 10, "PI", simulation.get_display_results(), 25)
+
+def is_patch(update) -> bool:
+    """Check if the figure update is a Patch."""
+    return "__dash_patch_update" in json.dumps(update, cls=plotly.utils.PlotlyJSONEncoder)
+
+def test_new_simulation_is_patched(database):
+    builder = Figure_Builder(database)
+    add_simulation(database, 1.0)
+    _, shown = builder.get_update(10, 1)
+    add_simulation(database, 2.0)
+    update, shown = builder.get_update(10, 1, shown)
+    assert is_patch(update) and len(shown["ids"]) == 2
+    assert builder.get_update(10, 1, shown)[0] is None
+
+def test_zoomed_figure_is_not_patched(database):
+    builder = Figure_Builder(database)
+    add_simulation(database, 1.0)
+    _, shown = builder.get_update(10, 1)
+    figure, shown = builder.get_update(10, 1, shown, [10, 20])
+    assert figure["layout"]["xaxis"]["range"] == [10, 20] and shown["x_range"] == [10, 20]
+    assert builder.get_update(10, 1, shown, [10, 20])[0] is None
+
+    # New simulation keeps the zoom with the whole figure
+    add_simulation(database, 2.0)
+    figure, shown = builder.get_update(10, 1, shown, [10, 20])
+    assert not is_patch(figure) and len(figure["data"]) == 2
+    assert figure["layout"]["xaxis"]["range"] == [10, 20]
+
+    # Reset zoom replaces the zoomed traces, only the following simulation is patched
+    figure, shown = builder.get_update(10, 1, shown)
+    assert not is_patch(figure) and "range" not in figure["layout"]["xaxis"] and shown["x_range"] is None
+    add_simulation(database, 3.0)
+    assert is_patch(builder.get_update(10, 1, shown)[0])
@@ -0,0 +1,75 @@
+"""Tests of the fuzzy controller inference modes against simpful."""
+import numpy as np
+import pytest
+
+from controllers.fuzzy_controller import Fuzzy_Controller
+from controllers.fuzzy_table import Fuzzy_Table
+from processes.refrigerator import Refrigerator
+from simulation import Simulation
+
+@pytest.fixture(scope="module")
+def controller() -> Fuzzy_Controller:
+    return Fuzzy_Controller(compiled=True)
+
+def get_inputs(count : int = 40) -> tuple:
+    """Normalized errors and error changes, partly outside of the fuzzy sets."""
+    rng = np.random.default_rng(0)
+    return rng.uniform(-1.2, 1.2, count), rng.uniform(-0.8, 0.8, count)
+
+def get_exact_signals(controller : Fuzzy_Controller, errors, error_diffs) -> np.ndarray:
+    return np.array([controller.get_exact_signal(error, error_diff) for error, error_diff in zip(errors, error_diffs)])
+
+def test_engine_matches_simpful(controller):
+    errors, error_diffs = get_inputs()
+    np.testing.assert_allclose(controller.get_signals(errors, error_diffs),
+                               get_exact_signals(controller, errors, error_diffs), atol=1e-9)
+
+def test_table_matches_inference_on_grid(controller):
+    table = controller.table
+    errors, error_diffs = np.meshgrid(table.error_axis[::16], table.error_diff_axis[::16], indexing="ij")
+    np.testing.assert_allclose(table.get_values(errors, error_diffs),
+                               get_exact_signals(controller, errors.ravel(), error_diffs.ravel()).reshape(errors.shape),
+                               atol=1e-9)
+
+def test_table_deviation(controller):
+    table = controller.table
+    errors, error_diffs = get_inputs()
+    deviation = np.abs(table.get_values(errors, error_diffs) - get_exact_signals(controller, errors, error_diffs))
+    assert table.max_deviation is not None and np.max(deviation) <= table.max_deviation
+    assert np.array_equal(table.get_values(errors, error_diffs),
+                          [table.get_value(error, error_diff) for error, error_diff in zip(errors, error_diffs)])
+
+def test_tables_are_shared(controller):
+    assert Fuzzy_Controller(compiled=True).table is controller.table
+
+def test_tables_are_keyed_by_rule_base(controller):
+    other = Fuzzy_Controller()
+    other.rules = other.rules[:-1]
+    assert other.compile_table(controller.table.error_axis, controller.table.error_diff_axis,
+                               deviation_samples=1) is not controller.table
+
+def test_deviation_inside_cells():
+    axis = np.linspace(-1.0, 1.0, 11)
+    table = Fuzzy_Table.compile(lambda errors, error_diffs: errors ** 2 + error_diffs, axis, axis)
+    # Bilinear interpolation of a parabola is furthest from it in the middle of the cells
+    assert table.measure_deviation(lambda errors, error_diffs: errors ** 2 + error_diffs) == pytest.approx(0.01)
+
+def test_sampled_deviation_checks_nodes():
+    axis = np.linspace(-1.0, 1.0, 11)
+    table = Fuzzy_Table.compile(lambda errors, error_diffs: errors + error_diffs, axis, axis)
+    assert table.measure_deviation(lambda errors, error_diffs: errors + error_diffs, samples=8) == pytest.approx(0.0)
+    # Inference differing only on the nodes is not visible in the middle of the cells
+    on_nodes = lambda errors, error_diffs: errors + error_diffs + np.isin(np.round(errors, 9), np.round(axis, 9))
+    assert table.measure_deviation(on_nodes, samples=8) == pytest.approx(1.0)
+
+def test_native_simulation_matches_simpful():
+    results = []
+    for native in [False, True]:
+        simulation = Simulation(Fuzzy_Controller(native=native), Refrigerator())
+        simulation.simulation_time = 5
+        simulation.reset_controller(10, 25, 0, 0, 0)
+        simulation.reset(25)
+        simulation.start()
+        results.append(simulation.get_display_results())
+    for expected, result in zip(*results):
+        np.testing.assert_allclose(result, expected, rtol=1e-9, atol=1e-9)
@@ -0,0 +1,52 @@
+"""Tests of the integrators of process dynamics."""
+import math
+
+import numpy as np
+import pytest
+
+from controllers.pi_controller import PI_Controller
+from integrators import Euler_Integrator, RK4_Integrator, RK45_Integrator
+from processes.refrigerator import Refrigerator
+from simulation import Simulation
+
+def decay(state : np.ndarray) -> np.ndarray:
+    return -state
+
+def oscillator(state : np.ndarray) -> np.ndarray:
+    return np.array([state[1], -state[0]])
+
+def integrate(integrator, derivatives, state : list, duration : float, samples : int) -> np.ndarray:
+    """Integrate the state over consecutive samples, as Simulation does."""
+    state = np.array(state, dtype=np.float64)
+    for _ in range(samples):
+        state = integrator.integrate(derivatives, state, duration)
+    return state
+
+@pytest.mark.parametrize("integrator_type, order", [(Euler_Integrator, 1), (RK4_Integrator, 4)])
+def test_order_of_fixed_step_integrators(integrator_type, order):
+    errors = [abs(integrate(integrator_type(substeps), decay, [1.0], 0.5, 4)[0] - math.exp(-2.0))
+              for substeps in [4, 8]]
+    assert errors[0] / errors[1] == pytest.approx(2 ** order, rel=0.15)
+
+@pytest.mark.parametrize("rtol", [1e-4, 1e-6, 1e-8])
+def test_rk45_accuracy(rtol):
+    integrator = RK45_Integrator(rtol=rtol, atol=rtol * 1e-3)
+    state = integrate(integrator, oscillator, [1.0, 0.0], 0.5, 20)
+    np.testing.assert_allclose(state, [math.cos(10.0), -math.sin(10.0)], atol=100 * rtol)
+    assert integrator.steps > 0 and integrator.evaluations >= 6 * integrator.steps
+
+def test_rk45_adapts_step_size():
+    loose, tight = RK45_Integrator(rtol=1e-3, atol=1e-6), RK45_Integrator(rtol=1e-9, atol=1e-12)
+    integrate(loose, oscillator, [1.0, 0.0], 5.0, 2)
+    integrate(tight, oscillator, [1.0, 0.0], 5.0, 2)
+    assert tight.steps > loose.steps
+
+def test_single_euler_step_matches_process():
+    results = []
+    for integrator in [None, Euler_Integrator()]:
+        simulation = Simulation(PI_Controller(10, 25, 1.0, 2.0), Refrigerator(), integrator)
+        simulation.reset(25)
+        simulation.start()
+        results.append(simulation.get_display_results())
+    for expected, result in zip(*results):
+        np.testing.assert_array_equal(result, expected)
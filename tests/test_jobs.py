@@ -0,0 +1,88 @@
+"""Tests of background simulation jobs."""
+import time
+
+import pytest
+
+import jobs
+from jobs import Job_Manager
+from result_cache import Result_Cache
+from sweep import run_live_simulation
+
+CONFIG = {"controller_type": "PI", "target_value": 10, "init_value": 25, "param_1": 1.0, "param_2": 2.0,
+          "param_3": None}
+
+def delayed_simulation(config : dict, progress, abort) -> list:
+    """Simulation starting after a short delay, so jobs stay in flight while the test submits them."""
+    if abort.wait(0.5):
+        return None
+    return run_live_simulation(config, progress, abort)
+
+def wait_for(manager : Job_Manager, job_id : str, timeout : float = 30) -> str:
+    deadline = time.monotonic() + timeout
+    while manager.get_status(job_id) in ["queued", "running"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return manager.get_status(job_id)
+
+@pytest.fixture
+def manager(database, monkeypatch) -> Job_Manager:
+    monkeypatch.setattr(jobs, "run_live_simulation", delayed_simulation)
+    manager = Job_Manager(Result_Cache(database), workers=1)
+    yield manager
+    manager.shutdown()
+
+def test_identical_jobs_are_coalesced(manager):
+    job_id = manager.submit(CONFIG)
+    assert manager.submit(dict(CONFIG)) == job_id
+    assert manager.jobs[job_id]["clients"] == 2
+    assert wait_for(manager, job_id) == "done"
+    assert manager.cache.db.simulation_exists(1.0, 2.0, None, 10, "PI", 25)
+
+    # Job is kept until all its clients picked it up
+    manager.forget(job_id)
+    assert manager.get_status(job_id) == "done"
+    manager.forget(job_id)
+    assert manager.get_status(job_id) == "unknown"
+
+    # Stored configuration is done right away as a new job
+    stored_id = manager.submit(CONFIG)
+    assert stored_id != job_id and manager.get_status(stored_id) == "done"
+
+def test_finished_jobs_expire(database, monkeypatch):
+    monkeypatch.setattr(jobs, "run_live_simulation", delayed_simulation)
+    manager = Job_Manager(Result_Cache(database), workers=1, ttl=0.1)
+    try:
+        job_id = manager.submit(CONFIG)
+        assert wait_for(manager, job_id) == "done"
+        time.sleep(0.2)
+        assert manager.get_status(job_id) == "unknown" and job_id not in manager.jobs
+    finally:
+        manager.shutdown()
+
+def test_cancel_queued_job(manager):
+    # Worker takes one job and the pool hands it two more in advance, the fourth job stays queued
+    running_ids = [manager.submit(dict(CONFIG, param_1=param_1)) for param_1 in [1.0, 2.0, 3.0]]
+    queued_id = manager.submit(dict(CONFIG, param_1=4.0))
+    assert manager.cancel(queued_id)
+    assert manager.get_status(queued_id) == "unknown"
+    assert [wait_for(manager, job_id) for job_id in running_ids] == ["done"] * 3
+    assert not manager.cache.db.simulation_exists(4.0, 2.0, None, 10, "PI", 25)
+
+def test_cancel_keeps_coalesced_job(manager):
+    job_id = manager.submit(CONFIG)
+    manager.submit(CONFIG)
+    assert not manager.cancel(job_id)
+    assert wait_for(manager, job_id) == "done"
+
+def test_abort_running_job(manager):
+    job_id = manager.submit(CONFIG)
+    future = manager.jobs[job_id]["future"]
+    while not future.running():
+        time.sleep(0.01)
+    assert manager.abort(job_id)
+    future.result(timeout=30)
+    # Nobody waits for the aborted job, it is dropped and not stored
+    deadline = time.monotonic() + 30
+    while job_id in manager.jobs and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert manager.get_status(job_id) == "unknown" and not manager.in_flight
+    assert not manager.cache.db.simulation_exists(1.0, 2.0, None, 10, "PI", 25)
@@ -0,0 +1,54 @@
+"""Tests of the piecewise linear simulation against stepping every sample."""
+import numpy as np
+import pytest
+
+from controllers.fuzzy_controller import Fuzzy_Controller
+from controllers.pi_controller import PI_Controller
+from controllers.pid_controller import PID_Controller
+from integrators import Euler_Integrator, RK4_Integrator
+from linear_simulation import Linear_Simulation, get_powers
+from processes.refrigerator import Refrigerator
+from simulation import Simulation
+
+def get_controller(controller_type : str, anti_windup : bool, integral_limit : float):
+    if controller_type == "PI":
+        return PI_Controller(10, 25, 1.0, 1.0, anti_windup, integral_limit)
+    return PID_Controller(10, 25, 0.5, 3.0, 0.2, anti_windup, integral_limit)
+
+def run(simulation : Simulation, simulation_time : float = 500) -> list:
+    simulation.simulation_time = simulation_time
+    simulation.reset(25)
+    simulation.start()
+    return simulation.get_display_results()
+
+def test_powers():
+    matrix = np.array([[0.9, 0.1, 0.0], [0.2, 0.7, 0.1], [0.0, 0.3, 0.6]])
+    powers = get_powers(matrix, 11)
+    for idx in range(11):
+        np.testing.assert_allclose(powers[idx], np.linalg.matrix_power(matrix, idx + 1), rtol=1e-12, atol=1e-15)
+
+@pytest.mark.parametrize("controller_type", ["PI", "PID"])
+@pytest.mark.parametrize("anti_windup, integral_limit", [(False, None), (True, None), (False, 20.0)])
+def test_linear_matches_stepping(controller_type, anti_windup, integral_limit):
+    expected = run(Simulation(get_controller(controller_type, anti_windup, integral_limit), Refrigerator()))
+    results = run(Linear_Simulation(get_controller(controller_type, anti_windup, integral_limit), Refrigerator()))
+    assert len(results[0]) == len(expected[0])
+    for result, values in zip(results, expected):
+        np.testing.assert_allclose(result, values, rtol=1e-9, atol=1e-9)
+
+def test_other_controllers_are_stepped():
+    expected = run(Simulation(Fuzzy_Controller(), Refrigerator()), 5)
+    results = run(Linear_Simulation(Fuzzy_Controller(), Refrigerator()), 5)
+    for result, values in zip(results, expected):
+        np.testing.assert_array_equal(result, values)
+
+@pytest.mark.parametrize("integrator", [RK4_Integrator, lambda: Euler_Integrator(4)])
+def test_runs_with_integrator_are_stepped(integrator):
+    simulations = [Simulation(get_controller("PID", True, None), Refrigerator()),
+                   Linear_Simulation(get_controller("PID", True, None), Refrigerator())]
+    for simulation in simulations:
+        simulation.set_integrator(integrator())
+    assert not simulations[1].is_linear()
+    expected, results = (run(simulation, 50) for simulation in simulations)
+    for result, values in zip(results, expected):
+        np.testing.assert_array_equal(result, values)
@@ -0,0 +1,74 @@
+"""Tests of the online control quality metrics."""
+import numpy as np
+import pytest
+
+import database as database_module
+from metrics import METRICS, Online_Metrics, get_metrics
+from simulation import Simulation
+from sweep import get_grid, run_sweep
+
+CONFIG = {"controller_type": "PI", "target_value": 10, "init_value": 25, "param_1": 1.0, "param_2": 2.0,
+          "param_3": None}
+
+def get_results() -> list:
+    simulation = Simulation.from_config(CONFIG)
+    simulation.start()
+    return simulation.get_display_results()
+
+def assert_metrics_equal(metrics : dict, expected : dict) -> None:
+    assert list(metrics) == METRICS
+    for metric in METRICS:
+        assert metrics[metric] == pytest.approx(expected[metric], rel=1e-12, abs=1e-12)
+
+def test_error_integrals():
+    times = np.arange(11, dtype=np.float64)
+    values = np.full(11, 11.0)
+    values[0] = 25.0
+    metrics = get_metrics([times, values, np.ones(11), np.zeros(11), 10 - values], 10)
+    # Initial sample has zero duration, the error is 1 for the rest of them
+    assert metrics["iae"] == metrics["ise"] == 10.0
+    assert metrics["itae"] == sum(range(1, 11))
+    assert metrics["total_work"] == 11.0 and metrics["overshoot"] == 0.0
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 100, 1000])
+def test_chunks_match_whole_results(chunk_size):
+    results = get_results()
+    metrics = Online_Metrics(10)
+    for start in range(0, len(results[0]), chunk_size):
+        metrics.update([result[start:start + chunk_size] for result in results])
+    assert_metrics_equal(metrics.get_metrics(), get_metrics(results, 10))
+
+def test_simulation_metrics_are_online():
+    simulation = Simulation.from_config(CONFIG)
+    simulation.start()
+    assert_metrics_equal(simulation.get_metrics(), get_metrics(simulation.get_display_results(), 10))
+    streamed = Simulation.from_config(CONFIG)
+    for _ in streamed.stream(100):
+        pass
+    assert_metrics_equal(streamed.get_metrics(), simulation.get_metrics())
+
+def test_held_sample_matches_constant_results():
+    results = [np.asarray(result) for result in get_results()]
+    stop = len(results[0]) // 2
+    held = [result[:stop] for result in results]
+    # Latest sample repeated until the end, time keeps going
+    constant = [results[0]] + [np.concatenate([result[:stop], np.full(len(result) - stop, result[stop - 1])])
+                               for result in results[1:]]
+    metrics, expected = get_metrics(held, 10, results[0][-1]), get_metrics(constant, 10)
+    # Held interval is integrated exactly, samples by the rectangle rule, only itae is affected by it
+    assert metrics["itae"] == pytest.approx(expected["itae"], rel=1e-3)
+    metrics["itae"] = expected["itae"]
+    assert_metrics_equal(metrics, expected)
+
+def test_ranked_simulations(database):
+    run_sweep(get_grid("PI", [10.0], [25.0], [0.1, 1.0, 5.0], [2.0]), database, workers=1, progress=False)
+    ranked = database.rank_simulations("iae")
+    assert len(ranked) == 3 and [item["iae"] for item in ranked] == sorted(item["iae"] for item in ranked)
+
+def test_stored_simulation_metrics_are_not_recomputed(database, monkeypatch):
+    results = get_results()
+    assert database.insert_or_update_data(1.0, 2.0, None, 10, "PI", results, 25)
+    computed = []
+    monkeypatch.setattr(database_module, "get_metrics", lambda *args: computed.append(args))
+    assert database.insert_or_update_data(1.0, 2.0, None, 10, "PI", results, 25)
+    assert not computed
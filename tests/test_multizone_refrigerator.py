@@ -0,0 +1,57 @@
+"""Tests of the multizone refrigerator process."""
+import numpy as np
+import pytest
+
+from controllers.pi_controller import PI_Controller
+from controllers.pid_controller import PID_Controller
+from integrators import RK4_Integrator
+from processes.multizone_refrigerator import Multizone_Refrigerator
+from processes.refrigerator import Refrigerator
+from simulation import Simulation
+
+def run(process, controller = None, integrator = None, init_value = 25.0) -> Simulation:
+    simulation = Simulation(controller or PI_Controller(10, 25, 1.0, 2.0), process, integrator)
+    simulation.simulation_time = 200
+    simulation.reset(init_value)
+    simulation.start()
+    return simulation
+
+@pytest.mark.parametrize("controller_type", [PI_Controller, PID_Controller])
+@pytest.mark.parametrize("integrator_type", [None, RK4_Integrator])
+def test_single_zone_matches_refrigerator(controller_type, integrator_type):
+    results = [run(process, controller_type(10, 25, 1.0, 2.0),
+                   integrator_type() if integrator_type else None).get_display_results()
+               for process in [Refrigerator(), Multizone_Refrigerator()]]
+    for expected, result in zip(*results):
+        np.testing.assert_array_equal(result, expected)
+
+def get_chain(zones : int) -> list:
+    return [(zone, zone + 1, 0.5 + zone) for zone in range(zones - 1)]
+
+def test_dense_coupling_matches_sparse():
+    zones = 6
+    conductances = np.zeros((zones, zones))
+    for zone_1, zone_2, conductance in get_chain(zones):
+        conductances[zone_1, zone_2] = conductances[zone_2, zone_1] = conductance
+    init_values = np.linspace(20.0, 30.0, zones)
+    sparse = run(Multizone_Refrigerator(zones, edges=get_chain(zones), leakage=0.1), init_value=init_values)
+    dense = run(Multizone_Refrigerator(zones, conductances, leakage=0.1), init_value=init_values)
+    np.testing.assert_allclose(dense.process.get_zone_results(), sparse.process.get_zone_results(), atol=1e-10)
+    assert sparse.process.get_zone_results().shape == (sparse.get_steps() + 1, zones)
+
+@pytest.mark.parametrize("conductances", [[[0.0, 1.0], [2.0, 0.0]], [[1.0, 1.0], [1.0, 0.0]]])
+def test_invalid_conductances(conductances):
+    with pytest.raises(ValueError):
+        Multizone_Refrigerator(2, conductances)
+
+def test_coupling_conserves_heat():
+    zones = 5
+    process = Multizone_Refrigerator(zones, edges=get_chain(zones), masses=np.linspace(1.0, 3.0, zones))
+    process.reset(np.linspace(0.0, 40.0, zones), 1000)
+    heat = process.capacities @ process.temperatures
+    for _ in range(1000):
+        process.add_signal(0.0, 0.1)
+    temperatures = process.get_zone_results()
+    assert process.capacities @ temperatures[-1] == pytest.approx(heat, rel=1e-12)
+    # Zones approach the common temperature
+    assert np.ptp(temperatures[-1]) < np.ptp(temperatures[0])
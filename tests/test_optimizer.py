@@ -0,0 +1,59 @@
+"""Tests of the gain tuning optimizer."""
+import math
+
+import numpy as np
+import pytest
+
+from optimizer import Gain_Optimizer, get_cost
+from sweep import get_stop_conditions
+
+@pytest.fixture
+def optimizer(database):
+    optimizer = Gain_Optimizer(database, "PI", 10.0, 25.0, bounds=[[0.1, 10.0], [0.5, 50.0]], workers=1)
+    yield optimizer
+    optimizer.close()
+
+def test_cost():
+    assert get_cost({"iae": 2.0, "total_work": 10.0}, "iae", 0.5) == 7.0
+    assert get_cost({"settling_time": None, "total_work": 10.0}, "settling_time") == math.inf
+    assert get_cost({"iae": math.nan, "total_work": 10.0}) == math.inf
+
+def test_params_are_clipped_and_rounded(optimizer):
+    assert optimizer.get_params([-5.0, 0.5]) == (0.1, float(f"{10 ** 0.5:.6g}"))
+    assert optimizer.get_config((1.0, 2.0))["param_3"] is None
+
+def test_grid_search_reuses_stored_points(optimizer, database):
+    params, cost = optimizer.grid_search(points_per_axis=3, levels=2)
+    assert cost == min(optimizer.costs.values()) and math.isfinite(cost)
+    assert optimizer.simulations == len(optimizer.costs)
+
+    repeated = Gain_Optimizer(database, "PI", 10.0, 25.0, bounds=[[0.1, 10.0], [0.5, 50.0]], workers=1)
+    assert repeated.grid_search(points_per_axis=3, levels=2) == [params, cost]
+    assert repeated.simulations == 0
+    repeated.close()
+
+def test_nelder_mead_improves_start(optimizer):
+    start = [1.0, 5.0]
+    start_cost = optimizer.evaluate([np.log10(start)])[0]
+    params, cost = optimizer.nelder_mead(start, max_iterations=15)
+    assert cost <= start_cost and optimizer.costs[params] == cost
+
+def test_differential_evolution_is_seeded(database):
+    results = []
+    for _ in range(2):
+        optimizer = Gain_Optimizer(database, "PI", 10.0, 25.0, bounds=[[0.1, 10.0], [0.5, 50.0]], workers=1)
+        results.append(optimizer.differential_evolution(population=6, generations=2, seed=1))
+        optimizer.close()
+    assert results[0] == results[1]
+
+def test_stop_conditions_are_not_mixed(database):
+    bounds = [[0.1, 10.0], [0.5, 50.0]]
+    stopped = Gain_Optimizer(database, "PI", 10.0, 25.0, bounds=bounds, workers=1,
+                             stop_conditions=get_stop_conditions(error_limit=1.0))
+    complete = Gain_Optimizer(database, "PI", 10.0, 25.0, bounds=bounds, workers=1)
+    point = [np.log10([1.0, 2.0])]
+    # Every run diverges at the first check, its held metrics differ from the complete run
+    assert stopped.evaluate(point) != complete.evaluate(point)
+    assert stopped.simulations == complete.simulations == 1
+    stopped.close()
+    complete.close()
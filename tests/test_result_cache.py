@@ -0,0 +1,76 @@
+"""Tests of the result cache and configuration keys."""
+import numpy as np
+
+import database as database_module
+from database import get_config_key
+from result_cache import Result_Cache
+from simulation import Simulation
+
+def get_config(param_1 : float) -> dict:
+    return {"controller_type": "PI", "target_value": 10, "init_value": 25, "param_1": param_1, "param_2": 2.0,
+            "param_3": None}
+
+def get_key(config : dict) -> str:
+    return get_config_key(config["param_1"], config["param_2"], config["param_3"], config["target_value"],
+                          config["controller_type"], config["init_value"])
+
+def run(config : dict) -> list:
+    simulation = Simulation.from_config(config)
+    simulation.start()
+    return simulation.get_display_results()
+
+def get_result(size : int, value : float = 0.0) -> list:
+    return [np.full(size, value) for _ in range(5)]
+
+def test_keys_include_signal_limit(monkeypatch):
+    key = get_key(get_config(1.0))
+    monkeypatch.setattr(database_module, "REFRIGERATOR_SIGNAL_LIMIT", 20)
+    assert get_key(get_config(1.0)) != key
+
+def test_unused_params_do_not_change_keys():
+    assert get_config_key(1.0, 2.0, 3.0, 10, "PI", 25) == get_config_key(1.0, 2.0, None, 10, "PI", 25)
+    assert get_config_key(1.0, 2.0, None, 10, "Fuzzy", 25) == get_config_key(None, None, None, 10, "Fuzzy", 25)
+
+def test_least_recently_used_are_evicted(database):
+    # Every result takes 5 * 8 * 10 = 400 bytes
+    cache = Result_Cache(database, max_bytes=1000)
+    cache.put("first", get_result(10, 1.0))
+    cache.put("second", get_result(10, 2.0))
+    assert cache.get("first")[1][0] == 1.0
+    cache.put("third", get_result(10, 3.0))
+    assert list(cache.entries) == ["first", "third"] and cache.size == 800
+    # Results larger than the whole cache are returned without being kept
+    assert len(cache.put("large", get_result(100))[0]) == 100
+    assert "large" not in cache.entries and cache.size == 800
+
+def test_put_copies_results(database):
+    cache = Result_Cache(database)
+    result = get_result(10)
+    cache.put("key", result)
+    result[0][0] = 5.0
+    assert cache.get("key")[0][0] == 0.0
+
+def test_database_is_second_tier(database):
+    config = get_config(1.0)
+    result = run(config)
+    database.insert_or_update_data(1.0, 2.0, None, 10, "PI", result, 25)
+    cache = Result_Cache(database)
+    assert cache.get(get_key(get_config(2.0))) is None
+    for expected, stored in zip(result, cache.get(get_key(config))):
+        np.testing.assert_array_equal(stored, expected)
+    assert get_key(config) in cache.entries
+
+def test_get_or_run(database, monkeypatch):
+    cache = Result_Cache(database)
+    config = get_config(1.0)
+    runs = []
+    result = cache.get_or_run(config, lambda: runs.append(config) or run(config))
+    assert len(runs) == 1 and database.simulation_exists(1.0, 2.0, None, 10, "PI", 25)
+
+    # Hit refreshes the timestamp of the stored simulation instead of running it again
+    refreshed = []
+    monkeypatch.setattr(database, "update_data", lambda *params: refreshed.append(params) or True)
+    cached = Result_Cache(database).get_or_run(config, lambda: runs.append(config) or run(config))
+    assert len(runs) == 1 and refreshed == [(1.0, 2.0, None, 10, "PI", 25)]
+    for expected, stored in zip(result, cached):
+        np.testing.assert_array_equal(stored, expected)
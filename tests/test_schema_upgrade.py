@@ -0,0 +1,105 @@
+"""Tests of upgrading databases created by the first version of the application."""
+import os
+import sqlite3
+
+import numpy as np
+import pytest
+
+from database import Database, get_config_key
+from metrics import METRICS, get_metrics
+from simulation import Simulation
+
+BASELINE_SCRIPT = """
+CREATE TABLE Simulations(
+    simulation_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    simulation_date INTEGER NOT NULL,
+    simulation_time INTEGER NOT NULL,
+    param_1 REAL NULL,
+    param_2 REAL NULL,
+    param_3 REAL NULL,
+    target_value REAL NOT NULL,
+    controller_type TEXT NOT NULL
+);
+
+CREATE TABLE Measurements(
+    measurement_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    simulation_id INTEGER NOT NULL REFERENCES Simulations(simulation_id),
+    measurement_time REAL NOT NULL,
+    measurement_value REAL NOT NULL,
+    measurement_signal REAL NOT NULL,
+    measurement_response REAL NOT NULL,
+    error REAL NOT NULL
+);
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Simulations of the baseline database: id, date, time, param_1, param_2, target_value, controller_type
+SIMULATIONS = [(1, 20240101, 100000, 1.0, 2.0, 10, "PI"),
+               (2, 20240102, 100000, 1.0, 2.0, 10, "PI"),
+               (3, 20240101, 120000, 0.5, 1.0, 5, "PI")]
+
+def get_results(param_1 : float, param_2 : float, target_value : float) -> list:
+    simulation = Simulation.from_config({"controller_type": "PI", "target_value": target_value, "init_value": 25,
+                                         "param_1": param_1, "param_2": param_2, "param_3": None})
+    simulation.start()
+    return simulation.get_display_results()
+
+def create_baseline(path : str) -> dict:
+    '''
+    Create database with the baseline schema and its simulations, returns their results by id.
+    :param path: path of the database file
+    '''
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCRIPT)
+    results = {}
+    for sim_id, date, time, param_1, param_2, target_value, controller_type in SIMULATIONS:
+        conn.execute("INSERT INTO Simulations VALUES (?, ?, ?, ?, ?, NULL, ?, ?)",
+                     (sim_id, date, time, param_1, param_2, target_value, controller_type))
+        results[sim_id] = get_results(param_1, param_2, target_value)
+        conn.executemany("INSERT INTO Measurements (simulation_id, measurement_time, measurement_value, "
+                         "measurement_signal, measurement_response, error) VALUES (?, ?, ?, ?, ?, ?)",
+                         [(sim_id, *row) for row in zip(*results[sim_id][:5])])
+    conn.commit()
+    conn.close()
+    return results
+
+def test_baseline_database_is_upgraded(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    path = str(tmp_path / "database.db")
+    results = create_baseline(path)
+    db = Database(path)
+
+    conn = sqlite3.connect(path)
+    columns = [column[1] for column in conn.execute("PRAGMA table_info(Simulations)")]
+    assert {"init_value", "config_key", "stop_reason", "stop_time", *METRICS} <= set(columns)
+    rows = conn.execute(f"SELECT simulation_id, config_key, init_value, {', '.join(METRICS)} "
+                        "FROM Simulations ORDER BY simulation_id").fetchall()
+    conn.close()
+
+    # Only the latest of duplicate configurations gets the key, recorded without the initial value
+    keys = {sim_id: key for sim_id, key, *_ in rows}
+    assert keys == {1: None, 2: get_config_key(1.0, 2.0, None, 10, "PI"),
+                    3: get_config_key(0.5, 1.0, None, 5, "PI")}
+    assert all(init_value is None for _, _, init_value, *_ in rows)
+    for (sim_id, date, time, param_1, param_2, target_value, _), row in zip(SIMULATIONS, rows):
+        expected = get_metrics(results[sim_id], target_value)
+        assert row[3:] == pytest.approx([expected[metric] for metric in METRICS])
+
+    # Upgraded simulations are found by their keys, but never match runs recording the initial value
+    for expected, stored in zip(results[3], db.get_simulation_results(keys[3])):
+        np.testing.assert_array_equal(stored, expected)
+    assert not db.simulation_exists(0.5, 1.0, None, 5, "PI", 25)
+
+def test_upgrade_is_idempotent(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    path = str(tmp_path / "database.db")
+    create_baseline(path)
+    Database(path).close()
+    conn = sqlite3.connect(path)
+    before = conn.execute("SELECT * FROM Simulations ORDER BY simulation_id").fetchall()
+    conn.close()
+    Database(path).close()
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT * FROM Simulations ORDER BY simulation_id").fetchall() == before
+    conn.close()
@@ -0,0 +1,67 @@
+"""Tests of stopping simulations early and storing the stopped simulations."""
+import numpy as np
+import pytest
+
+from database import get_config_key
+from pipeline import Divergence_Detector, Settling_Detector
+from result_cache import Result_Cache
+from simulation import Simulation
+from sweep import get_grid, get_stop_conditions, run_simulation, run_sweep
+
+CONFIG = {"controller_type": "PI", "target_value": 10, "init_value": 25, "param_1": 1.0, "param_2": 2.0,
+          "param_3": None}
+
+def get_chunk(times, errors) -> list:
+    """Chunk of results in the Simulation.get_display_results layout with the errors."""
+    times, errors = np.asarray(times, dtype=np.float64), np.asarray(errors, dtype=np.float64)
+    return [times, 10 - errors, np.zeros(len(times)), np.zeros(len(times)), errors]
+
+def test_settling_spans_chunks():
+    detector = Settling_Detector(tolerance=0.5, hold_time=3.0)
+    assert not detector.consume(get_chunk([0, 1, 2], [2.0, 1.0, 0.1]))
+    assert detector.settled_since == 2.0
+    assert not detector.consume(get_chunk([3, 4], [0.2, -0.3]))
+    # Leaving the band restarts the hold time
+    assert not detector.consume(get_chunk([5, 6], [0.7, 0.1]))
+    assert detector.settled_since == 6.0 and detector.stop_reason is None
+    assert detector.consume(get_chunk([7, 8, 9], [0.0, 0.0, 0.0]))
+    assert detector.stop_reason == "settled"
+
+@pytest.mark.parametrize("errors, stop_reason", [([1.0, 5.0], "diverged"), ([1.0, np.nan], "not finite"),
+                                                 ([1.0, -np.inf], "not finite"), ([1.0, -2.0], None)])
+def test_divergence(errors, stop_reason):
+    detector = Divergence_Detector(error_limit=2.0)
+    assert detector.consume(get_chunk([0, 1], errors)) == (stop_reason is not None)
+    assert detector.stop_reason == stop_reason
+
+@pytest.mark.parametrize("check_interval", [10, 100])
+def test_start_stops_at_check(check_interval):
+    simulation = Simulation.from_config(CONFIG)
+    assert simulation.start([Divergence_Detector(error_limit=1.0)], check_interval) == "diverged"
+    results = simulation.get_display_results()
+    # Conditions see whole chunks, so the simulation stops at the end of the first one
+    assert len(results[0]) == check_interval + 1
+    assert simulation.stop_time == results[0][-1] == pytest.approx(check_interval * simulation.sampling)
+    for expected, result in zip(run_simulation(CONFIG), results):
+        np.testing.assert_array_equal(result, expected[:check_interval + 1])
+
+def test_start_without_stop():
+    simulation = Simulation.from_config(CONFIG)
+    assert simulation.start([Divergence_Detector(error_limit=100.0)]) is None
+    assert simulation.stop_time is None and len(simulation.get_display_results()[0]) == simulation.get_steps() + 1
+
+def test_stopped_simulations_are_stored_apart(database):
+    stop_conditions = get_stop_conditions(error_limit=1.0)
+    configs = get_grid("PI", [10], [25], [1.0], [2.0])
+    assert run_sweep(configs, database, workers=1, progress=False, stop_conditions=stop_conditions) == 1
+    stored = database.rank_simulations("iae")
+    assert len(stored) == 1 and stored[0]["stop_reason"] == "diverged"
+    assert stored[0]["stop_time"] == pytest.approx(10.0)
+
+    # Stopped simulation is neither a complete one nor resumed as one
+    assert database.get_simulation_results(get_config_key(1.0, 2.0, None, 10, "PI", 25)) is None
+    assert run_sweep(configs, database, workers=1, resume=True, progress=False, stop_conditions=stop_conditions) == 0
+    assert run_sweep(configs, database, workers=1, resume=True, progress=False) == 1
+    result = Result_Cache(database).get_or_run(CONFIG, lambda: run_simulation(CONFIG))
+    assert len(result[0]) == Simulation.from_config(CONFIG).get_steps() + 1
+    assert len(database.rank_simulations("iae")) == 2
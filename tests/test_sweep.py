@@ -0,0 +1,27 @@
+"""Tests of the parallel sweep runner."""
+import numpy as np
+
+from database import get_config_key
+from sweep import get_grid, run_simulation, run_sweep
+
+def get_key(config : dict) -> str:
+    return get_config_key(config["param_1"], config["param_2"], config["param_3"], config["target_value"],
+                          config["controller_type"], config["init_value"])
+
+def test_grid_leaves_out_unused_params():
+    configs = get_grid("PI", [10.0], [20.0, 25.0], [1.0, 2.0], [1.0], [1.0, 2.0])
+    assert len(configs) == 4 and all(config["param_3"] is None for config in configs)
+    assert len(get_grid("Fuzzy", [10.0], [25.0], [1.0, 2.0], [1.0, 2.0])) == 1
+
+def test_init_values_are_distinct_configurations():
+    configs = get_grid("PI", [10.0], [20.0, 25.0], [1.0], [1.0])
+    assert get_key(configs[0]) != get_key(configs[1])
+
+def test_sweep_stores_every_configuration(database):
+    configs = get_grid("PID", [10.0], [20.0, 25.0], [1.0], [1.0, 2.0], [0.5])
+    assert run_sweep(configs, database, workers=2, progress=False) == len(configs)
+    for config in configs:
+        for expected, result in zip(run_simulation(config), database.get_simulation_results(get_key(config))):
+            np.testing.assert_array_equal(result, expected)
+    # Stored configurations are skipped when resuming
+    assert run_sweep(configs, database, workers=2, resume=True, progress=False) == 0
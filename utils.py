@@ -1,10 +1,19 @@
 """Project utilities (UI controls, app layout and result graph), separated for readability."""
 
 import dash_bootstrap_components as dbc
-import plotly.graph_objs as go
 
 from dash import dcc, html
 
+from constants import JOB_POLL_INTERVAL
+
+# Tab label and y axis title of every result graph, in the order of results channels (after time)
+RESULT_GRAPHS = [
+    ["Temperature", "Temperature [°C]"],
+    ["Work", "Work [J]"],
+    ["Heat transfer", "Heat transfer [J/s]"],
+    ["Error", "Error [°C]"]
+]
+
 def get_controls(controller_type : str, param_1 : float = 1.0, param_2 : float = 1.0, param_3 : float = 1.0) -> dbc.Card:
     '''
     Controller controls visible in the GUI.
@@ -84,35 +93,37 @@ def get_line_name(idx : int, result : list) -> str:
         return f"kp: {result[6][0]}, Ti: {result[6][1]}"
     return f"Simulation {idx}"
 
-def get_result_graphs(results : list) -> dcc.Tabs:
-    """Graphs with simulation results."""
-    temperature_figure = go.Figure()
-    work_figure = go.Figure()
-    heat_transfer_figure = go.Figure()
-    error_figure = go.Figure()
-
-    for idx, result in enumerate(results):
-        line_color = get_line_color(result[5]) if idx > 0 else dict(color="#fa07f2")
-        temperature_figure.add_trace(go.Scatter(x=result[0], y=result[1], name=get_line_name(idx, result),
-                                          line=line_color))
-        work_figure.add_trace(go.Scatter(x=result[0], y=result[2], name=get_line_name(idx, result),
-                                           line=line_color))
-        heat_transfer_figure.add_trace(go.Scatter(x=result[0], y=result[3], name=get_line_name(idx, result),
-                                             line=line_color))
-        error_figure.add_trace(go.Scatter(x=result[0], y=result[4], name=get_line_name(idx, result),
-                                          line=line_color))
-
-    temperature_figure.update_layout(xaxis_title="Time [s]", yaxis_title="Temperature [°C]")
-    work_figure.update_layout(xaxis_title="Time [s]", yaxis_title="Work [J]")
-    heat_transfer_figure.update_layout(xaxis_title="Time [s]", yaxis_title="Heat transfer [J/s]")
-    error_figure.update_layout(xaxis_title="Time [s]", yaxis_title="Error [°C]")
+def get_result_graphs() -> html.Div:
+    """Tabs selecting shown channel of the results, the graph of the selected one and the graph of running simulation."""
+    return html.Div(
+        [
+            dcc.Tabs(
+                [dcc.Tab(label=label, value=str(channel)) for channel, [label, _] in enumerate(RESULT_GRAPHS, start=1)],
+                id="result-tab",
+                value="1"
+            ),
+            dcc.Graph(id="result-graph"),
+            # Shown only while a simulation is running, its traces are extended as it progresses
+            dcc.Graph(id="live-graph", style={"display": "none"})
+        ],
+        id="simulation-result"
+    )
 
-    return dcc.Tabs([
-        dcc.Tab(label="Temperature", children=[dcc.Graph(figure=temperature_figure)]),
-        dcc.Tab(label="Work", children=[dcc.Graph(figure=work_figure)]),
-        dcc.Tab(label="Heat transfer", children=[dcc.Graph(figure=heat_transfer_figure)]),
-        dcc.Tab(label="Error", children=[dcc.Graph(figure=error_figure)])
-    ])
+def get_zoom_range(relayout_data : dict) -> list:
+    '''
+    Shown time range after the user zoomed a graph, [] if the zoom was reset and None if the time
+    axis did not change.
+    :param relayout_data: relayoutData of the graph
+    '''
+    if not relayout_data:
+        return None
+    if relayout_data.get("xaxis.autorange"):
+        return []
+    if "xaxis.range[0]" in relayout_data and "xaxis.range[1]" in relayout_data:
+        return [relayout_data["xaxis.range[0]"], relayout_data["xaxis.range[1]"]]
+    if "xaxis.range" in relayout_data:
+        return list(relayout_data["xaxis.range"])
+    return None
 
 def form_valid(controller_type : str, init_value : float, target_value : float, param_1 : float, param_2 : float, param_3 : float) -> list:
     '''
@@ -201,23 +212,31 @@ def get_app_layout() -> dbc.Container:
                                         )
                                     ),
                                     dbc.Button("Go", color="primary", id="simulation-button", n_clicks=0,
-                                               style={'marginTop': 15, 'width': '100%'})
+                                               style={'marginTop': 15, 'width': '100%'}),
+                                    dbc.Button("Abort", color="danger", id="abort-button", n_clicks=0, disabled=True,
+                                               style={'marginTop': 10, 'width': '100%'}),
+                                    html.Div(id="job-status", style={'marginTop': 10})
                                 ],
                                 body=True,
                             )
                         , md=4),
                         # Plots and results
-                        dbc.Col(html.Div(
-                            dbc.Tabs(),
-                            id="simulation-result"
-                        ),md=8)
+                        dbc.Col(get_result_graphs(), md=8)
                     ],
                     align="center",
                 )],
                 body=True,
                 style={"height": "100%", "marginTop": 15, "marginBottom": 15, "backgroundColor": "#295e8f"}
             ),
-            html.Div(id='simulation-control', style={'display': 'none'})
+            html.Div(id='simulation-control', style={'display': 'none'}),
+            # Id of the background simulation job polled by the client
+            dcc.Store(id="job-id"),
+            dcc.Interval(id="job-poll", interval=JOB_POLL_INTERVAL, disabled=True),
+            # Number of progress updates of the job already shown in the live graph
+            dcc.Store(id="live-offset", data=0),
+            # Changed whenever stored results may have changed, state of the shown result graph
+            dcc.Store(id="results-version", data=0),
+            dcc.Store(id="shown-results")
         ],
         fluid=True
     )